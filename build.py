@@ -1,5 +1,7 @@
+import argparse
 import subprocess
 import os
+import sys
 import shutil
 
 # --- Configuration ---
@@ -7,27 +9,49 @@ APP_NAME = "Py2Win"
 SCRIPT_PATH = os.path.join("src", "py2win_gui.py")
 ICON_PATH = os.path.join("assets", "icon.ico")
 ASSETS_PATH = "assets"
+LAUNCHER_PATH = os.path.join("src", "py2win_launcher.py")
 DIST_PATH = "dist"
 BUILD_PATH = "build"
 
+def store_build(artifact):
+    # dist/ is wiped on every build; the artifact store keeps earlier builds
+    # so updates can be shipped as deltas (see `py2win_cli.py delta`).
+    sys.path.insert(0, "src")
+    import py2win_store
+    try:
+        manifest = py2win_store.ArtifactStore().add(artifact, APP_NAME)
+        print(f"Stored as build {manifest['id']} of {APP_NAME}")
+    except OSError as e:
+        print(f"Warning: could not add the build to the artifact store: {e}")
+
+# Py2Win is built as a folder by default: a one-file build has to unpack
+# Tcl/Tk and customtkinter to a temporary folder on every launch, which made
+# the window appear about three times later (~0.75 s vs ~0.25 s to reach the
+# GUI in `py2win_cli.py bench --compare`).
 def main():
+    parser = argparse.ArgumentParser(description="Build the Py2Win executable.")
+    parser.add_argument("--onefile", action="store_true", help="Build a single executable instead of a folder (slower to start).")
+    args = parser.parse_args()
+
     print("--- Starting build process ---")
 
-    # Clean up previous builds
-    print("Cleaning up previous build directories...")
+    # Clean up the previous executable. The build directory is kept so that
+    # PyInstaller can reuse its analysis and archive caches.
+    print("Cleaning up previous dist directory...")
     if os.path.exists(DIST_PATH):
         shutil.rmtree(DIST_PATH)
-    if os.path.exists(BUILD_PATH):
-        shutil.rmtree(BUILD_PATH)
 
     # Construct the PyInstaller command
     command = [
         "pyinstaller",
+        "--noconfirm",
         "--name", APP_NAME,
-        "--onefile",
+        "--onefile" if args.onefile else "--onedir",
         "--windowed",
         f"--icon={ICON_PATH}",
         f"--add-data={ASSETS_PATH}{os.pathsep}assets",
+        # Frozen by Py2Win itself for "Cached Extraction" builds.
+        f"--add-data={LAUNCHER_PATH}{os.pathsep}.",
         "--distpath", DIST_PATH,
         "--workpath", BUILD_PATH,
         "--specpath", ".", # Place the .spec file in the root
@@ -46,7 +70,9 @@ def main():
 
         if process.returncode == 0:
             print("\n--- Build successful! ---")
-            print(f"Executable created in: {os.path.abspath(DIST_PATH)}")
+            output = DIST_PATH if args.onefile else os.path.join(DIST_PATH, APP_NAME)
+            print(f"Executable created in: {os.path.abspath(output)}")
+            store_build(artifact=os.path.join(DIST_PATH, APP_NAME + (".exe" if args.onefile and os.name == 'nt' else "")))
         else:
             print(f"\n--- Build failed with exit code {process.returncode} ---")
 
@@ -0,0 +1,419 @@
+"""
+Py2Win Analyze - Static import-graph analysis ahead of a build.
+
+Walks the entry script's AST and the local modules it imports, without
+running any of them, and reports:
+
+- every top-level package the code reaches, with an estimate of how many
+  bytes it contributes to the build;
+- exclude suggestions for packages that are only imported optionally
+  (inside `try: ... except ImportError` or `if TYPE_CHECKING:`), with the
+  size they add, and precautionary ones for well-known heavy packages
+  (tkinter, test suites, numpy, ...) that neither the code nor its
+  dependencies import. PyInstaller does not bundle those today, so no
+  saving is claimed; excluding them only keeps a hook from pulling them in;
+- hidden-import suggestions for modules loaded dynamically through
+  `importlib.import_module("name")` or `__import__("name")`.
+
+Parsed modules and package sizes are cached in <PY2WIN_HOME>/analysis/ by
+mtime and size (falling back to a content hash), so repeat runs only
+re-parse files that actually changed. Sizes are measured in the Python
+environment running Py2Win.
+"""
+import os
+import re
+import ast
+import sys
+import json
+import hashlib
+import importlib.util
+from importlib import metadata
+
+import py2win_engine as engine
+
+
+CACHE_VERSION = 2
+OPTIONAL_EXCEPTIONS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+HEAVY_PACKAGES = {
+    "tkinter": "Tcl/Tk GUI toolkit, bundled with its Tcl/Tk data files",
+    "unittest": "standard library test framework",
+    "test": "CPython's own test suite",
+    "doctest": "standard library test framework",
+    "pydoc": "documentation browser",
+    "pytest": "test framework",
+    "IPython": "interactive shell",
+    "numpy": "numerical library",
+    "scipy": "scientific library",
+    "pandas": "data analysis library",
+    "matplotlib": "plotting library",
+    "PyQt5": "Qt bindings",
+    "PyQt6": "Qt bindings",
+    "PySide2": "Qt bindings",
+    "PySide6": "Qt bindings",
+}
+STDLIB = set(getattr(sys, "stdlib_module_names", ())) | set(sys.builtin_module_names)
+TOP_LEVEL_IMPORT = re.compile(rb"^\s*(?:import|from)\s+([A-Za-z_]\w*)", re.MULTILINE)
+REQUIREMENT_NAME = re.compile(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class ImportCollector(ast.NodeVisitor):
+    """Collects the imports of one module, noting which ones are optional."""
+
+    def __init__(self):
+        self.imports = []
+        self.dynamic = []
+        self._optional = 0
+
+    def _add(self, module, level, names):
+        self.imports.append([module or "", level, names, self._optional > 0])
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._add(alias.name, 0, [])
+
+    def visit_ImportFrom(self, node):
+        self._add(node.module, node.level, [alias.name for alias in node.names])
+
+    def visit_Try(self, node):
+        catches_import_error = any(self._handler_names(h) & OPTIONAL_EXCEPTIONS for h in node.handlers)
+        self._optional += catches_import_error
+        for child in node.body:
+            self.visit(child)
+        self._optional -= catches_import_error
+        for child in node.handlers + node.orelse + node.finalbody:
+            self.visit(child)
+
+    visit_TryStar = visit_Try
+
+    def visit_If(self, node):
+        test = node.test
+        type_checking = (isinstance(test, ast.Name) and test.id == "TYPE_CHECKING") or \
+                        (isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING")
+        self._optional += type_checking
+        for child in node.body:
+            self.visit(child)
+        self._optional -= type_checking
+        for child in node.orelse:
+            self.visit(child)
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+        if name in ("import_module", "__import__") and node.args:
+            arg = node.args[0]
+            if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                self.dynamic.append(arg.value)
+        self.generic_visit(node)
+
+    @staticmethod
+    def _handler_names(handler):
+        if handler.type is None:
+            return {"BaseException"}
+        types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        return {t.id if isinstance(t, ast.Name) else getattr(t, "attr", "") for t in types}
+
+
+class AnalysisCache:
+    def __init__(self, path=None):
+        self.path = path or engine.data_dir("analysis", "cache.json")
+        self.dirty = False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                raise ValueError("old cache format")
+            self.modules = data["modules"]
+            self.packages = data["packages"]
+        except (OSError, ValueError, KeyError):
+            self.modules, self.packages = {}, {}
+
+    def module_info(self, path):
+        """Returns {"imports": [...], "dynamic": [...]} for a source file."""
+        st = os.stat(path)
+        entry = self.modules.get(path)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            return entry
+        digest = _file_digest(path)
+        if entry and entry["sha1"] == digest:
+            # Touched but unchanged (e.g. after a checkout): no need to re-parse.
+            entry.update(mtime_ns=st.st_mtime_ns, size=st.st_size)
+            self.dirty = True
+            return entry
+        collector = ImportCollector()
+        try:
+            with open(path, 'rb') as f:
+                collector.visit(ast.parse(f.read(), filename=path))
+        except (SyntaxError, ValueError):
+            pass
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": digest,
+                 "imports": collector.imports, "dynamic": collector.dynamic}
+        self.modules[path] = entry
+        self.dirty = True
+        return entry
+
+    def package_info(self, top_name):
+        """Returns {"size": bytes, "imports": [top-level names it imports],
+        "mentions": [heavy packages among them]} for an importable top-level
+        package, or None when it is not installed."""
+        try:
+            spec = importlib.util.find_spec(top_name)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None:
+            return None
+        if spec.submodule_search_locations:
+            locations = list(spec.submodule_search_locations)
+            # Wheels such as numpy keep their shared libraries in <name>.libs.
+            locations += [p + ".libs" for p in locations if os.path.isdir(p + ".libs")]
+        elif spec.origin and os.path.isfile(spec.origin):
+            locations = [spec.origin]
+        else:
+            return {"size": 0, "imports": [], "mentions": []}
+        info = {"size": 0, "imports": set()}
+        for location in locations:
+            try:
+                mtime_ns = os.stat(location).st_mtime_ns
+            except OSError:
+                continue
+            cached = self.packages.get(location)
+            if not cached or cached["mtime_ns"] != mtime_ns:
+                cached = dict(_scan_location(location), mtime_ns=mtime_ns)
+                self.packages[location] = cached
+                self.dirty = True
+            info["size"] += cached["size"]
+            info["imports"].update(cached["imports"])
+        info["imports"].discard(top_name)
+        info["mentions"] = sorted(info["imports"] & set(HEAVY_PACKAGES))
+        info["imports"] = sorted(info["imports"])
+        return info
+
+    def package_size(self, top_name):
+        info = self.package_info(top_name)
+        return info["size"] if info else None
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": CACHE_VERSION, "modules": self.modules, "packages": self.packages}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def _scan_location(location):
+    # One pass over an installed package: total size, plus the top-level
+    # packages its own sources import (so we never suggest excluding them).
+    if os.path.isfile(location):
+        files = [location]
+    else:
+        files = [os.path.join(root, f) for root, _, names in os.walk(location) for f in names]
+    size = 0
+    imports = set()
+    for path in files:
+        try:
+            if os.path.islink(path):
+                continue
+            size += os.path.getsize(path)
+            if path.endswith(".py"):
+                with open(path, 'rb') as f:
+                    imports.update(m.decode() for m in TOP_LEVEL_IMPORT.findall(f.read()))
+        except OSError:
+            continue
+    return {"size": size, "imports": sorted(imports)}
+
+
+def _module_file(base):
+    if os.path.isfile(base + ".py"):
+        return base + ".py"
+    init = os.path.join(base, "__init__.py")
+    if os.path.isfile(init):
+        return init
+    return None
+
+
+class ImportGraph:
+    def __init__(self, script_path, cache=None):
+        self.script_path = os.path.abspath(script_path)
+        self.root = os.path.dirname(self.script_path)
+        self.cache = cache or AnalysisCache()
+        self.local = []          # local source files, in discovery order
+        self.external = {}       # top-level name -> {"importers": set, "required": bool}
+        self.dynamic = {}        # dynamically imported name -> importer
+        self._walk()
+
+    def _note_external(self, name, importer, optional):
+        top = name.split(".")[0]
+        info = self.external.setdefault(top, {"importers": set(), "required": False})
+        info["importers"].add(importer)
+        info["required"] = info["required"] or not optional
+
+    def _walk(self):
+        seen = set()
+        pending = [self.script_path]
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+            self.local.append(path)
+            try:
+                info = self.cache.module_info(path)
+            except OSError:
+                continue
+            importer = os.path.relpath(path, self.root)
+            for module, level, names, optional in info["imports"]:
+                if level:
+                    base = os.path.dirname(path)
+                    for _ in range(level - 1):
+                        base = os.path.dirname(base)
+                    target = os.path.join(base, *module.split(".")) if module else base
+                    candidates = [_module_file(target)] + [_module_file(os.path.join(target, n)) for n in names]
+                    pending.extend(c for c in candidates if c)
+                    continue
+                parts = module.split(".")
+                found_local = False
+                for i in range(1, len(parts) + 1):
+                    local_file = _module_file(os.path.join(self.root, *parts[:i]))
+                    if local_file:
+                        pending.append(local_file)
+                        found_local = True
+                if found_local:
+                    for n in names:
+                        local_file = _module_file(os.path.join(self.root, *parts, n))
+                        if local_file:
+                            pending.append(local_file)
+                else:
+                    self._note_external(module, importer, optional)
+            for name in info["dynamic"]:
+                self.dynamic.setdefault(name, importer)
+        self.cache.save()
+
+
+def local_modules(script_path, cache=None):
+    """Returns the entry script plus every local .py file it (transitively) imports."""
+    return sorted(ImportGraph(script_path, cache).local)
+
+
+def _required_by(top_names):
+    """Returns the lower-cased distribution names required by the given packages."""
+    required = set()
+    try:
+        packages = metadata.packages_distributions()
+    except Exception:
+        return required
+    for top in top_names:
+        for dist in packages.get(top, []):
+            try:
+                for requirement in metadata.requires(dist) or []:
+                    match = REQUIREMENT_NAME.match(requirement)
+                    if match:
+                        required.add(match.group(1).lower().replace("_", "-"))
+            except metadata.PackageNotFoundError:
+                continue
+    return required
+
+
+def _is_used(name, used):
+    # `used` mixes import names and lower-cased distribution names.
+    return name in used or name.lower() in used or name.lower().replace("_", "-") in used
+
+
+def analyze(profile, cache=None):
+    """Analyses a profile's entry script; returns packages and suggestions."""
+    cache = cache or AnalysisCache()
+    graph = ImportGraph(profile["script_path"], cache)
+    excludes = set(profile.get("excludes", []))
+    hidden_imports = set(profile.get("hidden_imports", []))
+
+    packages = []
+    # Packages that the required packages import or depend on, which must
+    # never be suggested as excludes.
+    used_by_dependencies = set()
+    heavy_mentions = set()
+    for top, info in graph.external.items():
+        package_info = cache.package_info(top)
+        if package_info:
+            heavy_mentions.update(package_info["mentions"])
+            if info["required"]:
+                used_by_dependencies.update(package_info["imports"])
+        packages.append({
+            "name": top,
+            "size": package_info["size"] if package_info else None,
+            "stdlib": top in STDLIB,
+            "required": info["required"],
+            "importers": sorted(info["importers"]),
+        })
+    packages.sort(key=lambda p: p["size"] or 0, reverse=True)
+
+    used_by_dependencies.update(_required_by([p["name"] for p in packages if p["required"] and not p["stdlib"]]))
+
+    suggestions = []
+    for package in packages:
+        if not package["required"] and package["size"] and package["name"] not in excludes and not _is_used(package["name"], used_by_dependencies):
+            suggestions.append({"kind": "exclude", "name": package["name"], "size": package["size"],
+                                "reason": f"only imported optionally, by {_summarize_names(package['importers'])}"})
+
+    used_by_dependencies.update(heavy_mentions)
+    used_by_dependencies.update(_required_by([p["name"] for p in packages if not p["stdlib"]]))
+    for name, description in HEAVY_PACKAGES.items():
+        if name in graph.external or name in excludes or _is_used(name, used_by_dependencies):
+            continue
+        # Unreached packages are not bundled, so excluding them saves nothing now.
+        if cache.package_size(name):
+            suggestions.append({"kind": "exclude", "name": name, "size": None, "precautionary": True,
+                                "reason": f"{description}; neither your code nor its dependencies import it, so excluding it saves nothing today; it only keeps a PyInstaller hook from pulling it in later."})
+
+    for name, importer in sorted(graph.dynamic.items()):
+        top = name.split(".")[0]
+        if name in hidden_imports or top in graph.external or _module_file(os.path.join(graph.root, *name.split("."))):
+            continue
+        suggestions.append({"kind": "hidden_import", "name": name, "size": None,
+                            "reason": f"imported dynamically by {importer}"})
+
+    cache.save()
+    return {"local_modules": len(graph.local), "packages": packages, "suggestions": suggestions}
+
+
+def _summarize_names(names, limit=3):
+    if len(names) <= limit:
+        return ", ".join(names)
+    return f"{', '.join(names[:limit])} and {len(names) - limit} more"
+
+
+def apply_suggestions(profile, suggestions):
+    """Adds accepted suggestions to the profile's excludes and hidden_imports."""
+    for suggestion in suggestions:
+        key = "excludes" if suggestion["kind"] == "exclude" else "hidden_imports"
+        values = profile.setdefault(key, [])
+        if suggestion["name"] not in values:
+            values.append(suggestion["name"])
+    return profile
+
+
+def format_analysis(analysis):
+    lines = [f"{analysis['local_modules']} local module(s) analysed.", ""]
+    rows = [("Package", "Estimated size", "Kind", "Imported by")]
+    for package in analysis["packages"]:
+        size = engine.format_size(package["size"]) if package["size"] else ("not installed" if package["size"] is None else "-")
+        kind = "stdlib" if package["stdlib"] else "third-party"
+        if not package["required"]:
+            kind += ", optional"
+        rows.append((package["name"], size, kind, _summarize_names(package["importers"])))
+    lines.append(engine.format_table(rows))
+    lines.append("")
+    if not analysis["suggestions"]:
+        lines.append("No suggestions.")
+    for suggestion in analysis["suggestions"]:
+        flag = "--exclude-module" if suggestion["kind"] == "exclude" else "--hidden-import"
+        size = f" (~{engine.format_size(suggestion['size'])})" if suggestion["size"] else ""
+        if suggestion.get("precautionary"):
+            size = " (precautionary)"
+        lines.append(f"Suggest {flag} {suggestion['name']}{size}: {suggestion['reason']}")
+    return "\n".join(lines)
@@ -0,0 +1,227 @@
+"""
+Py2Win Bench - Startup-latency benchmarks for produced executables.
+
+Runs a built executable repeatedly and records startup-to-exit wall time and
+peak memory:
+
+- cold runs evict the executable's files from the OS page cache before each
+  launch (posix_fadvise where available), so every run reads from disk;
+- warm runs follow a warm-up launch and measure the steady state.
+
+A profile can also be built as --onefile, as one-dir and as a one-file
+build with cached extraction and the layouts compared side by side. Results are appended to <profile>.bench.json
+next to the profile so regressions can be tracked from build to build.
+Likewise, the size optimisations in OPTIMIZATIONS (strip, UPX, bytecode
+level 2) can be compared, to weigh the smaller size against the startup
+time it costs.
+"""
+import os
+import json
+import time
+import threading
+import subprocess
+
+import py2win_engine as engine
+
+
+REGRESSION_FACTOR = 1.25
+LAYOUTS = {
+    "onefile": {"is_onefile": 1, "cached_extraction": 0},
+    "onedir": {"is_onefile": 0},
+    "cached": {"is_onefile": 1, "cached_extraction": 1},
+}
+OPTIMIZATIONS = {
+    "plain": {"upx": 0, "strip": 0, "optimize": 0},
+    "strip": {"upx": 0, "strip": 1, "optimize": 0},
+    "upx": {"upx": 1, "strip": 0, "optimize": 0},
+    "optimize2": {"upx": 0, "strip": 0, "optimize": 2},
+    "all": {"upx": 1, "strip": 1, "optimize": 2},
+}
+
+
+def executable_path(artifact):
+    if os.path.isfile(artifact):
+        return artifact
+    name = os.path.basename(artifact.rstrip("/\\"))
+    return os.path.join(artifact, name + (".exe" if os.name == 'nt' else ""))
+
+
+def evict_page_cache(path):
+    """Asks the OS to drop `path` (a file or a folder) from the page cache.
+
+    Returns False when the platform offers no way to do so without
+    privileges, in which case "cold" runs are only as cold as the OS allows.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    paths = [path] if os.path.isfile(path) else (os.path.join(root, f) for root, _, files in os.walk(path) for f in files)
+    for file_path in paths:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    return True
+
+
+def run_once(executable, args=(), timeout=60):
+    """Launches `executable` once; returns (seconds, peak RSS, returncode)."""
+    start = time.perf_counter()
+    process = subprocess.Popen([executable, *args], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        returncode, peak_rss = engine.wait_for_exit(process)
+    finally:
+        timer.cancel()
+    return time.perf_counter() - start, peak_rss, returncode
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples):
+    times = [s[0] for s in samples]
+    rss = [s[1] for s in samples if s[1]]
+    return {
+        "runs": len(samples),
+        "failures": sum(1 for s in samples if s[2] != 0),
+        "p50": round(percentile(times, 50), 4),
+        "p95": round(percentile(times, 95), 4),
+        "min": round(min(times), 4),
+        "max": round(max(times), 4),
+        "peak_rss": max(rss) if rss else None,
+    }
+
+
+def benchmark(artifact, runs=10, args=(), timeout=60, warmup=1, log=print):
+    """Benchmarks the executable in `artifact` cold and warm; returns a result dict."""
+    executable = executable_path(artifact)
+    if not os.path.exists(executable):
+        raise FileNotFoundError(f"Executable not found: {executable}")
+
+    # A cached-extraction build runs from its unpacked copy, which must go cold too.
+    import py2win_extract
+    extracted = py2win_extract.extraction_dir(executable) if os.path.isfile(artifact) else None
+    cold = []
+    cold_supported = True
+    for _ in range(runs):
+        cold_supported = evict_page_cache(artifact) and cold_supported
+        if extracted:
+            evict_page_cache(extracted)
+        cold.append(run_once(executable, args, timeout))
+    for _ in range(warmup):
+        run_once(executable, args, timeout)
+    warm = [run_once(executable, args, timeout) for _ in range(runs)]
+
+    result = {
+        "created": time.time(),
+        "artifact": os.path.abspath(artifact),
+        "size": engine.path_size(artifact),
+        "args": list(args),
+        "cold_eviction": cold_supported,
+        "cold": summarize(cold),
+        "warm": summarize(warm),
+    }
+    if result["cold"]["failures"] or result["warm"]["failures"]:
+        log(f"Warning: {executable} exited with a non-zero code in some runs.")
+    return result
+
+
+def build_and_benchmark(profile, layouts=("onefile",), runs=10, args=None, timeout=60, output_dir=".", force=False, log=print):
+    """Builds `profile` once per layout (a key of LAYOUTS or OPTIMIZATIONS)
+    and benchmarks each build."""
+    if args is None:
+        args = profile.get("bench_args", [])
+    name = engine.profile_name(profile)
+    results = {}
+    for layout in layouts:
+        variant = dict(profile, **(LAYOUTS.get(layout) or OPTIMIZATIONS[layout]))
+        variant.pop("matrix", None)
+        if len(layouts) > 1:
+            # Distinct names give each layout its own work directory and cache entry.
+            variant["name"] = f"{name}_{layout}"
+        distpath = os.path.join(os.path.abspath(output_dir), "dist", variant.get("name", name))
+        log(f"Building {layout} layout...")
+        build = engine.run_build(variant, log=lambda line: None, distpath=distpath, force=force, store=False)
+        if not build.successful:
+            raise RuntimeError(f"{layout} build failed: {build.error or f'exit code {build.returncode}'}")
+        log(f"Benchmarking {layout} layout ({runs} cold + {runs} warm runs)...")
+        result = benchmark(build.artifact_path, runs=runs, args=args, timeout=timeout, log=log)
+        result["layout"] = layout
+        result["build_time"] = round(build.wall_time, 3)
+        if layout in OPTIMIZATIONS:
+            result["options"] = OPTIMIZATIONS[layout]
+            optimized = build.extra.get("optimize")
+            if optimized:
+                result["optimize"] = {key: optimized[key] for key in ("before", "after", "wall_time", "notes")}
+        results[layout] = result
+    return results
+
+
+def results_path(profile_path):
+    return os.path.splitext(profile_path)[0] + ".bench.json"
+
+
+def load_results(profile_path):
+    try:
+        with open(results_path(profile_path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_results(profile_path, results):
+    history = load_results(profile_path)
+    history.extend(results.values())
+    with open(results_path(profile_path), 'w') as f:
+        json.dump(history, f, indent=4)
+    return history
+
+
+def find_regressions(history, results):
+    """Compares each new result with the previous run of the same layout."""
+    messages = []
+    for layout, result in results.items():
+        previous = [r for r in history if r.get("layout") == layout and r["created"] < result["created"]]
+        if not previous:
+            continue
+        last = previous[-1]
+        for mode in ("cold", "warm"):
+            before, after = last[mode]["p50"], result[mode]["p50"]
+            if before and after > before * REGRESSION_FACTOR:
+                messages.append(f"Regression: {layout} {mode} p50 went from {before * 1000:.0f} ms to {after * 1000:.0f} ms ({after / before:.1f}x)")
+    return messages
+
+
+def format_results(results):
+    columns = ["Layout", "Size", "Cold p50", "Cold p95", "Warm p50", "Warm p95", "Peak RSS"]
+    rows = [columns]
+    for layout, r in results.items():
+        rss = max(filter(None, (r["cold"]["peak_rss"], r["warm"]["peak_rss"])), default=None)
+        rows.append([
+            layout,
+            engine.format_size(r["size"]),
+            f"{r['cold']['p50'] * 1000:.0f} ms",
+            f"{r['cold']['p95'] * 1000:.0f} ms",
+            f"{r['warm']['p50'] * 1000:.0f} ms",
+            f"{r['warm']['p95'] * 1000:.0f} ms",
+            engine.format_size(rss) if rss else "-",
+        ])
+    lines = [engine.format_table(rows)]
+    if not all(r["cold_eviction"] for r in results.values()):
+        lines.append("Note: this platform cannot evict files from the page cache; cold runs may be partly warm.")
+    return "\n".join(lines)
@@ -0,0 +1,195 @@
+"""
+Py2Win Cache - Content-hash incremental build cache.
+
+A profile's fingerprint covers everything that can change the produced
+executable: the entry script and the local modules it imports, the icon,
+every bundled data file (via the data manifest), the build options, and the PyInstaller and Python
+versions doing the build. When a fingerprint has been built before, the
+stored artifact is copied back into dist/ instead of running PyInstaller.
+
+Cache entries live under <PY2WIN_HOME>/cache/<fingerprint>/ and are evicted
+least-recently-used first once the cache grows past its size limit.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+from functools import lru_cache
+
+import py2win_analyze
+import py2win_data
+import py2win_engine as engine
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+FINGERPRINT_OPTIONS = ("name", "is_windowed", "is_onefile", "excludes", "hidden_imports", "cached_extraction", "upx", "upx_dir", "upx_exclude", "strip", "optimize")
+CHUNK_SIZE = 1024 * 1024
+
+
+def cache_dir():
+    return engine.data_dir("cache")
+
+
+@lru_cache(maxsize=None)
+def toolchain_info():
+    """Returns the PyInstaller and Python versions that `pyinstaller` runs with."""
+    pyinstaller = shutil.which("pyinstaller")
+    if not pyinstaller:
+        raise FileNotFoundError("pyinstaller command not found")
+    pyinstaller = os.path.realpath(pyinstaller)
+    version = subprocess.run([pyinstaller, "--version"], capture_output=True, text=True, check=True).stdout.strip()
+    # Console scripts live next to the interpreter they were installed for.
+    python = os.path.join(os.path.dirname(pyinstaller), "python.exe" if os.name == 'nt' else "python")
+    if os.path.exists(python):
+        python_version = subprocess.run([python, "-c", "import sys; print(sys.version)"], capture_output=True, text=True, check=True).stdout.strip()
+    else:
+        python_version = sys.version
+    return {"pyinstaller_path": pyinstaller, "pyinstaller": version, "python": python_version}
+
+
+def hash_file(path, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+
+def fingerprint(profile, manifest=None):
+    """Returns the cache key of `profile`; `manifest` is its data manifest,
+    if one was already built."""
+    digest = hashlib.sha256()
+    options = {key: profile.get(key) for key in FINGERPRINT_OPTIONS}
+    options["name"] = engine.profile_name(profile)
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    if profile.get("requirements"):
+        import py2win_envs
+        # The environment key covers the requirements and the interpreter.
+        digest.update(f"\0environment\0{py2win_envs.environment_key(profile)}".encode())
+    else:
+        digest.update(json.dumps(toolchain_info(), sort_keys=True).encode())
+
+    def add_file(label, path):
+        digest.update(f"\0{label}\0".encode())
+        hash_file(path, digest)
+
+    script_dir = os.path.dirname(os.path.abspath(profile["script_path"]))
+    for path in py2win_analyze.local_modules(profile["script_path"]):
+        add_file(os.path.relpath(path, script_dir), path)
+
+    icon_path = profile.get("icon_path")
+    if icon_path and os.path.exists(icon_path):
+        add_file("icon", icon_path)
+
+    if profile.get("upx"):
+        import py2win_optimize
+        upx = py2win_optimize.upx_executable(profile)
+        if upx:
+            st = os.stat(upx)
+            digest.update(f"\0upx\0{os.path.realpath(upx)}\0{st.st_size}\0{st.st_mtime_ns}".encode())
+
+    if profile.get("cached_extraction"):
+        import py2win_extract
+        add_file("launcher", py2win_extract.LAUNCHER_SCRIPT)
+
+    if profile.get("data_paths"):
+        # The manifest already holds a content hash for every bundled file.
+        manifest = manifest or py2win_data.build_manifest(profile)
+        for dest in sorted(manifest.files):
+            digest.update(f"\0data\0{dest}\0{manifest.files[dest][2]}".encode())
+    return digest.hexdigest()
+
+
+def _copy(src, dst):
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    elif os.path.lexists(dst):
+        os.remove(dst)
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src, dst, symlinks=True)
+    else:
+        shutil.copy2(src, dst)
+
+
+class BuildCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or cache_dir()
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _read_meta(self, entry_dir):
+        with open(os.path.join(entry_dir, "entry.json"), 'r') as f:
+            return json.load(f)
+
+    def _write_meta(self, entry_dir, meta):
+        tmp_path = os.path.join(entry_dir, "entry.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=4)
+        os.replace(tmp_path, os.path.join(entry_dir, "entry.json"))
+
+    def restore(self, key, destination):
+        """Copies a cached artifact to `destination`; returns False on a miss."""
+        entry_dir = self._entry_dir(key)
+        try:
+            meta = self._read_meta(entry_dir)
+        except (OSError, ValueError):
+            return False
+        stored = os.path.join(entry_dir, "artifact", meta["artifact"])
+        if not os.path.exists(stored):
+            return False
+        _copy(stored, destination)
+        meta["last_used"] = time.time()
+        self._write_meta(entry_dir, meta)
+        return True
+
+    def store(self, key, artifact):
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        name = os.path.basename(artifact)
+        _copy(artifact, os.path.join(tmp_dir, "artifact", name))
+        now = time.time()
+        self._write_meta(tmp_dir, {"artifact": name, "size": engine.path_size(artifact), "created": now, "last_used": now})
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same key first; its copy is identical.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                meta = self._read_meta(entry.path)
+            except (OSError, ValueError):
+                continue
+            meta["key"] = entry.name
+            entries.append(meta)
+        return entries
+
+    def evict(self, max_bytes=None):
+        """Removes least-recently-used entries until the cache fits in `max_bytes`."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e.get("last_used", 0))
+        total = sum(e.get("size", 0) for e in entries)
+        removed = []
+        while entries and total > max_bytes:
+            entry = entries.pop(0)
+            shutil.rmtree(self._entry_dir(entry["key"]), ignore_errors=True)
+            total -= entry.get("size", 0)
+            removed.append(entry["key"])
+        return removed
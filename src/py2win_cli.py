@@ -0,0 +1,389 @@
+"""
+Py2Win CLI - Headless command-line front end for the Py2Win build engine.
+
+Usage:
+  python py2win_cli.py build profile1.json profile2.json ... [--workers N] [--output-dir DIR]
+  python py2win_cli.py workdirs list
+  python py2win_cli.py workdirs prune [--max-age DAYS] [--max-size MB]
+  python py2win_cli.py workdirs clean profile.json ...
+  python py2win_cli.py history profile.json [--limit N] [--json]
+  python py2win_cli.py bench profile.json [--runs N] [--compare | --compare-optimize] [--args ...]
+  python py2win_cli.py analyze profile.json [--apply]
+  python py2win_cli.py daemon start|stop|status|serve
+  python py2win_cli.py watch profile.json [--debounce SECONDS]
+  python py2win_cli.py store list|prune|checkout [NAME | BUILD DEST] [--keep N]
+  python py2win_cli.py diff OLD NEW
+  python py2win_cli.py delta OLD NEW -o update.zip
+  python py2win_cli.py apply-delta update.zip TARGET
+  python py2win_cli.py envs list|prune|clean [--keep N] [--max-size MB]
+  python py2win_cli.py events profile.json [--distpath DIR] [--force]
+
+Each profile is built in its own worker process with an isolated
+dist/<name> directory under the output directory and its own persistent
+PyInstaller work directory under ~/.py2win/work. Full
+PyInstaller logs are written to logs/<name>.log and a per-profile summary
+is printed once all builds have finished. Profiles whose inputs are
+unchanged since a previous build are restored from the build cache; pass
+--force to rebuild them anyway. Every build writes a JSON report with
+per-phase timings next to its artifact; `history` lists a profile's past
+reports and points out phases that regressed. `bench` measures the startup
+latency of the produced executable and can compare one-file, one-dir and
+cached-extraction builds of the same profile, or builds with and without
+the size optimisations ("strip", "upx", "optimize"). Profiles with a "matrix" build all their
+variants in one PyInstaller run. `analyze` reports which packages the script
+pulls in and suggests modules to exclude or add as hidden imports.
+`daemon start` launches a background build server that keeps PyInstaller
+warm; while it runs, builds are handed to it instead of starting a new
+PyInstaller process each time. `watch` rebuilds a profile whenever its
+code or data changes, until interrupted with Ctrl+C. Successful builds are
+kept in a content-addressed artifact store; `diff` compares two of them
+(or folders on disk) and `delta` writes a package with only the changed
+files, which `apply-delta` installs over the older build. Profiles that
+name a "requirements" file are built in a cached virtual environment
+installed from a local wheelhouse; `envs` lists and evicts those.
+`events` builds a profile and prints its build events as JSON lines, for
+tools that follow builds without linking against Py2Win.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import py2win_analyze
+import py2win_bench
+import py2win_daemon
+import py2win_engine as engine
+import py2win_envs
+import py2win_events
+import py2win_report
+import py2win_store
+import py2win_watch
+import py2win_workdirs
+
+
+def cmd_build(args):
+    profiles = [engine.load_profile(path) for path in args.profiles]
+
+    def on_result(result):
+        status = "ok" if result.successful else "FAILED"
+        print(f"[{status}] {result.name} ({result.wall_time:.1f}s)", flush=True)
+
+    print(f"Building {len(profiles)} profile(s) with up to {args.workers or 'all'} worker(s)...", flush=True)
+    results = engine.build_many(profiles, workers=args.workers, output_dir=args.output_dir, on_result=on_result, use_cache=not args.no_cache, force=args.force, use_daemon=not args.no_daemon, store=not args.no_store)
+    print()
+    print(engine.format_summary(results))
+    return 0 if all(r.successful for r in results) else 1
+
+
+def cmd_workdirs(args):
+    manager = py2win_workdirs.WorkDirManager()
+    if args.action == "list":
+        entries = manager.usage()
+        if not entries:
+            print("No work directories.")
+            return 0
+        for entry in entries:
+            age_days = (time.time() - entry["last_used"]) / 86400
+            print(f"{engine.format_size(entry['size']):>10}  {age_days:6.1f}d  PyInstaller {entry['pyinstaller']:<8}  {entry['id']}")
+        print(f"{engine.format_size(sum(e['size'] for e in entries)):>10}  total in {manager.root}")
+    elif args.action == "prune":
+        max_bytes = args.max_size * 1024 * 1024 if args.max_size is not None else None
+        removed = manager.evict(max_age_days=args.max_age, max_bytes=max_bytes)
+        for entry in removed:
+            print(f"Removed {entry['id']} ({engine.format_size(entry['size'])})")
+        print(f"Freed {engine.format_size(sum(e['size'] for e in removed))}.")
+    elif args.action == "clean":
+        for path in args.profiles:
+            profile = engine.load_profile(path)
+            removed = manager.remove(profile)
+            print(f"{'Removed' if removed else 'No work directory for'} {py2win_workdirs.profile_id(profile)}")
+    return 0
+
+
+def cmd_history(args):
+    profile = engine.load_profile(args.profile)
+    targets = py2win_report.history_profiles(profile)
+    histories = [(engine.profile_name(t), py2win_report.load_history(t, limit=args.limit)) for t in targets]
+    if args.json:
+        print(json.dumps([report for _, reports in histories for report in reports], indent=4))
+    else:
+        for name, reports in histories:
+            if len(histories) > 1:
+                print(f"\n{name}")
+            print(py2win_report.format_history(reports))
+    return 0
+
+
+def cmd_bench(args):
+    profile = engine.load_profile(args.profile)
+    if args.compare:
+        layouts = tuple(py2win_bench.LAYOUTS)
+    elif args.compare_optimize:
+        layouts = tuple(py2win_bench.OPTIMIZATIONS)
+    elif profile.get("is_onefile"):
+        layouts = ("cached" if profile.get("cached_extraction") else "onefile",)
+    else:
+        layouts = ("onedir",)
+    results = py2win_bench.build_and_benchmark(profile, layouts=layouts, runs=args.runs, args=args.args, timeout=args.timeout, output_dir=args.output_dir, force=args.force)
+    history = py2win_bench.save_results(args.profile, results)
+    print()
+    print(py2win_bench.format_results(results))
+    regressions = py2win_bench.find_regressions(history, results)
+    for message in regressions:
+        print(message)
+    print(f"Results appended to {py2win_bench.results_path(args.profile)}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+def cmd_analyze(args):
+    profile = engine.load_profile(args.profile)
+    start = time.perf_counter()
+    analysis = py2win_analyze.analyze(profile)
+    print(py2win_analyze.format_analysis(analysis))
+    print(f"\nAnalysis took {(time.perf_counter() - start) * 1000:.0f} ms.")
+    if args.apply and analysis["suggestions"]:
+        # Update the saved profile as-is, so relative paths stay relative.
+        with open(args.profile, 'r') as f:
+            settings = json.load(f)
+        py2win_analyze.apply_suggestions(settings, analysis["suggestions"])
+        with open(args.profile, 'w') as f:
+            json.dump(settings, f, indent=4)
+        print(f"Applied {len(analysis['suggestions'])} suggestion(s) to {args.profile}")
+    return 0
+
+
+def cmd_daemon(args):
+    if args.action == "serve":
+        return py2win_daemon.main()
+    if args.action == "start":
+        try:
+            client = py2win_daemon.start()
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(py2win_daemon.format_stats(client.stats()))
+    elif args.action == "stop":
+        print("Build daemon stopped." if py2win_daemon.stop() else "No build daemon is running.")
+    elif args.action == "status":
+        client = py2win_daemon.connect()
+        if not client:
+            print("No build daemon is running.")
+            return 1
+        stats = client.stats()
+        print(json.dumps(stats, indent=4) if args.json else py2win_daemon.format_stats(stats))
+    return 0
+
+
+def cmd_watch(args):
+    profile = engine.load_profile(args.profile)
+    watcher = py2win_watch.Watcher(profile, debounce=args.debounce, distpath=args.distpath)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print(f"\nStopped watching after {watcher.builds} build(s) and {watcher.data_updates} data update(s).")
+    return 0
+
+
+def cmd_store(args):
+    store = py2win_store.ArtifactStore()
+    if args.action == "list":
+        builds = store.builds(args.refs[0] if args.refs else None)
+        if not builds:
+            print("No stored builds.")
+            return 0
+        rows = [("Build", "Profile", "Stored", "Files", "Size")]
+        for b in builds:
+            rows.append((b["id"], b.get("name", "?"), time.strftime("%Y-%m-%d %H:%M", time.localtime(b["created"])), str(len(b["files"])), engine.format_size(b["size"])))
+        print(engine.format_table(rows))
+        logical, stored = store.usage()
+        print(f"{len(builds)} build(s), {engine.format_size(logical)} in total, {engine.format_size(stored)} on disk in {store.root}")
+    elif args.action == "prune":
+        freed = store.prune(keep=args.keep)
+        print(f"Freed {engine.format_size(freed)}.")
+    elif args.action == "checkout":
+        if len(args.refs) != 2:
+            print("Usage: store checkout BUILD DESTINATION", file=sys.stderr)
+            return 2
+        manifest = store.resolve(args.refs[0])
+        store.checkout(manifest, args.refs[1])
+        print(f"Checked out build {manifest['id']} to {args.refs[1]}")
+    return 0
+
+
+def cmd_diff(args):
+    store = py2win_store.ArtifactStore()
+    try:
+        old, new = store.resolve(args.old), store.resolve(args.new)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    result = py2win_store.diff(old, new)
+    if args.json:
+        print(json.dumps({"old": old["id"], "new": new["id"], "added": result.added, "removed": result.removed, "changed": result.changed,
+                          "delta_bytes": result.delta_bytes, "transfer_bytes": result.transfer_bytes}, indent=4))
+    else:
+        print(py2win_store.format_diff(result, limit=args.limit))
+    return 0
+
+
+def cmd_delta(args):
+    store = py2win_store.ArtifactStore()
+    try:
+        old, new = store.resolve(args.old), store.resolve(args.new)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    result = store.write_delta(old, new, args.output)
+    print(f"Wrote {args.output} ({engine.format_size(os.path.getsize(args.output))}): {len(result.added)} added, "
+          f"{len(result.changed)} changed, {len(result.removed)} removed; the full build is {engine.format_size(new['size'])}.")
+    return 0
+
+
+def cmd_apply_delta(args):
+    try:
+        py2win_store.apply_delta(args.package, args.target)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_envs(args):
+    envs = py2win_envs.EnvironmentCache()
+    if args.action == "list":
+        entries = envs.entries()
+        if not entries:
+            print("No build environments.")
+            return 0
+        rows = [("Environment", "Last used", "PyInstaller", "Size", "Requirements")]
+        for e in entries:
+            rows.append((e["key"], time.strftime("%Y-%m-%d %H:%M", time.localtime(e.get("last_used", 0))), e.get("pyinstaller_version", "?"), engine.format_size(e.get("size", 0)), e.get("requirements", "?")))
+        print(engine.format_table(rows))
+        print(f"{engine.format_size(sum(e.get('size', 0) for e in entries))} in total in {envs.root}")
+    else:
+        max_bytes = args.max_size * 1024 * 1024 if args.max_size is not None else None
+        removed = envs.evict(max_envs=0 if args.action == "clean" else args.keep, max_bytes=max_bytes)
+        for entry in removed:
+            print(f"Removed {entry['key']} ({engine.format_size(entry.get('size', 0))})")
+        print(f"Freed {engine.format_size(sum(e.get('size', 0) for e in removed))}.")
+    return 0
+
+
+def cmd_events(args):
+    profile = engine.load_profile(args.profile)
+
+    async def stream():
+        successful = False
+        async for event in py2win_events.build(profile, distpath=args.distpath, force=args.force, use_daemon=not args.no_daemon):
+            print(json.dumps(event.to_dict()), flush=True)
+            if isinstance(event, py2win_events.Finished):
+                successful = event.successful
+        return successful
+
+    return 0 if asyncio.run(stream()) else 1
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog="py2win", description="Build Python scripts into executables from Py2Win profiles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build one or more saved profiles in parallel.")
+    build_parser.add_argument("profiles", nargs="+", help="Profile JSON files saved by Py2Win.")
+    build_parser.add_argument("-j", "--workers", type=int, default=None, help="Number of parallel builds (default: number of cores).")
+    build_parser.add_argument("-o", "--output-dir", default=".", help="Directory that receives dist/, build/ and logs/.")
+    build_parser.add_argument("--force", action="store_true", help="Rebuild even if an identical build is cached.")
+    build_parser.add_argument("--no-cache", action="store_true", help="Neither read from nor write to the build cache.")
+    build_parser.add_argument("--no-daemon", action="store_true", help="Start a new PyInstaller process even if the build daemon is running.")
+    build_parser.add_argument("--no-store", action="store_true", help="Do not add the builds to the artifact store.")
+    build_parser.set_defaults(func=cmd_build)
+
+    workdirs_parser = subparsers.add_parser("workdirs", help="Inspect and evict persistent PyInstaller work directories.")
+    workdirs_parser.add_argument("action", choices=("list", "prune", "clean"))
+    workdirs_parser.add_argument("profiles", nargs="*", help="Profiles whose work directories to remove (for 'clean').")
+    workdirs_parser.add_argument("--max-age", type=float, default=None, help="Remove work directories unused for this many days.")
+    workdirs_parser.add_argument("--max-size", type=float, default=None, help="Then remove the least recently used until the total is below this many MB.")
+    workdirs_parser.set_defaults(func=cmd_workdirs)
+
+    history_parser = subparsers.add_parser("history", help="Show past build reports and phase timings for a profile.")
+    history_parser.add_argument("profile", help="Profile JSON file.")
+    history_parser.add_argument("-n", "--limit", type=int, default=20, help="Number of most recent builds to show.")
+    history_parser.add_argument("--json", action="store_true", help="Print the raw reports as JSON.")
+    history_parser.set_defaults(func=cmd_history)
+
+    bench_parser = subparsers.add_parser("bench", help="Build a profile and benchmark the startup time of the executable.")
+    bench_parser.add_argument("profile", help="Profile JSON file.")
+    bench_parser.add_argument("-n", "--runs", type=int, default=10, help="Number of cold and of warm runs.")
+    bench_parser.add_argument("--compare", action="store_true", help="Build and benchmark the one-file, one-dir and cached-extraction layouts.")
+    bench_parser.add_argument("--compare-optimize", action="store_true", help="Build and benchmark the profile without and with strip, UPX and bytecode optimisation.")
+    bench_parser.add_argument("--args", nargs=argparse.REMAINDER, default=None, help="Arguments passed to the executable (default: the profile's bench_args).")
+    bench_parser.add_argument("--timeout", type=float, default=60, help="Seconds before a run is killed.")
+    bench_parser.add_argument("-o", "--output-dir", default=".", help="Directory that receives dist/.")
+    bench_parser.add_argument("--force", action="store_true", help="Rebuild even if an identical build is cached.")
+    bench_parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when startup regressed since the last run.")
+    bench_parser.set_defaults(func=cmd_bench)
+
+    analyze_parser = subparsers.add_parser("analyze", help="Analyse a profile's imports and suggest excludes and hidden imports.")
+    analyze_parser.add_argument("profile", help="Profile JSON file.")
+    analyze_parser.add_argument("--apply", action="store_true", help="Store all suggestions in the profile.")
+    analyze_parser.set_defaults(func=cmd_analyze)
+
+    daemon_parser = subparsers.add_parser("daemon", help="Start, stop or query the warm build daemon.")
+    daemon_parser.add_argument("action", choices=("start", "stop", "status", "serve"), help="'serve' runs the daemon in the foreground.")
+    daemon_parser.add_argument("--json", action="store_true", help="Print the status as JSON.")
+    daemon_parser.set_defaults(func=cmd_daemon)
+
+    watch_parser = subparsers.add_parser("watch", help="Rebuild a profile automatically whenever its code or data changes.")
+    watch_parser.add_argument("profile", help="Profile JSON file.")
+    watch_parser.add_argument("--debounce", type=float, default=py2win_watch.DEFAULT_DEBOUNCE, help="Seconds without further changes before rebuilding.")
+    watch_parser.add_argument("--distpath", default="dist", help="Directory that receives the executable.")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    store_parser = subparsers.add_parser("store", help="List, prune or check out builds in the artifact store.")
+    store_parser.add_argument("action", choices=("list", "prune", "checkout"))
+    store_parser.add_argument("refs", nargs="*", help="A profile name (for 'list'), or a build and a destination (for 'checkout').")
+    store_parser.add_argument("--keep", type=int, default=py2win_store.KEEP_BUILDS, help="Builds to keep per profile (for 'prune').")
+    store_parser.set_defaults(func=cmd_store)
+
+    ref_help = "A build id or prefix, a profile name (its latest build), name~N (the Nth build before it) or a file or folder on disk."
+    diff_parser = subparsers.add_parser("diff", help="List the files added, removed and changed between two builds.")
+    diff_parser.add_argument("old", help=ref_help)
+    diff_parser.add_argument("new", help=ref_help)
+    diff_parser.add_argument("-n", "--limit", type=int, default=None, help="Show at most this many files.")
+    diff_parser.add_argument("--json", action="store_true", help="Print the differences as JSON.")
+    diff_parser.set_defaults(func=cmd_diff)
+
+    delta_parser = subparsers.add_parser("delta", help="Write a package with only the files that changed between two builds.")
+    delta_parser.add_argument("old", help=ref_help)
+    delta_parser.add_argument("new", help=ref_help)
+    delta_parser.add_argument("-o", "--output", required=True, help="Package file to write.")
+    delta_parser.set_defaults(func=cmd_delta)
+
+    apply_parser = subparsers.add_parser("apply-delta", help="Update a copy of the older build with a delta package.")
+    apply_parser.add_argument("package", help="Package written by 'delta'.")
+    apply_parser.add_argument("target", help="The build folder, or the executable of a one-file build.")
+    apply_parser.set_defaults(func=cmd_apply_delta)
+
+    envs_parser = subparsers.add_parser("envs", help="List or evict the cached build environments of profiles with requirements.")
+    envs_parser.add_argument("action", choices=("list", "prune", "clean"))
+    envs_parser.add_argument("--keep", type=int, default=py2win_envs.MAX_ENVS, help="Environments to keep when pruning, most recently used first.")
+    envs_parser.add_argument("--max-size", type=float, default=None, help="Then remove the least recently used until the total is below this many MB.")
+    envs_parser.set_defaults(func=cmd_envs)
+
+    events_parser = subparsers.add_parser("events", help="Build a profile and print its build events as JSON lines.")
+    events_parser.add_argument("profile", help="Profile JSON file.")
+    events_parser.add_argument("--distpath", default="dist", help="Directory that receives the executable.")
+    events_parser.add_argument("--force", action="store_true", help="Rebuild even if an identical build is cached.")
+    events_parser.add_argument("--no-daemon", action="store_true", help="Start a new PyInstaller process even if the build daemon is running.")
+    events_parser.set_defaults(func=cmd_events)
+    return parser
+
+
+def main(argv=None):
+    args = make_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+Py2Win Daemon - A long-lived build server that keeps PyInstaller warm.
+
+Every normal build starts a fresh `pyinstaller` process, which pays for
+interpreter start-up, PyInstaller's imports and, above all, for building
+the module graph of the standard library (base_library.zip) from scratch.
+The daemon does that work once:
+
+- on start it imports PyInstaller, reads its configuration and builds the
+  base module graph, which PyInstaller then caches in memory;
+- every build runs PyInstaller's Python API in a worker forked from the
+  warm daemon, so it starts with all of that already in memory and copies
+  nothing. Each worker is its own process group and can be killed with
+  all of its helpers;
+- log lines and the result stream back to the client as JSON events over a
+  local socket, one event per line;
+- a "stats" request reports how many builds have run and their latency.
+
+Builds use the daemon automatically while it is running. The base module
+graph is only reused by profiles without excluded modules; the others
+still save the interpreter start-up and imports.
+
+The daemon needs fork() and Unix sockets, so it is not available on Windows,
+where builds always run as separate processes.
+
+Usage:
+  python py2win_daemon.py            (or: py2win_cli.py daemon start|stop|status)
+"""
+import io
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import logging
+import selectors
+import threading
+import traceback
+import subprocess
+
+import py2win_engine as engine
+
+
+CONNECT_TIMEOUT = 0.5
+START_TIMEOUT = 60
+
+
+def is_supported():
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def socket_path():
+    return engine.data_dir("daemon.sock")
+
+
+def log_path():
+    return engine.data_dir("daemon.log")
+
+
+def _send(conn, event):
+    conn.sendall((json.dumps(event) + "\n").encode("utf-8"))
+
+
+def _kill_group(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        # The worker may not have become a process group leader yet.
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+class BuildDaemon:
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.started = time.time()
+        self.ready = threading.Event()
+        self.warm_up_time = None
+        self.builds = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self.active = 0
+        self._pyinstaller = None
+        self._config = None
+        self._fork_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._server = None
+
+    def say(self, message):
+        # The fork lock also guards the daemon's own output, so a worker is
+        # never forked while another thread holds the lock of sys.stdout.
+        with self._fork_lock:
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def warm_up(self):
+        start = time.perf_counter()
+        import PyInstaller.__main__
+        import PyInstaller.building.build_main
+        from PyInstaller import configure
+        from PyInstaller.depend.analysis import initialize_modgraph
+        self._pyinstaller = PyInstaller.__main__
+        self._config = configure.get_config(upx_dir=None)
+        with self._fork_lock:
+            initialize_modgraph()
+        self.warm_up_time = time.perf_counter() - start
+        self.ready.set()
+        self.say(f"Warm-up finished in {self.warm_up_time:.1f}s")
+
+    def _request_config(self, args):
+        # PyInstaller ignores --upx-dir when it is given a config, and UPX may
+        # have been installed since the warm-up, so the UPX part is per build.
+        from PyInstaller import configure
+        upx_dir = None
+        for i, arg in enumerate(args):
+            if arg.startswith("--upx-dir="):
+                upx_dir = arg.split("=", 1)[1]
+            elif arg == "--upx-dir" and i + 1 < len(args):
+                upx_dir = args[i + 1]
+        return configure.get_config(upx_dir=upx_dir)
+
+    def serve_forever(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            if connect(self.path):
+                raise RuntimeError(f"A build daemon is already running at {self.path}")
+            os.remove(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._server.listen()
+        self.say(f"Py2Win build daemon (pid {os.getpid()}) listening on {self.path}")
+        threading.Thread(target=self.warm_up, daemon=True).start()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            self._server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.say("Build daemon stopped")
+
+    def stop(self):
+        self._stopping.set()
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "pid": os.getpid(),
+                "uptime": round(time.time() - self.started, 1),
+                "ready": self.ready.is_set(),
+                "warm_up_time": round(self.warm_up_time, 3) if self.warm_up_time else None,
+                "builds": self.builds,
+                "failures": self.failures,
+                "active": self.active,
+                "average_latency": round(self.total_latency / self.builds, 3) if self.builds else None,
+                "last_latency": round(self.last_latency, 3) if self.last_latency is not None else None,
+            }
+
+    def _handle(self, conn):
+        try:
+            with conn, conn.makefile("r", encoding="utf-8") as reader:
+                request = json.loads(reader.readline() or "{}")
+                op = request.get("op")
+                if op == "stats":
+                    _send(conn, dict(self.stats(), event="stats"))
+                elif op == "shutdown":
+                    _send(conn, {"event": "bye"})
+                    self.stop()
+                elif op == "build":
+                    self._build(conn, request)
+                else:
+                    _send(conn, {"event": "error", "message": f"Unknown request: {op!r}"})
+        except (OSError, ValueError):
+            pass
+
+    def _build(self, conn, request):
+        self.ready.wait()
+        read_fd, write_fd = os.pipe()
+        start = time.perf_counter()
+        with self._fork_lock:
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                self._run_worker(write_fd, request, conn)
+        os.close(write_fd)
+        with self._stats_lock:
+            self.active += 1
+        _send(conn, {"event": "started", "pid": pid})
+
+        cancelled = False
+        pending = b""
+        selector = selectors.DefaultSelector()
+        selector.register(read_fd, selectors.EVENT_READ)
+        selector.register(conn, selectors.EVENT_READ)
+        try:
+            while read_fd in selector.get_map():
+                for key, _ in selector.select():
+                    if key.fileobj is conn:
+                        # The client only ever closes the connection: cancel.
+                        if not conn.recv(1024):
+                            cancelled = True
+                            _kill_group(pid)
+                            selector.unregister(conn)
+                        continue
+                    data = os.read(read_fd, 65536)
+                    if not data:
+                        selector.unregister(read_fd)
+                        data = b"\n" if pending else b""
+                    *lines, pending = (pending + data).split(b"\n")
+                    for line in lines:
+                        if cancelled:
+                            break
+                        try:
+                            _send(conn, {"event": "log", "line": line.decode("utf-8", "replace")})
+                        except OSError:
+                            cancelled = True
+                            _kill_group(pid)
+        finally:
+            selector.close()
+            os.close(read_fd)
+            _, status, rusage = os.wait4(pid, 0)
+            latency = time.perf_counter() - start
+            returncode = os.waitstatus_to_exitcode(status)
+            with self._stats_lock:
+                self.active -= 1
+                self.builds += 1
+                self.failures += returncode != 0
+                self.total_latency += latency
+                self.last_latency = latency
+        self.say(f"Build {pid} {'cancelled' if cancelled else f'exited with {returncode}'} after {latency:.1f}s")
+        if not cancelled:
+            _send(conn, {"event": "exit", "returncode": returncode, "peak_rss": rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)})
+
+    def _run_worker(self, write_fd, request, conn):
+        # Runs in the forked worker and never returns.
+        code = 1
+        try:
+            os.setsid()
+            conn.close()
+            self._server.close()
+            os.dup2(write_fd, 1)
+            os.dup2(write_fd, 2)
+            # Drop inherited copies of other builds' pipes and connections,
+            # or their clients would not see them finish until this one does.
+            os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+            sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding="utf-8", errors="replace", line_buffering=True)
+            sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8", errors="replace", line_buffering=True)
+            for handler in logging.getLogger().handlers:
+                if isinstance(handler, logging.StreamHandler):
+                    handler.setStream(sys.stderr)
+            # PyInstaller's log lines show the time since logging was set up.
+            logging._startTime = time.time()
+            os.chdir(request.get("cwd") or os.getcwd())
+            self._pyinstaller.run(request["args"], pyi_config=self._request_config(request["args"]))
+            code = 0
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(code)
+
+
+class RemoteBuild:
+    """A build running in the daemon. It quacks like the subprocess.Popen
+    object of a local build: run_build reads its output with
+    stdout.readline() and it can be waited for and killed."""
+
+    def __init__(self, conn, reader):
+        self._conn = conn
+        self._reader = reader
+        self.stdout = self
+        self.pid = None
+        self.returncode = None
+        self.peak_rss = None
+        event = self._next_event()
+        if event.get("event") != "started":
+            raise RuntimeError(event.get("message", "The build daemon did not start the build"))
+        self.pid = event["pid"]
+
+    def _next_event(self):
+        line = self._reader.readline()
+        return json.loads(line) if line else {}
+
+    def readline(self):
+        if self.returncode is not None:
+            return ""
+        event = self._next_event()
+        if event.get("event") == "log":
+            return event["line"] + "\n"
+        if event.get("event") == "exit":
+            self.returncode, self.peak_rss = event["returncode"], event["peak_rss"]
+        else:
+            self.returncode = -signal.SIGKILL  # Connection lost or build cancelled.
+        return ""
+
+    def close(self):
+        pass
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        while self.readline():
+            pass
+        self._conn.close()
+        return self.returncode
+
+    def kill(self):
+        # Closing the connection tells the daemon to kill the build's process group.
+        try:
+            self._conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class AsyncRemoteBuild:
+    """RemoteBuild for asyncio: the same event stream from the daemon, read
+    without blocking a thread."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self.pid = None
+        self.returncode = None
+        self.peak_rss = None
+
+    async def _next_event(self):
+        line = await self._reader.readline()
+        return json.loads(line) if line else {}
+
+    async def start(self):
+        event = await self._next_event()
+        if event.get("event") != "started":
+            self._writer.close()
+            raise RuntimeError(event.get("message", "The build daemon did not start the build"))
+        self.pid = event["pid"]
+        return self
+
+    async def readline(self):
+        if self.returncode is not None:
+            return ""
+        event = await self._next_event()
+        if event.get("event") == "log":
+            return event["line"] + "\n"
+        if event.get("event") == "exit":
+            self.returncode, self.peak_rss = event["returncode"], event["peak_rss"]
+        else:
+            self.returncode = -signal.SIGKILL  # Connection lost or build cancelled.
+        return ""
+
+    async def wait(self):
+        """Returns (returncode, peak RSS) once the build has finished."""
+        while await self.readline():
+            pass
+        self._writer.close()
+        return self.returncode, self.peak_rss
+
+    def kill(self):
+        # Closing the connection tells the daemon to kill the build's process group.
+        self._writer.close()
+
+
+class DaemonClient:
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+
+    def _open(self, request, timeout=CONNECT_TIMEOUT):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(timeout)
+        conn.connect(self.path)
+        conn.settimeout(None)
+        _send(conn, request)
+        return conn, conn.makefile("r", encoding="utf-8")
+
+    def _call(self, request):
+        conn, reader = self._open(request)
+        with conn, reader:
+            conn.settimeout(5)
+            line = reader.readline()
+        return json.loads(line) if line else {}
+
+    def stats(self):
+        stats = self._call({"op": "stats"})
+        stats.pop("event", None)
+        return stats
+
+    def shutdown(self):
+        return self._call({"op": "shutdown"})
+
+    def build(self, args, cwd=None):
+        """Starts PyInstaller with `args` (without the program name) in the daemon."""
+        conn, reader = self._open({"op": "build", "args": list(args), "cwd": cwd or os.getcwd()})
+        return RemoteBuild(conn, reader)
+
+    async def open_build(self, args, cwd=None, limit=2 ** 20):
+        """Starts PyInstaller in the daemon like build(), for asyncio callers."""
+        import asyncio
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.path, limit=limit), CONNECT_TIMEOUT)
+        writer.write((json.dumps({"op": "build", "args": list(args), "cwd": cwd or os.getcwd()}) + "\n").encode("utf-8"))
+        await writer.drain()
+        return await AsyncRemoteBuild(reader, writer).start()
+
+
+def connect(path=None):
+    """Returns a client for the running daemon, or None when there is none."""
+    if not is_supported():
+        return None
+    client = DaemonClient(path)
+    if not os.path.exists(client.path):
+        return None
+    try:
+        client.stats()
+    except (OSError, ValueError):
+        return None
+    return client
+
+
+def start(wait=True):
+    """Starts the daemon in the background; returns a client once it is up."""
+    if not is_supported():
+        raise RuntimeError("The build daemon needs fork() and Unix sockets, which this platform lacks.")
+    client = connect()
+    if client:
+        return client
+    os.makedirs(os.path.dirname(log_path()), exist_ok=True)
+    with open(log_path(), "a") as log_file:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        client = connect()
+        if client and (not wait or client.stats().get("ready")):
+            return client
+        time.sleep(0.1)
+    raise RuntimeError(f"The build daemon did not start; see {log_path()}")
+
+
+def stop():
+    client = connect()
+    if not client:
+        return False
+    client.shutdown()
+    return True
+
+
+def format_stats(stats):
+    average = f"{stats['average_latency']:.1f}s" if stats.get("average_latency") is not None else "-"
+    state = "ready" if stats.get("ready") else "warming up"
+    return (f"Build daemon (pid {stats['pid']}) {state}, up {stats['uptime']:.0f}s: "
+            f"{stats['builds']} build(s), {stats['failures']} failed, {stats['active']} running, average {average}")
+
+
+def main():
+    daemon = BuildDaemon()
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
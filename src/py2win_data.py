@@ -0,0 +1,301 @@
+"""
+Py2Win Data - Data-bundle manifest with exclude globs and content dedup.
+
+Instead of handing every bundled folder to PyInstaller as one --add-data
+entry, the build expands the profile's data paths into a manifest first:
+
+- folders are walked lazily with os.scandir, skipping excluded directories
+  without descending into them;
+- include/exclude glob rules from the profile ("data_include" and
+  "data_exclude") are applied on top of the default excludes (__pycache__,
+  .git, *.pyc, ...). A pattern without a "/" matches a file or folder name
+  anywhere; a pattern with a "/" matches the path inside the bundle;
+- identical files are detected by content hash and bundled only once. A
+  persistent hash index keyed by (path, size, mtime) means unchanged files
+  are never re-read.
+
+The unique files are staged (hard-linked where possible) into the profile's
+work directory and bundled from there. Duplicates are recreated next to
+their original at startup by a small runtime hook, or directly in the
+output folder for one-dir builds.
+"""
+import os
+import json
+import shutil
+import hashlib
+import fnmatch
+
+import py2win_engine as engine
+
+
+DEFAULT_EXCLUDES = ["__pycache__", ".git", ".svn", ".hg", ".DS_Store", "Thumbs.db", "*.pyc", "*.pyo"]
+ALIASES_FILE = "py2win_data_aliases.json"
+CHUNK_SIZE = 1024 * 1024
+RUNTIME_HOOK = '''\
+# Generated by Py2Win: recreates data files that were bundled only once.
+def _py2win_restore_data_aliases():
+    import os, sys, json, shutil
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(sys.executable)))
+    try:
+        with open(os.path.join(base, "%s"), "r") as f:
+            aliases = json.load(f)
+    except (OSError, ValueError):
+        return
+    for alias, original in aliases.items():
+        target = os.path.join(base, alias)
+        if os.path.exists(target):
+            continue
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(os.path.join(base, original), target)
+            except OSError:
+                shutil.copyfile(os.path.join(base, original), target)
+        except OSError:
+            pass
+
+_py2win_restore_data_aliases()
+''' % ALIASES_FILE
+
+
+class HashIndex:
+    """Content hashes of files, keyed by (path, size, mtime)."""
+
+    def __init__(self, path=None):
+        self.path = path or engine.data_dir("hash-index.json")
+        self.dirty = False
+        try:
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def hash(self, path, st=None):
+        st = st or os.stat(path)
+        entry = self.entries.get(path)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        self.entries[path] = [st.st_size, st.st_mtime_ns, digest.hexdigest()]
+        self.dirty = True
+        return self.entries[path][2]
+
+    def save(self):
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+def _matches(rel_path, name, patterns):
+    for pattern in patterns:
+        if "/" in pattern:
+            # A leading "**/" also matches at the top of the bundle, as in glob.
+            if fnmatch.fnmatch(rel_path, pattern) or (pattern.startswith("**/") and fnmatch.fnmatch(rel_path, pattern[3:])):
+                return True
+        elif fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+
+def iter_data_files(profile, stats=None):
+    """Yields (source path, destination path in the bundle, stat) for every
+    data file of `profile` that passes its include/exclude rules."""
+    excludes = DEFAULT_EXCLUDES + list(profile.get("data_exclude", []))
+    includes = list(profile.get("data_include", []))
+    stats = stats if stats is not None else {}
+    stats.setdefault("excluded", 0)
+    for data_path in profile.get("data_paths", []):
+        source = os.path.abspath(data_path)
+        name = os.path.basename(source.rstrip("/\\"))
+        if os.path.isfile(source):
+            if includes and not _matches(name, name, includes):
+                stats["excluded"] += 1
+                continue
+            yield source, name, os.stat(source)
+            continue
+        if not os.path.isdir(source):
+            continue
+        pending = [(source, name)]
+        while pending:
+            directory, dest_dir = pending.pop()
+            try:
+                entries = sorted(os.scandir(directory), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                dest = f"{dest_dir}/{entry.name}"
+                if _matches(dest, entry.name, excludes):
+                    stats["excluded"] += 1
+                    continue
+                if entry.is_dir(follow_symlinks=True):
+                    pending.append((entry.path, dest))
+                elif entry.is_file(follow_symlinks=True):
+                    if includes and not _matches(dest, entry.name, includes):
+                        stats["excluded"] += 1
+                        continue
+                    yield entry.path, dest, entry.stat(follow_symlinks=True)
+
+
+class Manifest:
+    def __init__(self):
+        self.files = {}      # bundle path -> (source path, size, sha256)
+        self.aliases = {}    # bundle path -> bundle path of identical file
+        self.excluded = 0
+
+    @property
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.files.values())
+
+    @property
+    def saved_bytes(self):
+        return sum(self.files[dest][1] for dest in self.aliases)
+
+    @property
+    def unique_bytes(self):
+        return self.total_bytes - self.saved_bytes
+
+    def summary(self):
+        return (f"Data manifest: {len(self.files)} file(s), {engine.format_size(self.unique_bytes)} to bundle"
+                f" ({len(self.aliases)} duplicate(s) saving {engine.format_size(self.saved_bytes)},"
+                f" {self.excluded} excluded)")
+
+
+def build_manifest(profile, index=None):
+    own_index = index is None
+    index = index or HashIndex()
+    manifest = Manifest()
+    stats = {}
+    first_by_hash = {}
+    for source, dest, st in iter_data_files(profile, stats):
+        if dest in manifest.files:
+            continue  # An earlier data path already provides this file.
+        digest = index.hash(source, st)
+        manifest.files[dest] = (source, st.st_size, digest)
+        original = first_by_hash.setdefault(digest, dest)
+        if original != dest and st.st_size:
+            manifest.aliases[dest] = original
+    manifest.excluded = stats.get("excluded", 0)
+    if own_index:
+        index.save()
+    return manifest
+
+
+def _same_file(source, target):
+    try:
+        src, dst = os.stat(source), os.stat(target)
+    except OSError:
+        return False
+    if (src.st_ino, src.st_dev) == (dst.st_ino, dst.st_dev):
+        return True
+    return src.st_size == dst.st_size and src.st_mtime_ns == dst.st_mtime_ns
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def stage(manifest, stage_dir):
+    """Syncs the unique files of `manifest` into `stage_dir`, together with
+    the alias map; returns the path of the runtime hook to bundle, or None
+    when there are no duplicates."""
+    wanted = set()
+    for dest, (source, _, _) in manifest.files.items():
+        if dest in manifest.aliases:
+            continue
+        target = os.path.join(stage_dir, *dest.split("/"))
+        wanted.add(os.path.normcase(target))
+        if _same_file(source, target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target)
+        _link_or_copy(source, target)
+
+    aliases_path = os.path.join(stage_dir, ALIASES_FILE)
+    hook_path = None
+    if manifest.aliases:
+        os.makedirs(stage_dir, exist_ok=True)
+        wanted.add(os.path.normcase(aliases_path))
+        with open(aliases_path, 'w') as f:
+            json.dump(manifest.aliases, f, indent=1, sort_keys=True)
+        hook_path = os.path.join(os.path.dirname(stage_dir), "py2win_rthook_data.py")
+        with open(hook_path, 'w') as f:
+            f.write(RUNTIME_HOOK)
+
+    # Drop files that are no longer part of the manifest.
+    for root, dirs, files in os.walk(stage_dir, topdown=False):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if os.path.normcase(path) not in wanted:
+                os.remove(path)
+        if root != stage_dir and not os.listdir(root):
+            os.rmdir(root)
+    return hook_path
+
+
+def contents_dir(artifact):
+    """Returns the folder of a one-dir build that holds its bundled data."""
+    internal = os.path.join(artifact, "_internal")
+    return internal if os.path.isdir(internal) else artifact
+
+
+def materialize_aliases(manifest, artifact):
+    """Recreates duplicate files inside a one-dir build as hard links."""
+    base = contents_dir(artifact)
+    for alias, original in manifest.aliases.items():
+        target = os.path.join(base, *alias.split("/"))
+        source = os.path.join(base, *original.split("/"))
+        if os.path.exists(target) or not os.path.exists(source):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _link_or_copy(source, target)
+
+
+def update_artifact(previous, manifest, artifact):
+    """Brings the bundled data of a one-dir build made from the `previous`
+    manifest up to date with `manifest`, without rebuilding it; returns the
+    number of files written and removed."""
+    base = contents_dir(artifact)
+    written = removed = 0
+    rewritten = set()
+    for dest, (source, _, digest) in manifest.files.items():
+        if dest in manifest.aliases:
+            continue
+        old = previous.files.get(dest)
+        if old and old[2] == digest and dest not in previous.aliases:
+            continue
+        target = os.path.join(base, *dest.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Never write through: the old file may be hard-linked to a duplicate.
+        if os.path.lexists(target):
+            os.remove(target)
+        shutil.copy2(source, target)
+        rewritten.add(dest)
+        written += 1
+
+    for alias, original in manifest.aliases.items():
+        if previous.aliases.get(alias) == original and original not in rewritten:
+            continue
+        target = os.path.join(base, *alias.split("/"))
+        if os.path.lexists(target):
+            os.remove(target)
+        written += 1
+    materialize_aliases(manifest, artifact)
+
+    for dest in set(previous.files) - set(manifest.files):
+        target = os.path.join(base, *dest.split("/"))
+        if os.path.lexists(target):
+            os.remove(target)
+            removed += 1
+    return written, removed
@@ -0,0 +1,594 @@
+"""
+Py2Win Engine - The GUI-free build core shared by the Py2Win GUI and CLI.
+
+A build profile is the same dictionary the GUI saves to disk:
+
+    {
+        "script_path": "app.py",
+        "is_windowed": 0,
+        "is_onefile": 1,
+        "icon_path": "",
+        "data_paths": [],
+        "excludes": [],
+        "hidden_imports": []
+    }
+
+Features:
+- Translates a profile into a PyInstaller command line.
+- Runs a single build, streaming PyInstaller output to a callback.
+- Runs many builds in parallel across cores with a process pool, giving
+  each profile its own isolated workpath/distpath.
+- Skips PyInstaller entirely when an identical build is in the build cache.
+- Keeps a persistent PyInstaller work directory per profile so rebuilds
+  only re-analyse what changed.
+- Expands bundled data into a de-duplicated manifest before the build.
+- Times each PyInstaller phase, measures the child's peak memory and
+  writes a JSON build report next to the artifact.
+- Runs PyInstaller inside the warm build daemon when one is running.
+- Builds all variants of a profile's build matrix from one generated
+  .spec file, so the dependency analysis runs only once.
+- With "cached_extraction", turns a one-dir build into a single executable
+  that unpacks once into a per-user cache instead of on every start.
+- Adds every successful build to the content-addressed artifact store,
+  which keeps a history of builds to diff and make delta updates from.
+- Builds profiles that name a requirements file in a cached, isolated
+  virtual environment installed from a local wheelhouse.
+- Strips and UPX-compresses the binaries of one-dir builds in parallel
+  and compiles bytecode at the requested optimisation level.
+- Splits a build into prepare_build / finish_build around the PyInstaller
+  run, so py2win_events can stream the same build as asyncio events.
+
+Py2Win keeps its caches under ~/.py2win, or under $PY2WIN_HOME when set.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+from dataclasses import dataclass, field
+
+
+DEFAULT_PROFILE = {
+    "script_path": "",
+    "is_windowed": 0,
+    "is_onefile": 1,
+    "icon_path": "",
+    "data_paths": [],
+    "excludes": [],
+    "hidden_imports": [],
+    "cached_extraction": 0,
+    "requirements": "",
+}
+
+
+@dataclass
+class BuildResult:
+    name: str
+    returncode: int = -1
+    wall_time: float = 0.0
+    artifact_path: str = ""
+    artifact_size: int = 0
+    error: str = ""
+    phases: dict = field(default_factory=dict)
+    peak_rss: int = None
+    report_path: str = None
+    extra: dict = field(default_factory=dict)
+    variants: list = field(default_factory=list)
+
+    @property
+    def successful(self):
+        return self.returncode == 0 and not self.error
+
+
+def data_dir(*parts):
+    root = os.environ.get("PY2WIN_HOME") or os.path.join(os.path.expanduser("~"), ".py2win")
+    return os.path.join(root, *parts)
+
+
+def load_profile(profile_path):
+    with open(profile_path, 'r') as f:
+        settings = json.load(f)
+    profile = dict(DEFAULT_PROFILE)
+    profile.update(settings)
+    profile.setdefault("name", os.path.splitext(os.path.basename(profile_path))[0])
+    # Relative paths in a profile are relative to the profile file itself.
+    base_dir = os.path.dirname(os.path.abspath(profile_path))
+    profile["script_path"] = _resolve(base_dir, profile["script_path"])
+    profile["icon_path"] = _resolve(base_dir, profile["icon_path"])
+    profile["data_paths"] = [_resolve(base_dir, p) for p in profile["data_paths"]]
+    profile["requirements"] = _resolve(base_dir, profile["requirements"])
+    if profile.get("wheelhouse"):
+        profile["wheelhouse"] = _resolve(base_dir, profile["wheelhouse"])
+    return profile
+
+
+def _resolve(base_dir, path):
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(base_dir, path))
+
+
+def profile_name(profile):
+    name = profile.get("name")
+    if name:
+        return name
+    return os.path.splitext(os.path.basename(profile["script_path"]))[0]
+
+
+def profile_datas(profile):
+    """Returns (source, destination) pairs for bundling the profile's data paths as-is."""
+    datas = []
+    for path in profile.get("data_paths", []):
+        source_path = os.path.abspath(path)
+        if os.path.exists(source_path):
+            destination = os.path.basename(source_path) if os.path.isdir(source_path) else "."
+            datas.append((source_path, destination))
+    return datas
+
+
+def build_command(profile, distpath=None, workpath=None, specpath=None, datas=None, runtime_hooks=()):
+    command = ["pyinstaller", "--noconfirm", "--name", profile_name(profile)]
+    if profile.get("is_onefile"): command.append("--onefile")
+    if profile.get("is_windowed"): command.append("--windowed")
+    icon_path = profile.get("icon_path")
+    if icon_path and os.path.exists(icon_path): command.append(f"--icon={os.path.abspath(icon_path)}")
+    for source_path, destination in (profile_datas(profile) if datas is None else datas):
+        command.append(f'--add-data={source_path}{os.pathsep}{destination}')
+    for hook in runtime_hooks:
+        command.append(f"--runtime-hook={hook}")
+    for module in profile.get("excludes", []):
+        command.append(f"--exclude-module={module}")
+    for module in profile.get("hidden_imports", []):
+        command.append(f"--hidden-import={module}")
+    if profile.get("optimize"): command.append(f"--optimize={profile['optimize']}")
+    # One-dir builds are stripped and compressed in parallel after the build.
+    if profile.get("is_onefile") and profile.get("strip"): command.append("--strip")
+    if profile.get("is_onefile") and profile.get("upx"):
+        import py2win_optimize
+        if profile.get("upx_dir"): command.append(f"--upx-dir={profile['upx_dir']}")
+        for pattern in py2win_optimize.upx_excludes(profile):
+            command.append(f"--upx-exclude={pattern}")
+    else:
+        command.append("--noupx")
+    if distpath: command.extend(["--distpath", distpath])
+    if workpath: command.extend(["--workpath", workpath])
+    if specpath: command.extend(["--specpath", specpath])
+    command.append(profile["script_path"])
+    return command
+
+
+def artifact_path(profile, distpath):
+    name = profile_name(profile)
+    if profile.get("is_onefile"):
+        return os.path.join(distpath, name + (".exe" if os.name == 'nt' else ""))
+    return os.path.join(distpath, name)
+
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            file_path = os.path.join(root, filename)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def popen_kwargs():
+    """Popen options that put the child in its own process group, so that
+    kill_process_tree can stop PyInstaller together with its helpers."""
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_tree(process):
+    if process.poll() is not None:
+        return
+    if not isinstance(process, subprocess.Popen):
+        process.kill()  # A build in the daemon, which kills its own workers.
+        return
+    try:
+        kill_process_group(process.pid)
+    except (OSError, subprocess.SubprocessError):
+        process.kill()
+
+
+def kill_process_group(pid):
+    """Kills a child started with popen_kwargs() together with its helpers."""
+    if os.name == 'nt':
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True, creationflags=subprocess.CREATE_NO_WINDOW)
+    else:
+        os.killpg(pid, signal.SIGKILL)
+
+
+def wait_for_exit(process):
+    """Waits for `process` and returns (returncode, peak RSS in bytes or None)."""
+    if not isinstance(process, subprocess.Popen):
+        return process.wait(), process.peak_rss
+    if hasattr(os, "wait4"):
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait(), None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss covers the child and the children it waited for; it is
+        # reported in kilobytes on Linux and in bytes on macOS.
+        return process.returncode, rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    returncode = process.wait()
+    return returncode, windows_peak_rss(process)
+
+
+def windows_peak_rss(process):
+    """Peak working set of the finished child `process` (a Popen object)."""
+    if os.name != 'nt':
+        return None
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        if ctypes.windll.psapi.GetProcessMemoryInfo(int(process._handle), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def run_build(profile, log=print, distpath="dist", workpath=None, specpath=None, use_cache=True, force=False, report=True, on_process=None, use_daemon=True, store=True):
+    """Builds one profile, passing each line of PyInstaller output to `log`.
+
+    With `use_cache`, an unchanged profile is restored from the build cache
+    instead of being rebuilt; `force` always rebuilds, starting from a clean
+    work directory, and refreshes the cache. Without an explicit `workpath`
+    the profile's persistent work directory is used. With `report`, a JSON
+    build report with per-phase timings is written next to the artifact and
+    into the profile's build history. `on_process` is called with the
+    PyInstaller Popen object as soon as it has started. While the build
+    daemon is running, PyInstaller runs in it unless `use_daemon` is False.
+    With `store`, the artifact is added to the artifact store.
+    """
+    result = BuildResult(name=profile_name(profile))
+    start = time.perf_counter()
+
+    script_path = profile.get("script_path")
+    if not script_path or not os.path.exists(script_path):
+        result.error = f"Script not found: {script_path}"
+        log(f"Error: {result.error}")
+        return result
+
+    command = _run_build(profile, result, log, start, distpath, workpath, specpath, use_cache, force, on_process, use_daemon, store)
+    result.wall_time = time.perf_counter() - start
+
+    if report:
+        write_reports(profile, result, command, log)
+    return result
+
+
+def write_reports(profile, result, command, log=print):
+    import py2win_report
+    if result.variants:
+        import py2win_matrix
+        reported = zip(py2win_matrix.expand_matrix(profile), result.variants)
+    else:
+        reported = [(profile, result)]
+    for target, target_result in reported:
+        target_result.wall_time = result.wall_time
+        try:
+            target_result.report_path = py2win_report.write_report(target, py2win_report.make_report(target, target_result, command), target_result.artifact_path or None)
+        except OSError as e:
+            log(f"Warning: could not write build report: {e}")
+
+
+@dataclass
+class BuildPlan:
+    """The PyInstaller run prepare_build settled on, and what finish_build
+    needs to turn its output into artifacts."""
+    profile: dict
+    command: list
+    distpath: str
+    targets: list
+    results: list
+    paths: list
+    cache: object = None
+    cache_keys: list = None
+    manifest: object = None
+    onedir_path: str = None
+    use_daemon: bool = True
+    store: bool = True
+
+
+def _run_build(profile, result, log, start, distpath, workpath, specpath, use_cache, force, on_process, use_daemon, store):
+    import py2win_report
+    plan = prepare_build(profile, result, log, start, distpath, workpath, specpath, use_cache, force, use_daemon, store)
+    if plan is None:
+        return None
+
+    tracker = py2win_report.PhaseTracker()
+    try:
+        client = None
+        if plan.use_daemon:
+            import py2win_daemon
+            client = py2win_daemon.connect()
+        if client:
+            log("Building in the warm build daemon")
+            process = client.build(plan.command[1:])
+        else:
+            process = subprocess.Popen(plan.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', bufsize=1, **popen_kwargs())
+        if on_process:
+            on_process(process)
+        for line in iter(process.stdout.readline, ''):
+            tracker.feed(line)
+            log(line.rstrip("\n"))
+        process.stdout.close()
+        returncode, peak_rss = wait_for_exit(process)
+        finish_build(plan, result, log, returncode, peak_rss, tracker.finish())
+    except Exception as e:
+        fail_build(result, e, log)
+    return plan.command
+
+
+def prepare_build(profile, result, log, start, distpath="dist", workpath=None, specpath=None, use_cache=True, force=False, use_daemon=True, store=True):
+    """Does everything up to running PyInstaller: restores cache hits, sets
+    up the build environment and work directory and writes the command.
+    Returns a BuildPlan, or None when the build is already complete or has
+    failed (see `result`)."""
+    # A matrix profile builds all its variants in one PyInstaller run; each
+    # variant gets its own result, cache entry and report.
+    targets, results = [profile], [result]
+    if profile.get("matrix"):
+        import py2win_matrix
+        try:
+            targets = py2win_matrix.expand_matrix(profile)
+        except ValueError as e:
+            result.error = str(e)
+            log(f"Error: {result.error}")
+            return None
+        results = result.variants = [BuildResult(name=profile_name(t), extra={"matrix": result.name}) for t in targets]
+        log(f"Build matrix: {', '.join(r.name for r in results)}")
+        if any(t.get("is_onefile") and t.get("cached_extraction") for t in targets):
+            result.error = "Cached extraction is not supported in build matrices."
+            log(f"Error: {result.error}")
+            return None
+    # PyInstaller builds one-dir; the single file is assembled afterwards.
+    cached_extraction = bool(profile.get("is_onefile") and profile.get("cached_extraction"))
+
+    manifest = None
+    if profile.get("data_paths"):
+        import py2win_data
+        manifest = py2win_data.build_manifest(profile)
+        log(manifest.summary())
+
+    cache = None
+    cache_keys = [None] * len(targets)
+    if use_cache:
+        import py2win_cache
+        try:
+            cache = py2win_cache.BuildCache()
+            cache_keys = [py2win_cache.fingerprint(t, manifest) for t in targets]
+        except Exception as e:
+            cache = None
+            log(f"Build cache disabled for this build: {e}")
+    paths = [os.path.abspath(artifact_path(t, distpath)) for t in targets]
+    if cache and not force and all(cache.restore(key, path) for key, path in zip(cache_keys, paths)):
+        for r, path in zip(results, paths):
+            r.returncode = 0
+            r.artifact_path = path
+            r.artifact_size = path_size(path)
+            r.extra["cache"] = "hit"
+        _combine_variants(result, distpath)
+        log(f"Build cache hit ({cache_keys[0][:12]}): restored {', '.join(paths)} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        if store:
+            for r in results:
+                _store_artifact(r, log)
+        log("\n--- Build successful! ---")
+        return None
+    if cache:
+        for r in results:
+            r.extra["cache"] = "forced" if force else "miss"
+        _combine_variants(result, distpath)
+        log(f"Build cache {'bypassed (force rebuild)' if force else 'miss'} ({cache_keys[0][:12]})")
+
+    python = None
+    if profile.get("requirements"):
+        import py2win_envs
+        try:
+            python = py2win_envs.EnvironmentCache().ensure(profile, log)
+        except (OSError, RuntimeError, subprocess.CalledProcessError) as e:
+            result.error = f"Could not set up the build environment: {e}"
+            log(f"Error: {result.error}")
+            return None
+
+    if workpath is None:
+        import py2win_workdirs
+        try:
+            workpath, managed_specpath = py2win_workdirs.WorkDirManager().prepare(profile, clean=force, log=log)
+            specpath = specpath or managed_specpath
+        except Exception as e:
+            workpath, specpath = "build", specpath or "."
+            log(f"Using a temporary work directory: {e}")
+
+    datas, runtime_hooks = [], []
+    if manifest and manifest.files:
+        data_stage = os.path.abspath(os.path.join(workpath, "py2win-data"))
+        hook = py2win_data.stage(manifest, data_stage)
+        datas.append((data_stage, "."))
+        if hook:
+            runtime_hooks.append(hook)
+
+    onedir_path = None
+    if result.variants:
+        spec_file = py2win_matrix.write_spec(profile, targets, specpath or ".", datas, runtime_hooks)
+        command = py2win_matrix.spec_command(spec_file, distpath, workpath, profile.get("upx_dir"))
+    elif cached_extraction:
+        onedir_path = os.path.join(os.path.abspath(workpath), "py2win-onedir")
+        command = build_command(dict(profile, is_onefile=0), onedir_path, workpath, specpath, datas, runtime_hooks)
+    else:
+        command = build_command(profile, distpath, workpath, specpath, datas, runtime_hooks)
+    if python:
+        # The daemon runs the host's PyInstaller, so these builds never use it.
+        command = [python, "-m", "PyInstaller"] + command[1:]
+        use_daemon = False
+    log(f"Running command: {' '.join(command)}")
+    return BuildPlan(profile, command, distpath, targets, results, paths, cache, cache_keys, manifest, onedir_path, use_daemon, store)
+
+
+def finish_build(plan, result, log, returncode, peak_rss, phases):
+    """Turns a finished PyInstaller run into artifacts: optimises and
+    packages them and adds them to the build cache and the artifact store."""
+    import py2win_report
+    result.returncode, result.peak_rss, result.phases = returncode, peak_rss, phases
+    timings = ", ".join(f"{py2win_report.PHASE_LABELS[phase]} {seconds:.1f}s" for phase, seconds in phases.items())
+    log(f"Phase timings: {timings}" + (f"; peak RSS {format_size(peak_rss)}" if peak_rss else ""))
+    manifest = plan.manifest
+    for r, key, target, target_profile in zip(plan.results, plan.cache_keys, plan.paths, plan.targets):
+        r.returncode, r.peak_rss, r.phases = returncode, peak_rss, phases
+        if returncode != 0:
+            continue
+        onedir = os.path.join(plan.onedir_path, r.name) if plan.onedir_path else target
+        if manifest and manifest.aliases and os.path.isdir(onedir):
+            import py2win_data
+            py2win_data.materialize_aliases(manifest, onedir)
+        if os.path.isdir(onedir):
+            import py2win_optimize
+            if py2win_optimize.requested(target_profile):
+                r.extra["optimize"] = py2win_optimize.optimize(onedir, target_profile, log).summary()
+        if plan.onedir_path:
+            import py2win_extract
+            try:
+                r.extra["payload"] = py2win_extract.package(plan.profile, onedir, target, log)
+            except (OSError, RuntimeError) as e:
+                result.error = r.error = f"Cached extraction failed: {e}"
+                log(f"Error: {result.error}")
+                continue
+        r.artifact_path = target
+        if os.path.exists(target):
+            r.artifact_size = path_size(target)
+            if plan.cache:
+                try:
+                    plan.cache.store(key, target)
+                except OSError as e:
+                    log(f"Warning: could not store build in cache: {e}")
+            if plan.store:
+                _store_artifact(r, log)
+    _combine_variants(result, plan.distpath)
+    if returncode == 0 and not result.error:
+        log("\n--- Build successful! ---")
+    elif result.error:
+        log("\n--- Build failed ---")
+    else:
+        log(f"\n--- Build failed with exit code {returncode} ---")
+
+
+def fail_build(result, error, log):
+    """Records an exception raised while running or finishing a build."""
+    if isinstance(error, FileNotFoundError):
+        result.error = "pyinstaller command not found"
+        log("\n--- ERROR: pyinstaller command not found. ---")
+        log("Please make sure PyInstaller is installed and in your system's PATH.")
+    else:
+        result.error = str(error)
+        log(f"\n--- An unexpected error occurred: {error} ---")
+
+
+def _store_artifact(result, log):
+    import py2win_store
+    try:
+        manifest = py2win_store.ArtifactStore().add(result.artifact_path, result.name)
+    except OSError as e:
+        log(f"Warning: could not add build to the artifact store: {e}")
+        return
+    result.extra["build_id"] = manifest["id"]
+    log(f"Stored as build {manifest['id']} of {result.name}")
+
+
+def _combine_variants(result, distpath):
+    # The result of a matrix build stands for all of its variants.
+    if not result.variants:
+        return
+    result.returncode = max(r.returncode for r in result.variants)
+    result.artifact_size = sum(r.artifact_size for r in result.variants)
+    if result.returncode == 0:
+        result.artifact_path = os.path.abspath(distpath)
+    if "cache" in result.variants[0].extra:
+        result.extra["cache"] = result.variants[0].extra["cache"]
+
+
+def _build_worker(profile, output_dir, log_dir, options):
+    # Runs inside a pool process: every profile gets its own distpath, log
+    # file and persistent work directory so parallel builds never share state.
+    name = profile_name(profile)
+    distpath = os.path.join(output_dir, "dist", name)
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, f"{name}.log"), 'w', encoding='utf-8') as log_file:
+        def log(message):
+            log_file.write(message + "\n")
+        return run_build(profile, log, distpath, **options)
+
+
+def build_many(profiles, workers=None, output_dir=".", on_result=None, **options):
+    """Builds several profiles in parallel, returning results in input order.
+
+    Extra keyword `options` are passed through to `run_build`.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    output_dir = os.path.abspath(output_dir)
+    log_dir = os.path.join(output_dir, "logs")
+    names = [profile_name(p) for p in profiles]
+    duplicates = {n for n in names if names.count(n) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate profile names: {', '.join(sorted(duplicates))}")
+
+    results = [None] * len(profiles)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(profiles)) or 1) as pool:
+        futures = {pool.submit(_build_worker, p, output_dir, log_dir, options): i for i, p in enumerate(profiles)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = BuildResult(name=names[index], error=str(e))
+            results[index] = result
+            if on_result:
+                on_result(result)
+    return results
+
+
+def format_size(num_bytes):
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_summary(results):
+    rows = [("Profile", "Time", "Exit", "Size", "Cache")]
+    for r in results:
+        exit_code = "error" if r.error else str(r.returncode)
+        size = format_size(r.artifact_size) if r.artifact_size else "-"
+        rows.append((r.name, f"{r.wall_time:.1f}s", exit_code, size, r.extra.get("cache", "-")))
+        for v in r.variants:
+            size = format_size(v.artifact_size) if v.artifact_size else "-"
+            rows.append((f"  {v.name}", "", str(v.returncode), size, v.extra.get("cache", "-")))
+    return format_table(rows)
+
+
+def format_table(rows):
+    """Formats rows of strings as a plain-text table; the first row is the header."""
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * w for w in widths))
+    return "\n".join(lines)
@@ -0,0 +1,211 @@
+"""
+Py2Win Envs - Cached, isolated build environments for profiles with requirements.
+
+A profile that names a requirements file ("requirements") is built in its
+own virtual environment instead of whatever environment `pyinstaller`
+happens to come from:
+
+- the environment is created with `python -m venv` and filled with
+  `pip install --no-index` from a local wheelhouse, so no network access
+  is needed. The wheelhouse is the profile's "wheelhouse" folder, or a
+  "wheelhouse" folder next to the requirements file;
+- PyInstaller is installed too unless the requirements already name it;
+- environments are cached under <PY2WIN_HOME>/envs/<key>, where the key
+  hashes the requirements, the wheels on offer and the base interpreter
+  ("python" in the profile, or the one running Py2Win). Looking up a cached
+  environment only reads a few small files;
+- environments are built in a temporary folder and renamed into place, and
+  the least recently used ones are evicted once more than MAX_ENVS exist.
+
+Since such an environment only holds what the program needs, PyInstaller
+has fewer packages to consider and cannot pick up unrelated ones.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import subprocess
+
+import py2win_engine as engine
+
+
+MAX_ENVS = 5
+MARKER = "py2win-env.json"
+
+
+def envs_dir():
+    return engine.data_dir("envs")
+
+
+def base_interpreter(profile):
+    if profile.get("python"):
+        return profile["python"]
+    if not getattr(sys, "frozen", False):
+        return sys.executable
+    return shutil.which("python3") or shutil.which("python") or "python"
+
+
+def wheelhouse(profile):
+    if profile.get("wheelhouse"):
+        return os.path.abspath(profile["wheelhouse"])
+    return os.path.join(os.path.dirname(os.path.abspath(profile["requirements"])), "wheelhouse")
+
+
+def _requirement_names(requirements):
+    names = set()
+    with open(requirements, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line and not line.startswith("-"):
+                name = line
+                for separator in "[<>=!~;@ ":
+                    name = name.split(separator, 1)[0]
+                names.add(name.lower().replace("_", "-"))
+    return names
+
+
+def environment_key(profile):
+    """Returns the cache key of the profile's build environment."""
+    digest = hashlib.sha256()
+    with open(profile["requirements"], 'rb') as f:
+        digest.update(f.read())
+    interpreter = shutil.which(base_interpreter(profile)) or base_interpreter(profile)
+    st = os.stat(interpreter)
+    digest.update(f"\0{os.path.realpath(interpreter)}\0{st.st_size}\0{st.st_mtime_ns}".encode())
+    wheels = wheelhouse(profile)
+    digest.update("\0".join(sorted(os.listdir(wheels)) if os.path.isdir(wheels) else []).encode())
+    return digest.hexdigest()[:16]
+
+
+def toolchain_info(profile):
+    """Returns the PyInstaller and Python versions of the profile's build
+    environment, like py2win_cache.toolchain_info() does for `pyinstaller`."""
+    key = environment_key(profile)
+    marker = EnvironmentCache()._read_marker(os.path.join(envs_dir(), key)) or {}
+    return {"environment": key, "pyinstaller": marker.get("pyinstaller_version", "?"), "python": marker.get("python_version", "?")}
+
+
+def env_python(env_dir):
+    if os.name == 'nt':
+        return os.path.join(env_dir, "Scripts", "python.exe")
+    return os.path.join(env_dir, "bin", "python")
+
+
+class EnvironmentCache:
+    def __init__(self, root=None, max_envs=MAX_ENVS):
+        self.root = root or envs_dir()
+        self.max_envs = max_envs
+
+    def _read_marker(self, env_dir):
+        try:
+            with open(os.path.join(env_dir, MARKER), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_marker(self, env_dir, marker):
+        tmp_path = os.path.join(env_dir, MARKER + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(marker, f, indent=4)
+        os.replace(tmp_path, os.path.join(env_dir, MARKER))
+
+    def ensure(self, profile, log=print):
+        """Returns the Python of the profile's build environment, creating the environment if needed."""
+        key = environment_key(profile)
+        env_dir = os.path.join(self.root, key)
+        marker = self._read_marker(env_dir)
+        if marker and os.path.exists(env_python(env_dir)):
+            marker["last_used"] = time.time()
+            self._write_marker(env_dir, marker)
+            log(f"Using build environment {key} ({os.path.basename(profile['requirements'])})")
+            return env_python(env_dir)
+        self._create(profile, key, env_dir, log)
+        self.evict(keep=key)
+        return env_python(env_dir)
+
+    def _run(self, command, log, cwd=None):
+        log(f"Running command: {' '.join(command)}")
+        env = dict(os.environ, PIP_DISABLE_PIP_VERSION_CHECK="1", PIP_NO_INPUT="1")
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', cwd=cwd, env=env, **engine.popen_kwargs())
+        for line in iter(process.stdout.readline, ''):
+            log(line.rstrip("\n"))
+        process.stdout.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"'{os.path.basename(command[0])} {' '.join(command[1:4])}' failed with exit code {process.returncode}")
+
+    def _create(self, profile, key, env_dir, log):
+        requirements = os.path.abspath(profile["requirements"])
+        wheels = wheelhouse(profile)
+        if not os.path.isdir(wheels):
+            raise FileNotFoundError(f"Wheelhouse not found: {wheels} (create it with: pip wheel -r {os.path.basename(requirements)} pyinstaller -w wheelhouse)")
+        start = time.perf_counter()
+        log(f"Creating build environment {key} from {wheels}...")
+        tmp_dir = f"{env_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            self._run([base_interpreter(profile), "-m", "venv", tmp_dir], log)
+            # Console scripts would point into the temporary folder; the
+            # environment is only ever used through `python -m`.
+            install = [env_python(tmp_dir), "-m", "pip", "install", "--no-index", "--find-links", wheels, "-r", requirements]
+            if "pyinstaller" not in _requirement_names(requirements):
+                install.append("pyinstaller")
+            self._run(install, log, cwd=os.path.dirname(requirements))
+            versions = subprocess.run([env_python(tmp_dir), "-c", "import sys, PyInstaller; print(PyInstaller.__version__); print(sys.version)"], capture_output=True, text=True, check=True, **engine.popen_kwargs()).stdout.splitlines()
+            now = time.time()
+            self._write_marker(tmp_dir, {
+                "key": key,
+                "requirements": requirements,
+                "python": base_interpreter(profile),
+                "pyinstaller_version": versions[0],
+                "python_version": versions[1],
+                "wheelhouse": wheels,
+                "created": now,
+                "last_used": now,
+                "size": engine.path_size(tmp_dir),
+            })
+            try:
+                os.replace(tmp_dir, env_dir)
+            except OSError:
+                # Another build created the same environment first.
+                if not self._read_marker(env_dir):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        log(f"Created build environment {key} in {time.perf_counter() - start:.1f}s")
+
+    def entries(self):
+        """Returns the cached environments, most recently used first."""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.endswith(".tmp"):
+                continue
+            marker = self._read_marker(entry.path) or {"key": entry.name, "last_used": 0, "size": 0}
+            marker["path"] = entry.path
+            entries.append(marker)
+        return sorted(entries, key=lambda e: e.get("last_used", 0), reverse=True)
+
+    def remove(self, key):
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def evict(self, max_envs=None, max_bytes=None, keep=None):
+        """Removes the least recently used environments beyond `max_envs`,
+        then until the rest fit in `max_bytes`; never the one named `keep`."""
+        max_envs = self.max_envs if max_envs is None else max_envs
+        entries = [e for e in self.entries() if e["key"] != keep]
+        limit = max(0, max_envs - (1 if keep else 0))
+        removed = entries[limit:]
+        entries = entries[:limit]
+        if max_bytes is not None:
+            total = sum(e.get("size", 0) for e in entries)
+            while entries and total > max_bytes:
+                entry = entries.pop()
+                total -= entry.get("size", 0)
+                removed.append(entry)
+        for entry in removed:
+            self.remove(entry["key"])
+        return removed
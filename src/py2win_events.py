@@ -0,0 +1,303 @@
+"""
+Py2Win Events - Builds as an asyncio stream of typed events.
+
+For tools that embed Py2Win, such as build dashboards:
+
+    import asyncio
+    import py2win_events
+
+    async def main(profile):
+        async for event in py2win_events.build(profile):
+            if isinstance(event, py2win_events.PhaseChanged):
+                print(f"{event.name}: {event.phase}")
+            elif isinstance(event, py2win_events.Finished):
+                print(event.to_dict())
+
+    asyncio.run(main(profile))
+
+A build yields Started, then a LogLine for every line of output (a
+BuildWarning, which is also a LogLine, for warnings) and a PhaseChanged
+whenever PyInstaller moves on to the next phase, then an ArtifactProduced
+for each artifact and finally Finished, which carries the build's metrics
+and its BuildResult. to_dict() turns any event into plain JSON data.
+
+This is the same build as engine.run_build, and the GUI's build queue runs
+on it:
+
+- PyInstaller's output is read with non-blocking asyncio I/O, both from a
+  child process and from the warm build daemon, so any number of builds
+  share the event loop's thread;
+- the steps before and after PyInstaller (cache lookups, build
+  environments, post-processing, storing) are blocking file work. They run
+  in a worker thread and always run to completion;
+- the stream applies backpressure. PyInstaller's output is only read as
+  fast as the consumer takes events. A worker thread waits while
+  `max_pending` of its lines are queued. Either way, a slow consumer slows
+  the build down instead of making memory grow;
+- closing the stream early, or cancelling the task that consumes it,
+  kills PyInstaller together with its helper processes.
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import subprocess
+from dataclasses import dataclass, field, fields
+
+import py2win_engine as engine
+import py2win_report
+
+
+MAX_PENDING = 256
+LINE_LIMIT = 2 ** 20
+WAIT_INTERVAL = 0.02
+WARNING_LINE = re.compile(r"^\s*\d*\s*WARNING:|^\s*Warning\b")
+_DONE = object()
+
+
+@dataclass
+class BuildEvent:
+    name: str
+    elapsed: float
+
+    kind = "event"
+
+    def to_dict(self):
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "result"}
+        data["event"] = self.kind
+        return data
+
+
+@dataclass
+class Started(BuildEvent):
+    script_path: str = ""
+
+    kind = "started"
+
+
+@dataclass
+class PhaseChanged(BuildEvent):
+    phase: str = ""
+
+    kind = "phase"
+
+
+@dataclass
+class LogLine(BuildEvent):
+    line: str = ""
+
+    kind = "log"
+
+
+@dataclass
+class BuildWarning(LogLine):
+    kind = "warning"
+
+
+@dataclass
+class ArtifactProduced(BuildEvent):
+    path: str = ""
+    size: int = 0
+    cache: str = None
+    build_id: str = None
+
+    kind = "artifact"
+
+
+@dataclass
+class Finished(BuildEvent):
+    successful: bool = False
+    returncode: int = -1
+    error: str = ""
+    wall_time: float = 0.0
+    phases: dict = field(default_factory=dict)
+    peak_rss: int = None
+    artifact_path: str = ""
+    artifact_size: int = 0
+    report_path: str = None
+    result: engine.BuildResult = field(default=None, repr=False)
+
+    kind = "finished"
+
+
+class LocalProcess:
+    """PyInstaller as a child process whose output is read with asyncio."""
+
+    def __init__(self):
+        self.pid = None
+        self.returncode = None
+        self._process = None
+        self._stdout = None
+
+    @classmethod
+    async def start(cls, command):
+        self = cls()
+        if os.name == 'nt':
+            # The proactor event loop can only read pipes it created itself.
+            self._process = await asyncio.create_subprocess_exec(*command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, limit=LINE_LIMIT, **engine.popen_kwargs())
+            self._stdout = self._process.stdout
+        else:
+            # A Popen of its own, so that wait4() can report the peak memory.
+            self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **engine.popen_kwargs())
+            self._stdout = asyncio.StreamReader(limit=LINE_LIMIT)
+            await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(self._stdout), self._process.stdout)
+        self.pid = self._process.pid
+        return self
+
+    async def readline(self):
+        return (await self._stdout.readline()).decode("utf-8", "replace")
+
+    async def wait(self):
+        """Returns (returncode, peak RSS in bytes or None) once PyInstaller has exited."""
+        if os.name == 'nt':
+            self.returncode = await self._process.wait()
+            popen = self._process._transport.get_extra_info("subprocess")
+            return self.returncode, engine.windows_peak_rss(popen)
+        while True:
+            try:
+                pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                self.returncode = self._process.wait()
+                return self.returncode, None
+            if pid:
+                break
+            await asyncio.sleep(WAIT_INTERVAL)
+        self.returncode = self._process.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode, rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                engine.kill_process_group(self.pid)
+            except (OSError, subprocess.SubprocessError):
+                self._process.kill()
+
+
+class _Relay:
+    """Runs a blocking engine step in a worker thread and passes its log
+    lines to the event loop through a bounded queue."""
+
+    def __init__(self, max_pending):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+        self.closed = False
+        self.future = None
+        self.value = None
+
+    def log(self, line):
+        # Called in the worker thread, which waits here while the queue is full.
+        if not self.closed:
+            asyncio.run_coroutine_threadsafe(self.queue.put(line), self.loop).result()
+
+    async def run(self, step):
+        """Runs step(log) in a worker thread and yields the lines it logs;
+        its return value is left in self.value."""
+        def call():
+            try:
+                return step(self.log)
+            finally:
+                asyncio.run_coroutine_threadsafe(self.queue.put(_DONE), self.loop)
+
+        self.future = self.loop.run_in_executor(None, call)
+        while True:
+            line = await self.queue.get()
+            if line is _DONE:
+                break
+            yield line
+        self.value = await self.future
+
+    async def close(self):
+        """Drops the lines still queued and waits for a step that is still
+        running, so that nothing touches the build's files afterwards."""
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()  # Unblocks a worker thread waiting for room.
+        if self.future and not self.future.done():
+            try:
+                await self.future
+            except Exception:
+                pass
+
+
+async def _start_process(plan):
+    """Starts PyInstaller for `plan` in the build daemon if one is running,
+    otherwise as a child process; returns (process, in the daemon)."""
+    if plan.use_daemon:
+        import py2win_daemon
+        client = await asyncio.to_thread(py2win_daemon.connect)
+        if client:
+            return await client.open_build(plan.command[1:], limit=LINE_LIMIT), True
+    return await LocalProcess.start(plan.command), False
+
+
+async def build(profile, distpath="dist", workpath=None, specpath=None, use_cache=True, force=False, report=True, use_daemon=True, store=True, max_pending=MAX_PENDING):
+    """Builds `profile` like engine.run_build, with the same options, and
+    yields BuildEvents as the build goes along."""
+    result = engine.BuildResult(name=engine.profile_name(profile))
+    start = time.perf_counter()
+    relay = _Relay(max_pending)
+    process = None
+
+    def event(cls, **values):
+        values.setdefault("name", result.name)
+        return cls(elapsed=round(time.perf_counter() - start, 3), **values)
+
+    def log_event(line):
+        return event(BuildWarning if WARNING_LINE.match(line) else LogLine, line=line)
+
+    try:
+        script_path = profile.get("script_path")
+        yield event(Started, script_path=script_path or "")
+        command = None
+        if not script_path or not os.path.exists(script_path):
+            result.error = f"Script not found: {script_path}"
+            yield log_event(f"Error: {result.error}")
+        else:
+            async for line in relay.run(lambda log: engine.prepare_build(profile, result, log, start, distpath, workpath, specpath, use_cache, force, use_daemon, store)):
+                yield log_event(line)
+            plan = relay.value
+            if plan:
+                command = plan.command
+                tracker = py2win_report.PhaseTracker()
+                try:
+                    process, in_daemon = await _start_process(plan)
+                    if in_daemon:
+                        yield log_event("Building in the warm build daemon")
+                    yield event(PhaseChanged, phase=tracker.phase)
+                    while True:
+                        try:
+                            line = await process.readline()
+                        except ValueError:
+                            continue  # A line longer than LINE_LIMIT; it is dropped.
+                        if not line:
+                            break
+                        phase = tracker.feed(line)
+                        if phase:
+                            yield event(PhaseChanged, phase=phase)
+                        yield log_event(line.rstrip("\n"))
+                    returncode, peak_rss = await process.wait()
+                    phases = tracker.finish()
+                    async for line in relay.run(lambda log: engine.finish_build(plan, result, log, returncode, peak_rss, phases)):
+                        yield log_event(line)
+                except Exception as e:
+                    lines = []
+                    engine.fail_build(result, e, lines.append)
+                    for line in lines:
+                        yield log_event(line)
+
+            result.wall_time = time.perf_counter() - start
+            if report:
+                async for line in relay.run(lambda log: engine.write_reports(profile, result, command, log)):
+                    yield log_event(line)
+        for r in result.variants or [result]:
+            if r.artifact_path and os.path.exists(r.artifact_path):
+                yield event(ArtifactProduced, name=r.name, path=r.artifact_path, size=r.artifact_size, cache=r.extra.get("cache"), build_id=r.extra.get("build_id"))
+        yield event(Finished, successful=result.successful, returncode=result.returncode, error=result.error, wall_time=round(result.wall_time, 3),
+                    phases=result.phases, peak_rss=result.peak_rss, artifact_path=result.artifact_path, artifact_size=result.artifact_size,
+                    report_path=result.report_path, result=result)
+    finally:
+        if process and process.returncode is None:
+            process.kill()
+            await process.wait()
+        await relay.close()
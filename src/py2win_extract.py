@@ -0,0 +1,171 @@
+"""
+Py2Win Extract - One-file executables that unpack once into a persistent cache.
+
+A --onefile executable unpacks the whole application into a new temporary
+folder on every start and deletes it again on exit, which is why one-file
+builds start so much slower than one-dir builds. PyInstaller's bootloader
+always unpacks afresh, so for a profile with "cached_extraction" Py2Win
+builds one-dir instead and turns the result into a single file:
+
+- the launcher (py2win_launcher.py) is frozen once per Python and
+  PyInstaller version, console mode and icon, and kept in ~/.py2win/launchers;
+- the one-dir build is zipped and appended to a copy of the launcher; the
+  zip comment records the application name, the content hash of the build
+  and the executable to start;
+- on start the launcher unpacks the payload once into a per-user cache
+  folder named after that hash, reuses it on later starts after checking
+  file sizes against a marker, and evicts old versions.
+
+The launcher is itself a small one-file build, so every start still pays for
+unpacking it (a fraction of a second), but no longer for the application.
+"""
+import os
+import json
+import shutil
+import struct
+import hashlib
+import zipfile
+import tempfile
+import subprocess
+
+import py2win_engine as engine
+
+
+LAUNCHER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "py2win_launcher.py")
+# Keeps the launcher, and with it the cost of unpacking it, small.
+LAUNCHER_EXCLUDES = (
+    "hashlib", "_hashlib", "ssl", "_ssl", "decimal", "_decimal", "bz2", "_bz2", "lzma", "_lzma",
+    "pickle", "_pickle", "csv", "_csv", "datetime", "_datetime", "socket", "_socket",
+    "tkinter", "unittest", "pydoc", "xml",
+)
+PAYLOAD_ID_LENGTH = 16
+# PyInstaller's archive cookie: magic, archive length, TOC offset, TOC
+# length, Python version, Python library name.
+COOKIE = struct.Struct("!8sIIII64s")
+COOKIE_MAGIC = b"MEI\014\013\012\013\016"
+
+
+def launcher_key(windowed, icon_path=None):
+    import py2win_cache
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"windowed": bool(windowed), "toolchain": py2win_cache.toolchain_info()}, sort_keys=True).encode())
+    py2win_cache.hash_file(LAUNCHER_SCRIPT, digest)
+    if icon_path and os.path.exists(icon_path):
+        py2win_cache.hash_file(icon_path, digest)
+    return digest.hexdigest()
+
+
+def launcher_command(windowed, icon_path, distpath, workpath):
+    command = ["pyinstaller", "--noconfirm", "--onefile", "--name", "py2win-launcher", "--log-level", "WARN"]
+    if windowed: command.append("--windowed")
+    if icon_path and os.path.exists(icon_path): command.append(f"--icon={os.path.abspath(icon_path)}")
+    # strip only exists outside Windows; there it roughly halves libpython.
+    if os.name != 'nt': command.append("--strip")
+    for module in LAUNCHER_EXCLUDES:
+        command.append(f"--exclude-module={module}")
+    command.extend(["--distpath", distpath, "--workpath", workpath, "--specpath", workpath, LAUNCHER_SCRIPT])
+    return command
+
+
+def launcher_path(windowed, icon_path=None, log=print):
+    """Returns the frozen launcher for these options, building it on first use."""
+    key = launcher_key(windowed, icon_path)
+    path = engine.data_dir("launchers", key[:16], "py2win-launcher" + (".exe" if os.name == 'nt' else ""))
+    if os.path.exists(path):
+        return path
+    log("Building the cached-extraction launcher (once per toolchain, console mode and icon)...")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="py2win-launcher-") as temp_dir:
+        command = launcher_command(windowed, icon_path, os.path.join(temp_dir, "dist"), os.path.join(temp_dir, "build"))
+        completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', **engine.popen_kwargs())
+        if completed.returncode != 0:
+            for line in completed.stdout.splitlines()[-20:]:
+                log(line)
+            raise RuntimeError(f"Building the launcher failed with exit code {completed.returncode}")
+        # Another build may be installing the same launcher at the same time.
+        os.replace(os.path.join(temp_dir, "dist", os.path.basename(path)), path)
+    return path
+
+
+def _payload_entries(onedir):
+    for root, dirs, files in os.walk(onedir):
+        dirs.sort()
+        for filename in sorted(files + [d for d in dirs if os.path.islink(os.path.join(root, d))]):
+            path = os.path.join(root, filename)
+            yield path, os.path.relpath(path, onedir).replace(os.sep, "/")
+
+
+def _read_cookie(executable):
+    with open(executable, 'rb') as f:
+        data = f.read()
+    offset = data.rfind(COOKIE_MAGIC)
+    if offset < 0:
+        raise RuntimeError(f"{executable} is not a PyInstaller executable")
+    fields = COOKIE.unpack_from(data, offset)
+    return fields, offset + COOKIE.size - fields[1]
+
+
+def append_payload(executable, onedir, name, entry):
+    """Appends `onedir` to `executable` as a zip; returns the payload id.
+
+    The bootloader finds its archive by scanning backwards from the end of
+    the file for the cookie, which costs about 10 ms per MB of payload. So
+    the zip comment ends with a copy of the cookie whose archive length
+    spans the payload too, and the bootloader finds it straight away.
+    """
+    import py2win_cache
+    cookie, archive_start = _read_cookie(executable)
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(executable, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path, arcname in _payload_entries(onedir):
+            digest.update(f"\0{arcname}\0".encode())
+            if os.path.islink(path):
+                target = os.readlink(path)
+                digest.update(target.encode())
+                info = zipfile.ZipInfo(arcname)
+                info.external_attr = 0o120777 << 16
+                archive.writestr(info, target)
+            else:
+                py2win_cache.hash_file(path, digest)
+                archive.write(path, arcname)
+        payload_id = digest.hexdigest()[:PAYLOAD_ID_LENGTH]
+        info = json.dumps({"name": name, "id": payload_id, "entry": entry}).encode()
+        archive.comment = info + bytes(COOKIE.size)
+    with open(executable, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        f.seek(end - COOKIE.size)
+        f.write(COOKIE.pack(cookie[0], end - archive_start, *cookie[2:]))
+    return payload_id
+
+
+def extraction_dir(executable):
+    """Returns the cache folder the single file `executable` unpacks into, or
+    None if it was not built with cached extraction."""
+    import py2win_launcher
+    try:
+        info = py2win_launcher.read_info(executable)
+        return os.path.join(py2win_launcher.cache_root(), info["name"], info["id"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def package(profile, onedir, output, log=print):
+    """Turns the one-dir build `onedir` of `profile` into the single file `output`."""
+    name = engine.profile_name(profile)
+    entry = name + (".exe" if os.name == 'nt' else "")
+    if not os.path.isfile(os.path.join(onedir, entry)):
+        raise RuntimeError(f"{onedir} holds no {entry} to start")
+    launcher = launcher_path(profile.get("is_windowed"), profile.get("icon_path"), log)
+    staging = output + ".py2win-tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    shutil.copy2(launcher, staging)
+    try:
+        payload_id = append_payload(staging, onedir, name, entry)
+        if os.path.isdir(output) and not os.path.islink(output):
+            shutil.rmtree(output)
+        os.replace(staging, output)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    log(f"Cached extraction: packed {onedir} into {output} (payload {payload_id})")
+    return payload_id
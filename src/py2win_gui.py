@@ -8,25 +8,51 @@ Windows executables.
 Features:
 - A simple, clean, dark-themed interface built with customtkinter.
 - Basic options: console/windowed app, one-file/one-dir build.
-- Pro features: custom icon selection, bundling of additional data files and folders.
-- Real-time logging of the PyInstaller build process.
+- Pro features: custom icon selection, bundling of additional data files and folders,
+  module excludes and hidden imports with import analysis suggestions.
+- Real-time logging of the PyInstaller build process, with level filtering
+  and a bounded in-memory view that stays responsive for very long logs.
+- Build matrices: console and windowed, or one-file and one-folder
+  executables of the same script from a single dependency analysis.
+- A build queue that runs several builds in parallel, with priorities,
+  per-build timeouts, cancellation and a separate log for every build.
+- Watch mode that rebuilds automatically when the script or its data changes.
+- An optional warm build daemon that keeps PyInstaller loaded between builds.
 - Responsive UI that doesn't freeze during builds, thanks to multi-threading.
 
 Usage:
-  python py2win_gui.py
+  python py2win_gui.py [--profile-startup]
+
+Only the visible tab is created at startup; the others are built the first
+time they are shown, and the PyInstaller check runs in the background. With
+--profile-startup a breakdown of import and construction times is printed
+once the window has been drawn.
 
 Dependencies:
 - customtkinter
 - pyinstaller
 """
+import time
+STARTUP_MARKS = [("Start", time.perf_counter())]
 import customtkinter as ctk
-from tkinter import filedialog, Listbox
+from tkinter import filedialog, messagebox, Listbox
 import threading
-import subprocess
 import queue
 import os
+import sys
 import json
-import shutil
+STARTUP_MARKS.append(("Import customtkinter", time.perf_counter()))
+
+import py2win_engine as engine
+import py2win_scheduler as scheduler
+from py2win_log import LogBuffer, LogView
+STARTUP_MARKS.append(("Import Py2Win modules", time.perf_counter()))
+
+LOG_FRAME_MS = 50
+LOG_BATCH_LIMIT = 20000
+QUEUE_REFRESH_MS = 1000
+PRIORITIES = {"High": 10, "Normal": 0, "Low": -10}
+LAZY_TABS = {"Pro Features": "create_pro_tab", "Build Queue": "create_queue_tab"}
 
 
 class Tooltip:
@@ -57,9 +83,51 @@ class Tooltip:
         self.tooltip_window = None
 
 
+def import_breakdown(limit=10):
+    """Returns (module, self ms, cumulative ms) for the slowest modules imported
+    directly by Py2Win, measured in a fresh interpreter with -X importtime."""
+    if getattr(sys, "frozen", False):
+        return []
+    import subprocess
+    module = os.path.splitext(os.path.basename(__file__))[0]
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True).stderr
+    rows, children = [], []
+    for line in output.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[0].startswith("import time:") or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        # Modules are listed after everything they import.
+        if depth == 1:
+            children.append((name, int(parts[0].split(":")[1]) / 1000, int(parts[1]) / 1000))
+        elif depth == 0:
+            if name == module:
+                rows = children
+            children = []
+    return sorted(rows, key=lambda row: -row[2])[:limit]
+
+
+def print_startup_profile():
+    rows = [("Step", "Time", "Since start")]
+    start = STARTUP_MARKS[0][1]
+    for (_, previous), (label, moment) in zip(STARTUP_MARKS, STARTUP_MARKS[1:]):
+        rows.append((label, f"{(moment - previous) * 1000:.0f} ms", f"{(moment - start) * 1000:.0f} ms"))
+    print("Startup profile:")
+    print(engine.format_table(rows))
+    imports = import_breakdown()
+    if imports:
+        rows = [("Module", "Self", "Total")] + [(name, f"{own:.1f} ms", f"{total:.1f} ms") for name, own, total in imports]
+        print("\nSlowest imports (fresh interpreter):")
+        print(engine.format_table(rows))
+    sys.stdout.flush()
+
+
 class Py2WinApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, profile_startup=False):
         super().__init__()
+        STARTUP_MARKS.append(("Create window", time.perf_counter()))
+        self.profile_startup = profile_startup
 
         self.title("Py2Win")
         self.geometry("800x650")
@@ -71,17 +139,58 @@ class Py2WinApp(ctk.CTk):
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(3, weight=1)
 
+        # --- Build Queue ---
+        self.scheduler = scheduler.BuildScheduler(on_change=self.mark_queue_changed)
+        self.job_logs = {}
+        self.custom_matrix = None
+        self.env_settings = {}
+        self.daemon_status = ""
+        self.watch_stop = None
+        self.watch_messages = queue.Queue()
+        self.watch_job = None
+        self.daemon_enabled = False
+        self.dependency_probe = None
+        self.built_tabs = set()
+        self.data_paths = []
+        self.job_states = {}
+        self.viewed_job = None
+        self._queue_changed = True
+        self._queue_refreshed = 0
+
         # --- UI Elements ---
         self.create_widgets()
-        self.update_status("Ready")
+        STARTUP_MARKS.append(("Create widgets", time.perf_counter()))
+        self.update_status("Checking PyInstaller...")
         self.check_dependencies()
+        self.after(LOG_FRAME_MS, self.update_output_log)
+        self.after_idle(self.on_first_paint)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def on_first_paint(self):
+        self.update_idletasks()
+        STARTUP_MARKS.append(("First paint", time.perf_counter()))
+        if self.profile_startup:
+            print_startup_profile()
 
     def check_dependencies(self):
-        if not shutil.which("pyinstaller"):
+        # Runs `pyinstaller --version`, which takes a while, off the UI thread;
+        # update_output_log applies the result.
+        def probe():
+            import py2win_cache
+            try:
+                self.dependency_probe = py2win_cache.toolchain_info()
+            except Exception as e:
+                self.dependency_probe = e
+        threading.Thread(target=probe, daemon=True).start()
+
+    def apply_dependency_probe(self, probe):
+        if isinstance(probe, Exception):
             self.log("ERROR: PyInstaller is not installed or not in your system's PATH.")
             self.log("Please install it using: pip install pyinstaller")
             self.update_status("Error: PyInstaller not found!")
             self.build_button.configure(state="disabled", text="PyInstaller Not Found")
+        else:
+            self.update_status(f"Ready (PyInstaller {probe['pyinstaller']})")
 
     def show_about_window(self):
         about_win = ctk.CTkToplevel(self)
@@ -107,6 +216,37 @@ class Py2WinApp(ctk.CTk):
         ok_button = ctk.CTkButton(about_win, text="OK", command=about_win.destroy)
         ok_button.grid(row=4, column=0, padx=20, pady=(20,20))
 
+    def show_history_window(self):
+        import py2win_report
+        profile = self.get_profile_settings()
+        if not profile["script_path"]:
+            self.update_status("Select a script to see its build history.")
+            return
+        try:
+            targets = py2win_report.history_profiles(profile)
+        except ValueError as e:
+            self.update_status(f"Error: Invalid build matrix: {e}")
+            self.log(f"Error loading build history: {e}")
+            messagebox.showerror("Build History", f"Invalid build matrix:\n{e}", parent=self)
+            return
+        history_win = ctk.CTkToplevel(self)
+        history_win.title(f"Build History - {engine.profile_name(profile)}")
+        history_win.geometry("900x400")
+        history_win.transient(self)
+        history_win.grid_columnconfigure(0, weight=1)
+        history_win.grid_rowconfigure(0, weight=1)
+
+        history_text = ctk.CTkTextbox(history_win, wrap="none", font=ctk.CTkFont(family="Courier"))
+        history_text.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        for target in targets:
+            if len(targets) > 1:
+                history_text.insert("end", f"{engine.profile_name(target)}\n")
+            history_text.insert("end", py2win_report.format_history(py2win_report.load_history(target, limit=50)) + "\n\n")
+        history_text.configure(state="disabled")
+
+        close_button = ctk.CTkButton(history_win, text="Close", command=history_win.destroy)
+        close_button.grid(row=1, column=0, padx=10, pady=(0, 10))
+
     def create_widgets(self):
         # --- Profile Management Frame ---
         self.profile_frame = ctk.CTkFrame(self)
@@ -116,6 +256,9 @@ class Py2WinApp(ctk.CTk):
         self.about_button = ctk.CTkButton(self.profile_frame, text="About", command=self.show_about_window, width=80)
         self.about_button.grid(row=0, column=0, padx=10, pady=10, sticky="w")
 
+        self.history_button = ctk.CTkButton(self.profile_frame, text="Build History", command=self.show_history_window)
+        self.history_button.grid(row=0, column=1, padx=10, pady=10, sticky="e")
+
         self.load_profile_button = ctk.CTkButton(self.profile_frame, text="Load Profile", command=self.load_profile)
         self.load_profile_button.grid(row=0, column=3, padx=10, pady=10, sticky="e")
 
@@ -134,10 +277,11 @@ class Py2WinApp(ctk.CTk):
         self.browse_button.grid(row=0, column=2, padx=10, pady=10)
 
         # --- Tab View for Options ---
-        self.tab_view = ctk.CTkTabview(self, corner_radius=8)
+        self.tab_view = ctk.CTkTabview(self, corner_radius=8, command=self.on_tab_change)
         self.tab_view.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
         self.tab_view.add("Basic Options")
         self.tab_view.add("Pro Features")
+        self.tab_view.add("Build Queue")
 
         # --- Basic Options Tab ---
         self.basic_tab = self.tab_view.tab("Basic Options")
@@ -150,7 +294,61 @@ class Py2WinApp(ctk.CTk):
         self.onefile_check.select()
         Tooltip(self.onefile_check, "Package everything into a single executable file. Startup may be slower.")
 
-        # --- Pro Features Tab ---
+        self.force_check = ctk.CTkCheckBox(self.basic_tab, text="Force Rebuild")
+        self.force_check.grid(row=0, column=2, padx=10, pady=10, sticky="w")
+        Tooltip(self.force_check, "Ignore the build cache and rebuild from a clean work directory, even if nothing has changed.")
+
+        self.matrix_windowed_check = ctk.CTkCheckBox(self.basic_tab, text="Build Console and Windowed")
+        self.matrix_windowed_check.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.matrix_windowed_check, "Build both a console and a windowed executable. All variants share one dependency analysis.")
+
+        self.matrix_onefile_check = ctk.CTkCheckBox(self.basic_tab, text="Build One-File and One-Folder")
+        self.matrix_onefile_check.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.matrix_onefile_check, "Build both a one-file and a one-folder executable. All variants share one dependency analysis.")
+
+        self.watch_check = ctk.CTkCheckBox(self.basic_tab, text="Watch and Rebuild", command=self.toggle_watch)
+        self.watch_check.grid(row=1, column=2, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.watch_check, "Build now, then rebuild automatically whenever the script, its modules, the icon or the data files change. Changed data files are copied straight into one-folder builds.")
+
+        self.cached_extraction_check = ctk.CTkCheckBox(self.basic_tab, text="Cached Extraction")
+        self.cached_extraction_check.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.cached_extraction_check, "One-file only: the executable unpacks itself once into a per-user cache and reuses it on later starts, so it starts almost as fast as a one-folder build. Old versions are removed automatically.")
+
+        self.upx_check = ctk.CTkCheckBox(self.basic_tab, text="UPX Compression")
+        self.upx_check.grid(row=2, column=1, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.upx_check, "Compress DLLs and extension modules with UPX (needs upx on your PATH). Smaller, but each start has to decompress them. Use 'bench --compare-optimize' to measure the trade-off.")
+
+        self.strip_check = ctk.CTkCheckBox(self.basic_tab, text="Strip Symbols")
+        self.strip_check.grid(row=2, column=2, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.strip_check, "Remove symbol tables from the bundled libraries. Has no effect on Windows.")
+
+        self.optimize_check = ctk.CTkCheckBox(self.basic_tab, text="Optimize Bytecode")
+        self.optimize_check.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="w")
+        Tooltip(self.optimize_check, "Compile Python code at optimisation level 2, which drops asserts and docstrings. Do not use with libraries that need their docstrings.")
+
+        # --- Output Log ---
+        self.output_log = LogView(self, corner_radius=8)
+        self.app_log = self.output_log.buffer
+        self.output_log.grid(row=3, column=0, padx=10, pady=(5, 10), sticky="nsew")
+
+        # --- Build Button ---
+        self.build_button = ctk.CTkButton(self, text="Build Executable", height=40, command=self.start_build_thread)
+        self.build_button.grid(row=4, column=0, padx=10, pady=10, sticky="ew")
+
+        # --- Status Bar ---
+        self.status_bar = ctk.CTkLabel(self, text="", anchor="w")
+        self.status_bar.grid(row=5, column=0, padx=10, pady=(0, 10), sticky="ew")
+
+    def on_tab_change(self):
+        self.ensure_tab(self.tab_view.get())
+
+    def ensure_tab(self, name):
+        """Creates the widgets of a lazily built tab if it has not been shown yet."""
+        if name in LAZY_TABS and name not in self.built_tabs:
+            self.built_tabs.add(name)
+            getattr(self, LAZY_TABS[name])()
+
+    def create_pro_tab(self):
         self.pro_tab = self.tab_view.tab("Pro Features")
         self.pro_tab.grid_columnconfigure(0, weight=1)
         self.pro_tab.grid_rowconfigure(1, weight=1)
@@ -165,6 +363,13 @@ class Py2WinApp(ctk.CTk):
         self.icon_browse_button = ctk.CTkButton(self.icon_frame, text="Browse", command=self.browse_icon)
         self.icon_browse_button.grid(row=0, column=2, padx=10, pady=10)
         Tooltip(self.icon_browse_button, "Select a .ico file to use as the icon for the executable.")
+        self.requirements_label = ctk.CTkLabel(self.icon_frame, text="Requirements:")
+        self.requirements_label.grid(row=1, column=0, padx=10, pady=(0, 10))
+        self.requirements_entry = ctk.CTkEntry(self.icon_frame, placeholder_text="Optional requirements.txt for an isolated build environment")
+        self.requirements_entry.grid(row=1, column=1, padx=10, pady=(0, 10), sticky="ew")
+        self.requirements_browse_button = ctk.CTkButton(self.icon_frame, text="Browse", command=self.browse_requirements)
+        self.requirements_browse_button.grid(row=1, column=2, padx=10, pady=(0, 10))
+        Tooltip(self.requirements_browse_button, "Build in a cached virtual environment with only these packages, installed offline from the 'wheelhouse' folder next to the requirements file.")
 
         self.data_frame = ctk.CTkFrame(self.pro_tab)
         self.data_frame.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
@@ -174,7 +379,6 @@ class Py2WinApp(ctk.CTk):
         self.data_label.grid(row=0, column=0, columnspan=2, padx=10, pady=(10, 0), sticky="w")
         self.data_listbox = Listbox(self.data_frame, bg="#2B2B2B", fg="white", selectbackground="#1F6AA5", borderwidth=0, highlightthickness=1, highlightcolor="#565B5E", selectmode="extended")
         self.data_listbox.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
-        self.data_paths = []
         self.data_buttons_frame = ctk.CTkFrame(self.data_frame)
         self.data_buttons_frame.grid(row=1, column=1, padx=(0, 10), pady=10, sticky="ns")
         self.add_file_button = ctk.CTkButton(self.data_buttons_frame, text="Add File(s)", command=self.add_data_file)
@@ -188,17 +392,90 @@ class Py2WinApp(ctk.CTk):
         self.remove_data_button = ctk.CTkButton(self.data_buttons_frame, text="Remove", command=self.remove_selected_data)
         self.remove_data_button.grid(row=2, column=0, padx=5, pady=5)
 
-        # --- Output Textbox ---
-        self.output_textbox = ctk.CTkTextbox(self, state="disabled", corner_radius=8)
-        self.output_textbox.grid(row=3, column=0, padx=10, pady=(5, 10), sticky="nsew")
-
-        # --- Build Button ---
-        self.build_button = ctk.CTkButton(self, text="Build Executable", height=40, command=self.start_build_thread)
-        self.build_button.grid(row=4, column=0, padx=10, pady=10, sticky="ew")
-
-        # --- Status Bar ---
-        self.status_bar = ctk.CTkLabel(self, text="", anchor="w")
-        self.status_bar.grid(row=5, column=0, padx=10, pady=(0, 10), sticky="ew")
+        self.data_rules_frame = ctk.CTkFrame(self.data_frame, fg_color="transparent")
+        self.data_rules_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="ew")
+        self.data_rules_frame.grid_columnconfigure((1, 3), weight=1)
+        self.data_include_label = ctk.CTkLabel(self.data_rules_frame, text="Include:")
+        self.data_include_label.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.data_include_entry = ctk.CTkEntry(self.data_rules_frame, placeholder_text="All files, or e.g. *.png, *.json")
+        self.data_include_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.data_exclude_label = ctk.CTkLabel(self.data_rules_frame, text="Exclude:")
+        self.data_exclude_label.grid(row=0, column=2, padx=5, pady=5, sticky="w")
+        self.data_exclude_entry = ctk.CTkEntry(self.data_rules_frame, placeholder_text="e.g. *.psd, **/docs/*")
+        self.data_exclude_entry.grid(row=0, column=3, padx=5, pady=5, sticky="ew")
+        Tooltip(self.data_exclude_entry, "Comma-separated glob patterns. __pycache__, .git and *.pyc are always excluded.")
+        self.data_include_entry.bind("<FocusOut>", lambda e: self.refresh_data_manifest())
+        self.data_exclude_entry.bind("<FocusOut>", lambda e: self.refresh_data_manifest())
+        self.data_manifest_label = ctk.CTkLabel(self.data_rules_frame, text="", anchor="w", text_color="gray")
+        self.data_manifest_label.grid(row=1, column=0, columnspan=4, padx=5, pady=(0, 5), sticky="ew")
+        self._manifest_generation = 0
+
+        self.modules_frame = ctk.CTkFrame(self.pro_tab)
+        self.modules_frame.grid(row=2, column=0, padx=5, pady=5, sticky="ew")
+        self.modules_frame.grid_columnconfigure(1, weight=1)
+        self.excludes_label = ctk.CTkLabel(self.modules_frame, text="Exclude Modules:")
+        self.excludes_label.grid(row=0, column=0, padx=10, pady=(10, 5), sticky="w")
+        self.excludes_entry = ctk.CTkEntry(self.modules_frame, placeholder_text="Comma-separated, e.g. numpy, unittest")
+        self.excludes_entry.grid(row=0, column=1, padx=10, pady=(10, 5), sticky="ew")
+        self.hidden_imports_label = ctk.CTkLabel(self.modules_frame, text="Hidden Imports:")
+        self.hidden_imports_label.grid(row=1, column=0, padx=10, pady=(5, 10), sticky="w")
+        self.hidden_imports_entry = ctk.CTkEntry(self.modules_frame, placeholder_text="Modules loaded dynamically at runtime")
+        self.hidden_imports_entry.grid(row=1, column=1, padx=10, pady=(5, 10), sticky="ew")
+        self.upx_exclude_label = ctk.CTkLabel(self.modules_frame, text="UPX Exclude:")
+        self.upx_exclude_label.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="w")
+        self.upx_exclude_entry = ctk.CTkEntry(self.modules_frame, placeholder_text="Libraries UPX must not compress, e.g. libcrypto*.dll")
+        self.upx_exclude_entry.grid(row=2, column=1, padx=10, pady=(0, 10), sticky="ew")
+        Tooltip(self.upx_exclude_entry, "Comma-separated file names or glob patterns. Visual C++ runtime DLLs and Qt plugins are always excluded.")
+        self.analyze_button = ctk.CTkButton(self.modules_frame, text="Analyze Imports", command=self.start_analysis_thread)
+        self.analyze_button.grid(row=0, column=2, rowspan=2, padx=10, pady=10)
+        Tooltip(self.analyze_button, "Scan your script's imports to see which packages it pulls in and get suggestions to shrink the executable.")
+
+    def create_queue_tab(self):
+        import py2win_daemon
+        self.queue_tab = self.tab_view.tab("Build Queue")
+        self.queue_tab.grid_columnconfigure(0, weight=1)
+        self.queue_tab.grid_rowconfigure(0, weight=1)
+        self.queue_listbox = Listbox(self.queue_tab, bg="#2B2B2B", fg="white", selectbackground="#1F6AA5", borderwidth=0, highlightthickness=1, highlightcolor="#565B5E", selectmode="browse", height=6)
+        self.queue_listbox.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        self.queue_listbox.bind("<<ListboxSelect>>", self.on_queue_select)
+        self.queue_buttons_frame = ctk.CTkFrame(self.queue_tab)
+        self.queue_buttons_frame.grid(row=0, column=1, padx=(0, 10), pady=10, sticky="ns")
+        self.cancel_button = ctk.CTkButton(self.queue_buttons_frame, text="Cancel", command=self.cancel_selected_job)
+        self.cancel_button.grid(row=0, column=0, padx=5, pady=5)
+        Tooltip(self.cancel_button, "Stop the selected build, including all PyInstaller processes, and remove its work directory.")
+        self.clear_jobs_button = ctk.CTkButton(self.queue_buttons_frame, text="Clear Finished", command=self.clear_finished_jobs)
+        self.clear_jobs_button.grid(row=1, column=0, padx=5, pady=5)
+
+        self.queue_settings_frame = ctk.CTkFrame(self.queue_tab, fg_color="transparent")
+        self.queue_settings_frame.grid(row=1, column=0, columnspan=2, padx=5, pady=(0, 5), sticky="ew")
+        self.max_parallel_label = ctk.CTkLabel(self.queue_settings_frame, text="Max Parallel:")
+        self.max_parallel_label.grid(row=0, column=0, padx=5, pady=5)
+        self.max_parallel_menu = ctk.CTkOptionMenu(self.queue_settings_frame, width=70, values=[str(n) for n in range(1, (os.cpu_count() or 1) + 1)], command=self.scheduler.set_max_concurrency)
+        self.max_parallel_menu.set(str(self.scheduler.max_concurrency))
+        self.max_parallel_menu.grid(row=0, column=1, padx=5, pady=5)
+        self.priority_label = ctk.CTkLabel(self.queue_settings_frame, text="Priority:")
+        self.priority_label.grid(row=0, column=2, padx=(15, 5), pady=5)
+        self.priority_menu = ctk.CTkOptionMenu(self.queue_settings_frame, width=100, values=list(PRIORITIES))
+        self.priority_menu.set("Normal")
+        self.priority_menu.grid(row=0, column=3, padx=5, pady=5)
+        Tooltip(self.priority_menu, "Priority of the next build you queue. Higher-priority builds start first.")
+        self.timeout_label = ctk.CTkLabel(self.queue_settings_frame, text="Timeout (min):")
+        self.timeout_label.grid(row=0, column=4, padx=(15, 5), pady=5)
+        self.timeout_entry = ctk.CTkEntry(self.queue_settings_frame, width=60, placeholder_text="none")
+        self.timeout_entry.grid(row=0, column=5, padx=5, pady=5)
+        Tooltip(self.timeout_entry, "Builds running longer than this are stopped automatically.")
+        self.daemon_check = ctk.CTkCheckBox(self.queue_settings_frame, text="Warm Build Daemon", command=self.toggle_daemon)
+        self.daemon_check.grid(row=0, column=6, padx=(15, 5), pady=5)
+        Tooltip(self.daemon_check, "Keep PyInstaller loaded in a background build server, so builds start much faster. Not available on Windows.")
+        self.daemon_label = ctk.CTkLabel(self.queue_settings_frame, text="", anchor="w")
+        self.daemon_label.grid(row=1, column=0, columnspan=7, padx=5, sticky="w")
+        if not py2win_daemon.is_supported():
+            self.daemon_check.configure(state="disabled")
+        elif self.daemon_enabled or py2win_daemon.connect():
+            self.daemon_check.select()
+            self.daemon_enabled = True
+            self.refresh_daemon_stats()
+        self.mark_queue_changed()
 
     def save_profile(self):
         self.update_status("Saving profile...")
@@ -211,13 +488,7 @@ class Py2WinApp(ctk.CTk):
             self.update_status("Save cancelled.")
             return
 
-        settings = {
-            "script_path": self.script_entry.get(),
-            "is_windowed": self.windowed_check.get(),
-            "is_onefile": self.onefile_check.get(),
-            "icon_path": self.icon_entry.get(),
-            "data_paths": list(self.data_paths)
-        }
+        settings = self.get_profile_settings()
 
         try:
             with open(profile_path, 'w') as f:
@@ -227,6 +498,47 @@ class Py2WinApp(ctk.CTk):
             self.update_status(f"Error saving profile: {e}")
             self.log(f"Error saving profile: {e}")
 
+    def get_profile_settings(self):
+        self.ensure_tab("Pro Features")
+        return {
+            "script_path": self.script_entry.get(),
+            "is_windowed": self.windowed_check.get(),
+            "is_onefile": self.onefile_check.get(),
+            "cached_extraction": self.cached_extraction_check.get(),
+            "upx": self.upx_check.get(),
+            "strip": self.strip_check.get(),
+            "optimize": 2 if self.optimize_check.get() else 0,
+            "icon_path": self.icon_entry.get(),
+            "data_paths": list(self.data_paths),
+            "data_include": self._split_names(self.data_include_entry.get()),
+            "data_exclude": self._split_names(self.data_exclude_entry.get()),
+            "excludes": self._split_names(self.excludes_entry.get()),
+            "hidden_imports": self._split_names(self.hidden_imports_entry.get()),
+            "upx_exclude": self._split_names(self.upx_exclude_entry.get()),
+            "requirements": self.requirements_entry.get(),
+            **self.env_settings,
+            **self._matrix_settings()
+        }
+
+    def _matrix_settings(self):
+        if self.custom_matrix:
+            return {"matrix": self.custom_matrix}
+        matrix = {}
+        if self.matrix_windowed_check.get():
+            matrix["is_windowed"] = [0, 1]
+        if self.matrix_onefile_check.get():
+            matrix["is_onefile"] = [1, 0]
+        return {"matrix": matrix} if matrix else {}
+
+    @staticmethod
+    def _split_names(text):
+        return [name.strip() for name in text.split(",") if name.strip()]
+
+    def _set_entry(self, entry, text):
+        entry.delete(0, "end")
+        if text:
+            entry.insert(0, text)
+
     def load_profile(self):
         self.update_status("Loading profile...")
         profile_path = filedialog.askopenfilename(
@@ -237,6 +549,7 @@ class Py2WinApp(ctk.CTk):
             self.update_status("Load cancelled.")
             return
 
+        self.ensure_tab("Pro Features")
         try:
             with open(profile_path, 'r') as f:
                 settings = json.load(f)
@@ -250,6 +563,14 @@ class Py2WinApp(ctk.CTk):
             # Apply loaded settings
             self.script_entry.insert(0, settings.get("script_path", ""))
             self.icon_entry.insert(0, settings.get("icon_path", ""))
+            self._set_entry(self.data_include_entry, ", ".join(settings.get("data_include", [])))
+            self._set_entry(self.data_exclude_entry, ", ".join(settings.get("data_exclude", [])))
+            self._set_entry(self.excludes_entry, ", ".join(settings.get("excludes", [])))
+            self._set_entry(self.hidden_imports_entry, ", ".join(settings.get("hidden_imports", [])))
+            self._set_entry(self.upx_exclude_entry, ", ".join(settings.get("upx_exclude", [])))
+            self._set_entry(self.requirements_entry, settings.get("requirements", ""))
+            # Settings without a widget of their own are saved back unchanged.
+            self.env_settings = {key: settings[key] for key in ("wheelhouse", "python", "upx_dir") if settings.get(key)}
 
             if settings.get("is_windowed", 0): self.windowed_check.select()
             else: self.windowed_check.deselect()
@@ -257,10 +578,27 @@ class Py2WinApp(ctk.CTk):
             if settings.get("is_onefile", 1): self.onefile_check.select()
             else: self.onefile_check.deselect()
 
+            if settings.get("cached_extraction", 0): self.cached_extraction_check.select()
+            else: self.cached_extraction_check.deselect()
+
+            for check, key in ((self.upx_check, "upx"), (self.strip_check, "strip"), (self.optimize_check, "optimize")):
+                if settings.get(key, 0): check.select()
+                else: check.deselect()
+
+            # Matrices other than the two checkboxes are kept as written.
+            matrix = settings.get("matrix") or {}
+            simple = isinstance(matrix, dict) and set(matrix) <= {"is_windowed", "is_onefile"}
+            self.custom_matrix = None if simple else matrix
+            for check, key in ((self.matrix_windowed_check, "is_windowed"), (self.matrix_onefile_check, "is_onefile")):
+                if simple and key in matrix: check.select()
+                else: check.deselect()
+                check.configure(state="normal" if simple else "disabled")
+
             for path in settings.get("data_paths", []):
                 self.data_paths.append(path)
                 prefix = "DIR:  " if os.path.isdir(path) else "FILE: "
                 self.data_listbox.insert("end", f"{prefix}{path}")
+            self.refresh_data_manifest()
 
             self.update_status(f"Profile loaded from {os.path.basename(profile_path)}")
 
@@ -291,6 +629,12 @@ class Py2WinApp(ctk.CTk):
         else:
             self.update_status("Ready")
 
+    def browse_requirements(self):
+        filepath = filedialog.askopenfilename(title="Select a Requirements File", filetypes=(("Requirements files", "*.txt"), ("All files", "*.*")))
+        if filepath:
+            self._set_entry(self.requirements_entry, filepath)
+            self.update_status(f"Selected requirements: {os.path.basename(filepath)}")
+
     def add_data_file(self):
         filepaths = filedialog.askopenfilenames(title="Select File(s) to Bundle")
         if filepaths:
@@ -299,6 +643,7 @@ class Py2WinApp(ctk.CTk):
                     self.data_paths.append(path)
                     self.data_listbox.insert("end", f"FILE: {path}")
             self.update_status(f"Added {len(filepaths)} file(s).")
+            self.refresh_data_manifest()
 
     def add_data_folder(self):
         folderpath = filedialog.askdirectory(title="Select a Folder to Bundle")
@@ -306,6 +651,7 @@ class Py2WinApp(ctk.CTk):
             self.data_paths.append(folderpath)
             self.data_listbox.insert("end", f"DIR:  {folderpath}")
             self.update_status(f"Added folder: {os.path.basename(folderpath)}")
+            self.refresh_data_manifest()
 
     def remove_selected_data(self):
         selected_indices = self.data_listbox.curselection()
@@ -315,32 +661,268 @@ class Py2WinApp(ctk.CTk):
             self.data_listbox.delete(i)
             del self.data_paths[i]
         self.update_status(f"Removed {len(selected_indices)} item(s).")
+        self.refresh_data_manifest()
+
+    def refresh_data_manifest(self):
+        # Hashing large asset folders can take a while the first time, so the
+        # manifest is built in the background; stale results are ignored.
+        self._manifest_generation += 1
+        generation = self._manifest_generation
+        profile = self.get_profile_settings()
+        if not profile["data_paths"]:
+            self.data_manifest_label.configure(text="")
+            return
+        self.data_manifest_label.configure(text="Scanning data files...")
+
+        def scan():
+            import py2win_data
+            try:
+                text = py2win_data.build_manifest(profile).summary()
+            except Exception as e:
+                text = f"Could not scan data files: {e}"
+            self.after(0, lambda: generation == self._manifest_generation and self.data_manifest_label.configure(text=text))
+
+        threading.Thread(target=scan, daemon=True).start()
+
+    def start_analysis_thread(self):
+        profile = self.get_profile_settings()
+        if not profile["script_path"] or not os.path.exists(profile["script_path"]):
+            self.update_status("Error: Please select a valid Python script.")
+            return
+        self.analyze_button.configure(state="disabled", text="Analyzing...")
+        self.update_status("Analyzing imports...")
+        threading.Thread(target=self.run_analysis, args=(profile,), daemon=True).start()
+
+    def run_analysis(self, profile):
+        import py2win_analyze
+        try:
+            analysis = py2win_analyze.analyze(profile)
+        except Exception as e:
+            self.after(0, self.finish_analysis, None, str(e))
+        else:
+            self.after(0, self.finish_analysis, analysis, None)
+
+    def finish_analysis(self, analysis, error):
+        import py2win_analyze
+        self.analyze_button.configure(state="normal", text="Analyze Imports")
+        if error:
+            self.update_status(f"Analysis failed: {error}")
+            self.log(f"Analysis failed: {error}")
+            return
+        self.log(py2win_analyze.format_analysis(analysis))
+        self.update_status(f"Analysis complete: {len(analysis['suggestions'])} suggestion(s).")
+        if analysis["suggestions"]:
+            self.show_suggestions_window(analysis["suggestions"])
+
+    def show_suggestions_window(self, suggestions):
+        suggestions_win = ctk.CTkToplevel(self)
+        suggestions_win.title("Import Suggestions")
+        suggestions_win.geometry("700x400")
+        suggestions_win.transient(self)
+        suggestions_win.grid_columnconfigure(0, weight=1)
+        suggestions_win.grid_rowconfigure(0, weight=1)
+
+        suggestions_frame = ctk.CTkScrollableFrame(suggestions_win)
+        suggestions_frame.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
+        checks = []
+        for suggestion in suggestions:
+            kind = "Exclude" if suggestion["kind"] == "exclude" else "Hidden import"
+            size = f" (~{engine.format_size(suggestion['size'])})" if suggestion["size"] else ""
+            if suggestion.get("precautionary"):
+                size = " (precautionary)"
+            check = ctk.CTkCheckBox(suggestions_frame, text=f"{kind}: {suggestion['name']}{size}")
+            check.pack(anchor="w", padx=10, pady=(8, 0))
+            reason = ctk.CTkLabel(suggestions_frame, text=suggestion["reason"], wraplength=600, justify="left", text_color="gray")
+            reason.pack(anchor="w", padx=40)
+            checks.append((check, suggestion))
+
+        def apply_selected():
+            import py2win_analyze
+            profile = py2win_analyze.apply_suggestions(self.get_profile_settings(), [s for c, s in checks if c.get()])
+            self._set_entry(self.excludes_entry, ", ".join(profile["excludes"]))
+            self._set_entry(self.hidden_imports_entry, ", ".join(profile["hidden_imports"]))
+            self.update_status("Suggestions applied. Save the profile to keep them.")
+            suggestions_win.destroy()
+
+        apply_button = ctk.CTkButton(suggestions_win, text="Apply Selected", command=apply_selected)
+        apply_button.grid(row=1, column=0, padx=10, pady=(0, 10))
 
     def log(self, message):
-        self.output_textbox.configure(state="normal")
-        self.output_textbox.insert("end", message + "\n")
-        self.output_textbox.see("end")
-        self.output_textbox.configure(state="disabled")
+        self.output_log.append_many(message.split("\n"))
 
     def update_status(self, message):
         self.status_bar.configure(text=message)
 
+    def mark_queue_changed(self):
+        # Called from the scheduler's event loop thread; the UI picks it up on the next frame.
+        self._queue_changed = True
+
     def update_output_log(self):
+        if self.dependency_probe is not None:
+            probe, self.dependency_probe = self.dependency_probe, None
+            self.apply_dependency_probe(probe)
+        # Drain every build's log queue in one batch per frame, so the log view
+        # is redrawn once per frame instead of once per line.
+        for job in list(self.scheduler.jobs):
+            batch = []
+            try:
+                while len(batch) < LOG_BATCH_LIMIT:
+                    batch.extend(job.log_queue.get_nowait().rstrip().split("\n"))
+            except queue.Empty:
+                pass
+            if batch:
+                buffer = self.job_logs.setdefault(job.id, LogBuffer())
+                if job is self.viewed_job:
+                    self.output_log.append_many(batch)
+                else:
+                    buffer.append_many(batch)
+
+        messages = []
         try:
             while True:
-                line = self.output_queue.get_nowait()
-                if line is None: # Sentinel value
-                    if self.build_successful:
-                        self.update_status("Build successful!")
-                    else:
-                        self.update_status("Build failed. Check log for details.")
-                    self.build_button.configure(state="normal", text="Build Executable")
-                    return
-                self.log(line.strip())
+                messages.append(self.watch_messages.get_nowait())
         except queue.Empty:
             pass
-        if self.build_button.cget("state") == "disabled":
-            self.after(100, self.update_output_log)
+        if messages:
+            self.app_log.append_many([line for message in messages for line in message.split("\n")])
+            self.update_status(messages[-1].strip())
+        job, self.watch_job = self.watch_job, None
+        if job:
+            self.view_job(job)
+
+        now = time.monotonic()
+        if self._queue_changed or now - self._queue_refreshed >= QUEUE_REFRESH_MS / 1000:
+            self._queue_changed = False
+            self._queue_refreshed = now
+            self.refresh_queue()
+        self.after(LOG_FRAME_MS, self.update_output_log)
+
+    def refresh_queue(self):
+        jobs = list(self.scheduler.jobs)
+        if "Build Queue" in self.built_tabs:
+            selection = self.queue_listbox.curselection()
+            self.queue_listbox.delete(0, "end")
+            for job in jobs:
+                elapsed = f"{job.elapsed:.0f}s" if job.started else ""
+                phase = f"({job.phase})" if job.state == scheduler.RUNNING and job.phase else ""
+                self.queue_listbox.insert("end", f"#{job.id:<4} {job.state:<10} {job.name:<24} {elapsed} {phase}")
+            if self.viewed_job in jobs:
+                self.queue_listbox.selection_set(jobs.index(self.viewed_job))
+            elif selection and selection[0] < len(jobs):
+                self.queue_listbox.selection_set(selection[0])
+            if self.daemon_label.cget("text") != self.daemon_status:
+                self.daemon_label.configure(text=self.daemon_status)
+
+        for job in jobs:
+            previous = self.job_states.get(job.id)
+            if previous != job.state and job.state in scheduler.FINISHED_STATES:
+                self.job_logs.get(job.id, self.output_log.buffer).flush()
+                if job.state == scheduler.SUCCEEDED:
+                    artifact = f": {os.path.basename(job.artifacts[-1])}" if job.artifacts else ""
+                    self.update_status(f"Build of {job.name} successful{artifact}!")
+                elif job.state == scheduler.FAILED:
+                    self.update_status(f"Build of {job.name} failed. Check log for details.")
+                else:
+                    self.update_status(f"Build of {job.name} {job.state}.")
+                if self.daemon_enabled:
+                    self.refresh_daemon_stats()
+            self.job_states[job.id] = job.state
+        running, pending = self.scheduler.counts()
+        if running or pending:
+            self.build_button.configure(text=f"Build Executable ({running} running, {pending} queued)")
+        elif self.build_button.cget("state") == "normal":
+            self.build_button.configure(text="Build Executable")
+
+    def toggle_daemon(self):
+        import py2win_daemon
+        enable = self.daemon_enabled = bool(self.daemon_check.get())
+        self.daemon_status = "Starting build daemon..." if enable else "Stopping build daemon..."
+
+        def run():
+            try:
+                if enable:
+                    self.daemon_status = py2win_daemon.format_stats(py2win_daemon.start().stats())
+                else:
+                    py2win_daemon.stop()
+                    self.daemon_status = ""
+            except (RuntimeError, OSError) as e:
+                self.daemon_status = f"Build daemon error: {e}"
+            self.mark_queue_changed()
+        threading.Thread(target=run, daemon=True).start()
+
+    def refresh_daemon_stats(self):
+        def run():
+            import py2win_daemon
+            client = py2win_daemon.connect()
+            self.daemon_status = py2win_daemon.format_stats(client.stats()) if client else "Build daemon is not running."
+            self.mark_queue_changed()
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_queue_select(self, event=None):
+        selection = self.queue_listbox.curselection()
+        jobs = list(self.scheduler.jobs)
+        if selection and selection[0] < len(jobs):
+            self.view_job(jobs[selection[0]])
+
+    def view_job(self, job):
+        self.viewed_job = job
+        self.output_log.set_buffer(self.job_logs.setdefault(job.id, LogBuffer()))
+
+    def cancel_selected_job(self):
+        selection = self.queue_listbox.curselection()
+        jobs = list(self.scheduler.jobs)
+        if not selection or selection[0] >= len(jobs):
+            self.update_status("Select a build in the queue to cancel it.")
+            return
+        job = jobs[selection[0]]
+        if self.scheduler.cancel(job):
+            self.update_status(f"Cancelling build of {job.name}...")
+        else:
+            self.update_status(f"Build of {job.name} has already finished.")
+
+    def clear_finished_jobs(self):
+        self.scheduler.clear_finished()
+        remaining = {job.id for job in self.scheduler.jobs}
+        for job_id in list(self.job_logs):
+            if job_id not in remaining:
+                buffer = self.job_logs.pop(job_id)
+                if buffer is not self.output_log.buffer:
+                    buffer.clear()
+        self.job_states = {k: v for k, v in self.job_states.items() if k in remaining}
+
+    def toggle_watch(self):
+        if not self.watch_check.get():
+            if self.watch_stop:
+                self.watch_stop.set()
+                self.watch_stop = None
+            self.update_status("Stopped watching for changes.")
+            return
+        script_path = self.script_entry.get()
+        if not script_path or not os.path.exists(script_path):
+            self.watch_check.deselect()
+            self.update_status("Error: Please select a valid Python script.")
+            return
+        import py2win_watch
+        self.watch_stop = threading.Event()
+        watcher = py2win_watch.Watcher(self.get_profile_settings(), log=self.watch_messages.put, build=self.build_and_wait)
+        threading.Thread(target=watcher.run, args=(self.watch_stop,), daemon=True).start()
+        self.update_status("Watching for changes...")
+
+    def build_and_wait(self, profile):
+        # Runs on the watcher thread: the build goes through the queue like
+        # any other, and the log view switches to it on the next frame.
+        job = self.scheduler.submit(profile, priority=PRIORITIES["High"])
+        self.watch_job = job
+        job.done.wait()
+        return job.result
+
+    def on_close(self):
+        if self.watch_stop:
+            self.watch_stop.set()
+        # PyInstaller runs in its own process group, so it would outlive the
+        # window unless the builds are stopped before the interpreter exits.
+        self.scheduler.shutdown()
+        self.destroy()
 
     def start_build_thread(self):
         script_path = self.script_entry.get()
@@ -349,55 +931,19 @@ class Py2WinApp(ctk.CTk):
             self.log("Error: Please select a valid Python script.")
             return
 
-        self.build_button.configure(state="disabled", text="Building...")
-        self.update_status("Building... See log for details.")
-        self.output_textbox.configure(state="normal")
-        self.output_textbox.delete("1.0", "end")
-        self.output_textbox.configure(state="disabled")
-        
-        self.output_queue = queue.Queue()
-        self.build_successful = False
-        
-        build_thread = threading.Thread(target=self.run_build_process, args=(script_path,), daemon=True)
-        build_thread.start()
-        self.after(100, self.update_output_log)
-
-    def run_build_process(self, script_path):
-        icon_path = self.icon_entry.get()
-        additional_files = list(self.data_paths)
-        is_windowed = self.windowed_check.get()
-        is_onefile = self.onefile_check.get()
-
-        command = ["pyinstaller", "--clean"]
-        if is_onefile: command.append("--onefile")
-        if is_windowed: command.append("--windowed")
-        if icon_path and os.path.exists(icon_path): command.append(f"--icon={icon_path}")
-        for path in additional_files:
-            source_path = os.path.abspath(path)
-            if os.path.exists(source_path):
-                destination = os.path.basename(source_path) if os.path.isdir(source_path) else "."
-                separator = ";" if os.name == 'nt' else ":"
-                command.append(f'--add-data={source_path}{separator}{destination}')
-        command.append(script_path)
-
-        self.output_queue.put(f"Running command: {' '.join(command)}\n")
-        
+        self.ensure_tab("Build Queue")
+        timeout_text = self.timeout_entry.get().strip()
         try:
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace', bufsize=1, creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-            for line in iter(process.stdout.readline, ''):
-                self.output_queue.put(line)
-            process.stdout.close()
-            process.wait()
-            if process.returncode == 0:
-                self.output_queue.put("\n--- Build successful! ---")
-                self.build_successful = True
-            else:
-                self.output_queue.put(f"\n--- Build failed with exit code {process.returncode} ---")
-        except Exception as e:
-            self.output_queue.put(f"\n--- An unexpected error occurred: {e} ---")
-        finally:
-            self.output_queue.put(None)
+            timeout = float(timeout_text) * 60 if timeout_text else None
+        except ValueError:
+            self.update_status("Error: Timeout must be a number of minutes.")
+            return
+
+        profile = self.get_profile_settings()
+        job = self.scheduler.submit(profile, priority=PRIORITIES[self.priority_menu.get()], timeout=timeout, force=bool(self.force_check.get()))
+        self.view_job(job)
+        self.update_status(f"Queued build #{job.id} of {job.name}. See log for details.")
 
 if __name__ == "__main__":
-    app = Py2WinApp()
+    app = Py2WinApp(profile_startup="--profile-startup" in sys.argv[1:])
     app.mainloop()
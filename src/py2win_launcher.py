@@ -0,0 +1,204 @@
+"""
+Py2Win Launcher - Start-up stub of executables built with cached extraction.
+
+Py2Win freezes this script into a small one-file executable and appends the
+application's one-dir build to it as a zip archive. The zip comment names the
+application, the content hash of the payload and the executable to start,
+followed by a copy of the bootloader's archive cookie. When the result is
+run, the launcher:
+
+- looks for <cache>/<name>/<hash>/ and reuses it when its marker file is
+  there and every file listed in it still has the recorded size;
+- otherwise extracts the payload into a temporary folder next to it and
+  renames that into place, so an interrupted or concurrent extraction never
+  leaves a half-written version behind;
+- after extracting, evicts all but the KEEP_VERSIONS most recently used
+  versions of the application;
+- replaces itself with the application's executable (on Windows, runs it
+  and passes on its exit code).
+
+If the cache cannot be written, the payload is extracted into a temporary
+folder that is removed again on exit, like a regular one-file build.
+
+This runs before every start of the application, so it only uses the
+standard library, must not import anything from Py2Win and leaves imports
+that are only needed for extracting until they are needed.
+"""
+import os
+import sys
+import json
+import stat
+
+
+MARKER = ".py2win-extracted"
+KEEP_VERSIONS = 2
+STALE_SECONDS = 3600
+EOCD = b"PK\x05\x06"
+EOCD_SIZE = 22
+
+
+def cache_root():
+    root = os.environ.get("PY2WIN_EXTRACT_CACHE")
+    if root:
+        return root
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "py2win", "extract")
+
+
+def read_info(path):
+    """Returns the payload description stored in the zip comment at the end of `path`."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - EOCD_SIZE - 0xFFFF))
+        tail = f.read()
+    index = tail.rfind(EOCD)
+    if index < 0:
+        raise ValueError(f"{path} carries no Py2Win payload")
+    length = int.from_bytes(tail[index + 20:index + 22], "little")
+    comment = tail[index + EOCD_SIZE:index + EOCD_SIZE + length]
+    return json.JSONDecoder().raw_decode(comment.decode("latin-1"))[0]
+
+
+def is_intact(directory, payload_id):
+    """Cheap integrity check: the marker matches and no file changed size."""
+    try:
+        with open(os.path.join(directory, MARKER), 'r') as f:
+            marker = json.load(f)
+        if marker["id"] != payload_id:
+            return False
+        for name, size in marker["files"].items():
+            if os.lstat(os.path.join(directory, name)).st_size != size:
+                return False
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
+    return True
+
+
+def _extract_all(archive, directory):
+    files = {}
+    for info in archive.infolist():
+        mode = info.external_attr >> 16
+        if stat.S_ISLNK(mode):
+            path = os.path.join(directory, *info.filename.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.symlink(archive.read(info).decode("utf-8"), path)
+        else:
+            path = archive.extract(info, directory)
+            # zipfile does not restore permissions; executables need them.
+            if mode and not info.is_dir():
+                os.chmod(path, stat.S_IMODE(mode))
+        if not info.is_dir():
+            files[info.filename] = os.lstat(path).st_size
+    return files
+
+
+def extract(executable, directory, payload_id):
+    import shutil
+    import zipfile
+    staging = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        with zipfile.ZipFile(executable) as archive:
+            files = _extract_all(archive, staging)
+        with open(os.path.join(staging, MARKER), 'w') as f:
+            json.dump({"id": payload_id, "files": files}, f)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Another launch finished first, or a damaged version is in the way.
+            if not is_intact(directory, payload_id):
+                remove_version(directory)
+                os.rename(staging, directory)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def remove_version(directory):
+    import shutil
+    # Without its marker a partly removed version (files still in use on
+    # Windows) is never mistaken for an intact one.
+    try:
+        os.remove(os.path.join(directory, MARKER))
+    except OSError:
+        pass
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def evict(app_dir, current, keep=KEEP_VERSIONS):
+    """Removes all but the `keep` most recently used versions in `app_dir`."""
+    import time
+    import shutil
+    versions = []
+    now = time.time()
+    for entry in os.scandir(app_dir):
+        if not entry.is_dir() or entry.path == current:
+            continue
+        if entry.name.endswith(".tmp"):
+            if now - entry.stat().st_mtime > STALE_SECONDS:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            continue
+        try:
+            last_used = os.stat(os.path.join(entry.path, MARKER)).st_mtime
+        except OSError:
+            last_used = 0
+        versions.append((last_used, entry.path))
+    versions.sort(reverse=True)
+    for _, path in versions[keep - 1:]:
+        remove_version(path)
+
+
+def environment(launcher):
+    env = {key: value for key, value in os.environ.items() if not key.startswith("_PYI_") and key != "_MEIPASS2"}
+    # The launcher's bootloader pointed the library path at its own files.
+    if "LD_LIBRARY_PATH_ORIG" in env:
+        env["LD_LIBRARY_PATH"] = env.pop("LD_LIBRARY_PATH_ORIG")
+    else:
+        env.pop("LD_LIBRARY_PATH", None)
+    env["PY2WIN_EXECUTABLE"] = launcher
+    return env
+
+
+def run(executable, env, wait=False):
+    args = [executable] + sys.argv[1:]
+    if os.name != 'nt' and not wait:
+        os.execve(executable, args, env)
+    import signal
+    import subprocess
+    # Ctrl+C reaches the application, which decides what to do with it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return subprocess.call(args, env=env)
+
+
+def main():
+    launcher = sys.executable
+    info = read_info(launcher)
+    app_dir = os.path.join(cache_root(), info["name"])
+    directory = os.path.join(app_dir, info["id"])
+    env = environment(launcher)
+    try:
+        if is_intact(directory, info["id"]):
+            os.utime(os.path.join(directory, MARKER))
+        else:
+            os.makedirs(app_dir, exist_ok=True)
+            extract(launcher, directory, info["id"])
+            evict(app_dir, directory)
+    except OSError:
+        import shutil
+        import zipfile
+        import tempfile
+        directory = tempfile.mkdtemp(prefix=f"{info['name']}-")
+        try:
+            with zipfile.ZipFile(launcher) as archive:
+                _extract_all(archive, directory)
+            return run(os.path.join(directory, info["entry"]), env, wait=True)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return run(os.path.join(directory, info["entry"]), env)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Py2Win Log - High-volume build log pipeline for the Py2Win GUI.
+
+PyInstaller can print tens of thousands of lines per build, especially with
+--log-level DEBUG. Inserting each line into a text widget stalls the UI and
+keeps every line in memory, so the GUI log is split into two parts:
+
+- LogBuffer keeps the most recent lines in bounded ring buffers, one per
+  level filter, and spills the complete log to a file on disk.
+- LogView renders only the lines that fit in the visible window, with its
+  own scrollbar over the buffer and a level filter (All/INFO/WARNING/ERROR).
+"""
+import os
+import re
+import shutil
+import tempfile
+from collections import deque
+from itertools import islice
+
+import customtkinter as ctk
+from tkinter import filedialog
+
+
+LEVELS = {"TRACE": 0, "DEBUG": 1, "INFO": 2, "DEPRECATION": 3, "WARNING": 3, "ERROR": 4, "CRITICAL": 4}
+FILTERS = {"All": 0, "INFO": 2, "WARNING": 3, "ERROR": 4}
+DEFAULT_CAPACITY = 20000
+
+# PyInstaller prefixes log lines with elapsed milliseconds: "1234 INFO: ..."
+PYINSTALLER_LEVEL = re.compile(r"^\s*\d*\s*(TRACE|DEBUG|INFO|DEPRECATION|WARNING|ERROR|CRITICAL):")
+PY2WIN_ERROR = re.compile(r"^(\s*--- (Build failed|ERROR|An unexpected error)|Error\b|Traceback \(most recent call last\))")
+PY2WIN_WARNING = re.compile(r"^\s*Warning\b")
+
+
+def classify(line, previous_level=LEVELS["INFO"]):
+    """Returns the severity of `line`; unprefixed lines continue the previous one."""
+    match = PYINSTALLER_LEVEL.match(line)
+    if match:
+        return LEVELS[match.group(1)]
+    if PY2WIN_ERROR.match(line):
+        return LEVELS["ERROR"]
+    if PY2WIN_WARNING.match(line):
+        return LEVELS["WARNING"]
+    return previous_level
+
+
+class LogBuffer:
+    def __init__(self, capacity=DEFAULT_CAPACITY, spill_dir=None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self._views = {threshold: deque(maxlen=capacity) for threshold in set(FILTERS.values())}
+        self._counts = dict.fromkeys(self._views, 0)
+        self._spill_file = None
+        self.spill_path = None
+        self._last_level = LEVELS["INFO"]
+
+    def _open_spill(self):
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        fd, self.spill_path = tempfile.mkstemp(prefix="py2win-build-", suffix=".log", dir=self.spill_dir)
+        self._spill_file = os.fdopen(fd, 'w', encoding='utf-8', errors='replace')
+
+    def append_many(self, lines):
+        if self._spill_file is None:
+            self._open_spill()
+        level = self._last_level
+        for line in lines:
+            level = classify(line, level)
+            for threshold, view in self._views.items():
+                if level >= threshold:
+                    view.append(line)
+                    self._counts[threshold] += 1
+        self._last_level = level
+        self._spill_file.write("\n".join(lines) + "\n")
+
+    def append(self, line):
+        self.append_many([line])
+
+    def flush(self):
+        if self._spill_file:
+            self._spill_file.flush()
+
+    def __len__(self):
+        return len(self._views[0])
+
+    def count(self, threshold=0):
+        """Number of lines currently held for a filter threshold."""
+        return len(self._views[threshold])
+
+    def total(self, threshold=0):
+        """Number of lines ever appended for a filter threshold, including evicted ones."""
+        return self._counts[threshold]
+
+    def lines(self, threshold, start, stop):
+        view = self._views[threshold]
+        return list(islice(view, max(0, start), max(0, min(stop, len(view)))))
+
+    def clear(self):
+        self.close()
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+        self.spill_path = None
+        for view in self._views.values():
+            view.clear()
+        self._counts = dict.fromkeys(self._views, 0)
+        self._last_level = LEVELS["INFO"]
+
+    def close(self):
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+
+
+class LogView(ctk.CTkFrame):
+    def __init__(self, master, buffer=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.buffer = buffer or LogBuffer()
+        self.threshold = 0
+        self.offset = 0
+        self.follow = True
+        self._rows = 20
+        self._refresh_pending = False
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.header_frame = ctk.CTkFrame(self, fg_color="transparent")
+        self.header_frame.grid(row=0, column=0, columnspan=2, padx=5, pady=(5, 0), sticky="ew")
+        self.header_frame.grid_columnconfigure(1, weight=1)
+        self.filter_button = ctk.CTkSegmentedButton(self.header_frame, values=list(FILTERS), command=self.set_filter)
+        self.filter_button.set("All")
+        self.filter_button.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.count_label = ctk.CTkLabel(self.header_frame, text="", anchor="e")
+        self.count_label.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.save_button = ctk.CTkButton(self.header_frame, text="Save Full Log", width=110, command=self.save_full_log)
+        self.save_button.grid(row=0, column=2, padx=5, pady=5, sticky="e")
+
+        self.font = ctk.CTkFont()
+        self.textbox = ctk.CTkTextbox(self, state="disabled", wrap="none", activate_scrollbars=False, font=self.font)
+        self.textbox.grid(row=1, column=0, padx=(5, 0), pady=5, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, padx=(0, 5), pady=5, sticky="ns")
+
+        self.textbox.bind("<Configure>", self.on_resize)
+        self.textbox.bind("<MouseWheel>", self.on_mousewheel)
+        self.textbox.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.textbox.bind("<Button-5>", lambda e: self.scroll_by(3))
+
+    def append_many(self, lines):
+        self.buffer.append_many(lines)
+        self.request_refresh()
+
+    def set_buffer(self, buffer):
+        if buffer is self.buffer:
+            return
+        self.buffer = buffer
+        self.offset = 0
+        self.follow = True
+        self.request_refresh()
+
+    def clear(self):
+        self.buffer.clear()
+        self.offset = 0
+        self.follow = True
+        self.request_refresh()
+
+    def set_filter(self, value):
+        self.threshold = FILTERS[value]
+        self.follow = True
+        self.request_refresh()
+
+    def request_refresh(self):
+        # Coalesce any number of appends and scroll events into one redraw.
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.after_idle(self.refresh)
+
+    def refresh(self):
+        self._refresh_pending = False
+        count = self.buffer.count(self.threshold)
+        max_offset = max(0, count - self._rows)
+        if self.follow:
+            self.offset = max_offset
+        self.offset = min(max(0, self.offset), max_offset)
+
+        lines = self.buffer.lines(self.threshold, self.offset, self.offset + self._rows)
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        self.textbox.insert("end", "\n".join(lines))
+        self.textbox.configure(state="disabled")
+
+        if count:
+            self.scrollbar.set(self.offset / count, min(1.0, (self.offset + self._rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        total = self.buffer.total(self.threshold)
+        dropped = f" ({total - count:,} older in full log)" if total > count else ""
+        self.count_label.configure(text=f"{count:,} lines{dropped}")
+
+    def scroll_to(self, offset):
+        max_offset = max(0, self.buffer.count(self.threshold) - self._rows)
+        self.offset = min(max(0, int(offset)), max_offset)
+        self.follow = self.offset >= max_offset
+        self.request_refresh()
+
+    def scroll_by(self, lines):
+        self.scroll_to(self.offset + lines)
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.buffer.count(self.threshold))
+        elif args[0] == "scroll":
+            step = self._rows if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_resize(self, event):
+        rows = max(1, event.height // max(1, self.font.metrics("linespace")))
+        if rows != self._rows:
+            self._rows = rows
+            self.request_refresh()
+
+    def save_full_log(self):
+        if not self.buffer.spill_path:
+            return
+        self.buffer.flush()
+        path = filedialog.asksaveasfilename(title="Save Build Log", defaultextension=".log", filetypes=(("Log files", "*.log"), ("All files", "*.*")))
+        if path:
+            shutil.copyfile(self.buffer.spill_path, path)
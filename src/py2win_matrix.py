@@ -0,0 +1,130 @@
+"""
+Py2Win Matrix - Several build variants from a single PyInstaller run.
+
+A profile can declare a build matrix to produce, for example, a console and
+a windowed executable, or a one-file and a one-dir build, of the same script:
+
+    "matrix": {"is_windowed": [0, 1], "is_onefile": [1, 0]}
+
+expands to every combination, while a list of variants spells them out:
+
+    "matrix": [{"is_onefile": 1}, {"is_onefile": 0, "is_windowed": 1, "name": "tool-gui"}]
+
+Variants may only differ in how the executable is assembled (the options in
+MATRIX_OPTIONS), not in what gets analysed. That is what lets Py2Win write
+one .spec file that runs the dependency Analysis and the PYZ once and emits
+an EXE (plus COLLECT for one-dir variants) per variant, so an N-variant
+matrix costs one analysis instead of N. Variants without an explicit name
+are named after the profile and the options that vary, e.g.
+"tool_console_onefile".
+"""
+import os
+import itertools
+
+import py2win_engine as engine
+import py2win_optimize
+
+
+MATRIX_OPTIONS = ("name", "is_windowed", "is_onefile", "icon_path")
+SPEC_HEADER = "# -*- mode: python ; coding: utf-8 -*-\n# Generated by Py2Win for the build matrix of %r.\n"
+
+
+def _variant_suffix(key, value):
+    if key == "is_windowed":
+        return "windowed" if value else "console"
+    if key == "is_onefile":
+        return "onefile" if value else "onedir"
+    if key == "icon_path":
+        return os.path.splitext(os.path.basename(value))[0] if value else "noicon"
+    return str(value)
+
+
+def matrix_overrides(matrix):
+    """Turns a matrix declaration into a list of option overrides."""
+    if isinstance(matrix, dict):
+        keys = list(matrix)
+        values = [v if isinstance(v, list) else [v] for v in matrix.values()]
+        return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+    return [dict(variant) for variant in matrix]
+
+
+def expand_matrix(profile):
+    """Returns one complete profile per variant of the profile's matrix."""
+    overrides = matrix_overrides(profile.get("matrix") or [])
+    if not overrides:
+        raise ValueError("The build matrix is empty.")
+    base_name = engine.profile_name(profile)
+    varying = [key for key in MATRIX_OPTIONS if key != "name" and len({repr(o.get(key, profile.get(key))) for o in overrides}) > 1]
+
+    variants = []
+    for override in overrides:
+        unsupported = sorted(set(override) - set(MATRIX_OPTIONS))
+        if unsupported:
+            raise ValueError(f"Matrix variants can only set {', '.join(MATRIX_OPTIONS)}, not {', '.join(unsupported)}.")
+        variant = {key: value for key, value in profile.items() if key != "matrix"}
+        variant.update(override)
+        if "name" not in override:
+            suffixes = [_variant_suffix(key, variant.get(key)) for key in varying]
+            variant["name"] = "_".join([base_name] + suffixes)
+        variants.append(variant)
+
+    names = [engine.profile_name(v) for v in variants]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Build matrix produces duplicate names: {', '.join(duplicates)}")
+    return variants
+
+
+def generate_spec(profile, variants, datas=(), runtime_hooks=()):
+    """Returns the source of a .spec file building every variant from one Analysis."""
+    lines = [SPEC_HEADER % engine.profile_name(profile)]
+    lines.append("a = Analysis(")
+    lines.append(f"    [{os.path.abspath(profile['script_path'])!r}],")
+    lines.append(f"    datas={[(os.path.abspath(source), dest) for source, dest in datas]!r},")
+    lines.append(f"    hiddenimports={list(profile.get('hidden_imports', []))!r},")
+    lines.append(f"    runtime_hooks={[os.path.abspath(hook) for hook in runtime_hooks]!r},")
+    lines.append(f"    excludes={list(profile.get('excludes', []))!r},")
+    if profile.get("optimize"):
+        lines.append(f"    optimize={int(profile['optimize'])!r},")
+    lines.append(")")
+    lines.append("pyz = PYZ(a.pure)")
+
+    for index, variant in enumerate(variants):
+        name = engine.profile_name(variant)
+        icon_path = variant.get("icon_path")
+        icon = os.path.abspath(icon_path) if icon_path and os.path.exists(icon_path) else None
+        options = f"name={name!r}, console={not variant.get('is_windowed')!r}, icon={icon!r}"
+        lines.append("")
+        lines.append(f"# {name}")
+        if variant.get("is_onefile"):
+            # One-dir variants are stripped and compressed after the build instead.
+            upx = f"strip={bool(variant.get('strip'))!r}, upx={bool(variant.get('upx'))!r}, upx_exclude={py2win_optimize.upx_excludes(variant) if variant.get('upx') else []!r}"
+            lines.append(f"exe_{index} = EXE(pyz, a.scripts, a.binaries, a.datas, [], {options}, {upx}, runtime_tmpdir=None)")
+        else:
+            lines.append(f"exe_{index} = EXE(pyz, a.scripts, [], exclude_binaries=True, {options}, upx=False)")
+            lines.append(f"coll_{index} = COLLECT(exe_{index}, a.binaries, a.datas, upx=False, name={name!r})")
+    return "\n".join(lines) + "\n"
+
+
+def write_spec(profile, variants, specpath, datas=(), runtime_hooks=()):
+    os.makedirs(specpath, exist_ok=True)
+    spec_file = os.path.join(specpath, f"{engine.profile_name(profile)}.matrix.spec")
+    source = generate_spec(profile, variants, datas, runtime_hooks)
+    try:
+        with open(spec_file, 'r') as f:
+            unchanged = f.read() == source
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(spec_file, 'w') as f:
+            f.write(source)
+    return spec_file
+
+
+def spec_command(spec_file, distpath=None, workpath=None, upx_dir=None):
+    command = ["pyinstaller", "--noconfirm"]
+    if distpath: command.extend(["--distpath", distpath])
+    if workpath: command.extend(["--workpath", workpath])
+    if upx_dir: command.append(f"--upx-dir={upx_dir}")
+    command.append(spec_file)
+    return command
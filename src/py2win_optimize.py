@@ -0,0 +1,193 @@
+"""
+Py2Win Optimize - Post-build size optimisation of one-dir builds.
+
+Once PyInstaller has finished, the binaries of a one-dir build (including
+the one-dir build behind cached extraction) are shrunk in parallel, one
+task per file across all cores:
+
+- "strip": removes symbol tables with `strip`. Skipped on Windows, where
+  PyInstaller advises against it, and on macOS, where it would break the
+  code signatures;
+- "upx": compresses shared libraries and extension modules with UPX when
+  `upx` is on PATH or in "upx_dir". Like PyInstaller, Py2Win only
+  compresses Windows binaries unless PYINSTALLER_FORCE_UPX is set, because
+  compressed shared libraries crash on many Linux systems. Files that match
+  "upx_exclude" or DEFAULT_UPX_EXCLUDE are left alone, and so are DLLs
+  built with Control Flow Guard;
+- "optimize": the bytecode optimisation level (1 or 2). It is passed to
+  PyInstaller as --optimize, so it also applies to one-file builds.
+
+The main executable is never modified: its archive is appended to it.
+One-file builds use PyInstaller's own --strip and UPX options, which
+process one file at a time.
+
+Each file's size before and after goes into the build log and report.
+`bench --compare-optimize` measures how the options affect startup time.
+"""
+import os
+import sys
+import time
+import shutil
+import struct
+import fnmatch
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import py2win_engine as engine
+
+
+# Runtime DLLs that Windows verifies by signature, and Qt plugins, whose
+# metadata the Qt plugin loader cannot find once compressed.
+DEFAULT_UPX_EXCLUDE = ("vcruntime140*.dll", "msvcp140*.dll", "ucrtbase.dll", "api-ms-win-*.dll", "*/plugins/*")
+UPX_ARGS = ("--compress-icons=0", "--lzma", "-q")
+IMAGE_DLLCHARACTERISTICS_GUARD_CF = 0x4000
+
+
+@dataclass
+class OptimizeReport:
+    files: dict = field(default_factory=dict)
+    excluded: list = field(default_factory=list)
+    notes: list = field(default_factory=list)
+    wall_time: float = 0.0
+
+    @property
+    def before(self):
+        return sum(before for before, _, _ in self.files.values())
+
+    @property
+    def after(self):
+        return sum(after for _, after, _ in self.files.values())
+
+    def summary(self):
+        return {
+            "before": self.before,
+            "after": self.after,
+            "wall_time": round(self.wall_time, 3),
+            "files": {name: list(entry) for name, entry in sorted(self.files.items())},
+            "excluded": self.excluded,
+            "notes": self.notes,
+        }
+
+    def format(self, limit=15):
+        rows = [("File", "Before", "After", "Saved", "Applied")]
+        ranked = sorted(self.files.items(), key=lambda item: item[1][0] - item[1][1], reverse=True)
+        for name, (before, after, applied) in ranked[:limit]:
+            rows.append((name, engine.format_size(before), engine.format_size(after), f"{(before - after) / before:.0%}" if before else "-", "+".join(applied) or "-"))
+        lines = [engine.format_table(rows)]
+        if len(ranked) > limit:
+            lines.append(f"... and {len(ranked) - limit} more file(s)")
+        saved = self.before - self.after
+        lines.append(f"Optimised {len(self.files)} file(s) in {self.wall_time:.1f}s: {engine.format_size(self.before)} -> {engine.format_size(self.after)} (saved {engine.format_size(saved)})")
+        return "\n".join(lines)
+
+
+def requested(profile):
+    """True when `profile` asks for the post-build stage."""
+    return bool(profile.get("upx") or profile.get("strip"))
+
+
+def upx_executable(profile):
+    if profile.get("upx_dir"):
+        return shutil.which("upx", path=profile["upx_dir"])
+    return shutil.which("upx")
+
+
+def upx_supported():
+    return os.name == 'nt' or os.environ.get("PYINSTALLER_FORCE_UPX", "0") != "0"
+
+
+def strip_supported():
+    return os.name != 'nt' and sys.platform != "darwin"
+
+
+def upx_excludes(profile):
+    return list(DEFAULT_UPX_EXCLUDE) + list(profile.get("upx_exclude", []))
+
+
+def is_binary(name):
+    name = name.lower()
+    if os.name == 'nt':
+        return name.endswith((".dll", ".pyd"))
+    return name.endswith(".so") or ".so." in name
+
+
+def has_control_flow_guard(path):
+    """True for PE files built with Control Flow Guard, which UPX breaks."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(4096)
+        offset = struct.unpack_from("<I", header, 0x3C)[0]
+        if header[:2] != b"MZ" or header[offset:offset + 4] != b"PE\0\0":
+            return False
+        # DllCharacteristics sits at the same offset in PE32 and PE32+ optional headers.
+        characteristics = struct.unpack_from("<H", header, offset + 24 + 70)[0]
+    except (OSError, struct.error):
+        return False
+    return bool(characteristics & IMAGE_DLLCHARACTERISTICS_GUARD_CF)
+
+
+def _is_excluded(relpath, patterns):
+    name = os.path.basename(relpath).lower()
+    return any(fnmatch.fnmatch(name, p.lower()) or fnmatch.fnmatch(relpath.lower(), p.lower()) for p in patterns)
+
+
+def _optimize_file(path, strip, upx):
+    """Strips and/or compresses one file; returns (size before, size after, steps applied)."""
+    before = os.path.getsize(path)
+    applied = []
+    # A stripped file cannot be stripped once it is compressed, so strip first.
+    for step, command in (("strip", strip and [strip, path]), ("upx", upx and [upx, *UPX_ARGS, path])):
+        if command and subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, **engine.popen_kwargs()).returncode == 0:
+            applied.append(step)
+    return before, os.path.getsize(path), applied
+
+
+def optimize(onedir, profile, log=print, workers=None):
+    """Strips and compresses the binaries in the one-dir build `onedir` as
+    `profile` asks; returns an OptimizeReport."""
+    start = time.perf_counter()
+    report = OptimizeReport()
+    strip = upx = None
+    if profile.get("strip"):
+        strip = shutil.which("strip") if strip_supported() else None
+        if not strip:
+            report.notes.append("strip skipped: " + ("not supported on this platform" if not strip_supported() else "strip not found"))
+    if profile.get("upx"):
+        upx = upx_executable(profile) if upx_supported() else None
+        if not upx:
+            report.notes.append("UPX skipped: " + ("only Windows binaries are compressed (set PYINSTALLER_FORCE_UPX=1 to override)" if not upx_supported() else "upx not found"))
+
+    executable = os.path.basename(onedir.rstrip("/\\")) + (".exe" if os.name == 'nt' else "")
+    patterns = upx_excludes(profile)
+    tasks = {}
+    for root, _, files in os.walk(onedir):
+        for name in files:
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, onedir).replace(os.sep, "/")
+            if relpath == executable or os.path.islink(path) or not is_binary(name):
+                continue
+            # Libraries with an integrity checksum next to them must stay unchanged.
+            if os.path.exists(os.path.join(root, f".{name}.hmac")) or os.path.exists(os.path.splitext(path)[0] + ".chk"):
+                continue
+            file_upx = upx
+            if upx and (_is_excluded(relpath, patterns) or has_control_flow_guard(path)):
+                report.excluded.append(relpath)
+                file_upx = None
+            if strip or file_upx:
+                tasks[relpath] = (path, strip, file_upx)
+
+    for note in report.notes:
+        log(note)
+    if tasks:
+        log(f"Optimising {len(tasks)} binaries ({', '.join(s for s, on in (('strip', strip), ('UPX', upx)) if on)}) on {workers or os.cpu_count()} thread(s)...")
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {relpath: pool.submit(_optimize_file, *args) for relpath, args in tasks.items()}
+            for relpath, future in futures.items():
+                report.files[relpath] = future.result()
+    report.wall_time = time.perf_counter() - start
+    if report.excluded:
+        log(f"Not compressed with UPX: {', '.join(report.excluded)}")
+    if report.files:
+        log(report.format())
+    return report
@@ -0,0 +1,193 @@
+"""
+Py2Win Report - Build phase timing and machine-readable build reports.
+
+PyInstaller's INFO output marks the start of each build step. PhaseTracker
+watches those lines as they stream in and attributes wall time to phases:
+
+    startup       interpreter start-up and PyInstaller imports
+    module_graph  building the base module graph (base_library.zip)
+    analysis      dependency analysis of the script, hooks and binaries
+    pyz           building the PYZ archive of pure-Python modules
+    pkg           building the PKG (CArchive)
+    bootloader    selecting and copying the bootloader
+    exe_collect   assembling the EXE and, for one-dir builds, COLLECT
+
+After every build a JSON report is written next to the artifact and a copy
+is kept in the profile's history under <PY2WIN_HOME>/reports/<profile-id>/.
+"""
+import os
+import re
+import json
+import time
+import statistics
+
+import py2win_engine as engine
+
+
+PHASES = ("startup", "module_graph", "analysis", "pyz", "pkg", "bootloader", "exe_collect")
+PHASE_LABELS = {
+    "startup": "Startup",
+    "module_graph": "Module graph",
+    "analysis": "Analysis",
+    "pyz": "PYZ",
+    "pkg": "PKG",
+    "bootloader": "Bootloader",
+    "exe_collect": "EXE/COLLECT",
+}
+PHASE_MARKERS = (
+    (re.compile(r"INFO: (checking|Building|Running) Analysis\b"), "analysis"),
+    (re.compile(r"INFO: Initializing module dependency graph"), "module_graph"),
+    (re.compile(r"INFO: Analyzing (?!modules for base_library|run-time hooks)"), "analysis"),
+    (re.compile(r"INFO: (checking|Building) PYZ\b"), "pyz"),
+    (re.compile(r"INFO: (checking|Building) PKG\b"), "pkg"),
+    (re.compile(r"INFO: Bootloader "), "bootloader"),
+    (re.compile(r"INFO: (checking|Building) (EXE|COLLECT)\b|INFO: (Appending PKG|Fixing EXE)"), "exe_collect"),
+)
+REGRESSION_FACTOR = 1.5
+REPORT_SUFFIX = ".build-report.json"
+
+
+class PhaseTracker:
+    def __init__(self, start=None):
+        self.phase = "startup"
+        self.phase_start = time.perf_counter() if start is None else start
+        self.durations = {}
+
+    def feed(self, line, now=None):
+        """Updates the current phase from one line of output; returns the new
+        phase name when it changed, otherwise None."""
+        if "INFO: " not in line:
+            return None
+        for pattern, phase in PHASE_MARKERS:
+            if pattern.search(line):
+                if phase == self.phase:
+                    return None
+                self._close(now)
+                self.phase = phase
+                return phase
+        return None
+
+    def _close(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self.durations[self.phase] = self.durations.get(self.phase, 0.0) + now - self.phase_start
+        self.phase_start = now
+
+    def finish(self, now=None):
+        self._close(now)
+        return {phase: round(self.durations[phase], 3) for phase in PHASES if phase in self.durations}
+
+
+def report_path(artifact):
+    return artifact.rstrip("/\\") + REPORT_SUFFIX
+
+
+def history_dir(profile):
+    import py2win_workdirs
+    return engine.data_dir("reports", py2win_workdirs.profile_id(profile))
+
+
+def make_report(profile, result, command=None):
+    return {
+        "name": result.name,
+        "script_path": os.path.abspath(profile.get("script_path", "")),
+        "created": time.time(),
+        "returncode": result.returncode,
+        "successful": result.successful,
+        "error": result.error,
+        "cache": result.extra.get("cache"),
+        "matrix": result.extra.get("matrix"),
+        "build_id": result.extra.get("build_id"),
+        "optimize": result.extra.get("optimize"),
+        "wall_time": round(result.wall_time, 3),
+        "phases": result.phases,
+        "peak_rss": result.peak_rss,
+        "artifact_path": result.artifact_path,
+        "artifact_size": result.artifact_size,
+        "options": {key: profile.get(key) for key in ("is_windowed", "is_onefile", "cached_extraction", "upx", "strip", "optimize")},
+        "command": command,
+    }
+
+
+def write_report(profile, report, artifact=None):
+    """Writes `report` next to `artifact` (when given) and into the profile's
+    history; returns the path of the report next to the artifact, if any."""
+    data = json.dumps(report, indent=4)
+    path = None
+    if artifact:
+        path = report_path(artifact)
+        with open(path, 'w') as f:
+            f.write(data)
+    directory = history_dir(profile)
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(report["created"]))
+    with open(os.path.join(directory, f"{stamp}-{int(report['created'] * 1000) % 1000:03d}.json"), 'w') as f:
+        f.write(data)
+    return path
+
+
+def history_profiles(profile):
+    """Returns the profiles that keep a history for `profile`: the variants
+    of its build matrix, or the profile itself."""
+    if profile.get("matrix"):
+        import py2win_matrix
+        return py2win_matrix.expand_matrix(profile)
+    return [profile]
+
+
+def load_history(profile, limit=None):
+    """Returns the profile's past reports, oldest first."""
+    directory = history_dir(profile)
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    if limit:
+        names = names[-limit:]
+    reports = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), 'r') as f:
+                reports.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return reports
+
+
+def find_regressions(reports):
+    """Returns {phase: (latest, baseline)} for phases of the latest full build
+    that took noticeably longer than the median of the earlier full builds."""
+    builds = [r for r in reports if r.get("successful") and r.get("phases")]
+    if len(builds) < 2:
+        return {}
+    latest, earlier = builds[-1], builds[:-1]
+    regressions = {}
+    for phase, seconds in latest["phases"].items():
+        previous = [r["phases"][phase] for r in earlier if phase in r["phases"]]
+        if not previous:
+            continue
+        baseline = statistics.median(previous)
+        if baseline > 0 and seconds > baseline * REGRESSION_FACTOR and seconds - baseline > 0.5:
+            regressions[phase] = (seconds, baseline)
+    return regressions
+
+
+def format_history(reports):
+    if not reports:
+        return "No build reports yet."
+    columns = ["When", "Result", "Total"] + [PHASE_LABELS[p] for p in PHASES] + ["Peak RSS", "Size", "Build"]
+    rows = [columns]
+    for r in reports:
+        result = "cache" if r.get("cache") == "hit" else ("ok" if r.get("successful") else "FAILED")
+        row = [time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created"])), result, f"{r['wall_time']:.1f}s"]
+        phases = r.get("phases") or {}
+        row += [f"{phases[p]:.1f}s" if p in phases else "-" for p in PHASES]
+        row.append(engine.format_size(r["peak_rss"]) if r.get("peak_rss") else "-")
+        row.append(engine.format_size(r["artifact_size"]) if r.get("artifact_size") else "-")
+        row.append((r.get("build_id") or "-")[:12])
+        rows.append(row)
+    lines = [engine.format_table(rows)]
+    regressions = find_regressions(reports)
+    if regressions:
+        lines.append("")
+        for phase, (seconds, baseline) in regressions.items():
+            lines.append(f"Regression: {PHASE_LABELS[phase]} took {seconds:.1f}s, median of earlier builds is {baseline:.1f}s ({seconds / baseline:.1f}x)")
+    return "\n".join(lines)
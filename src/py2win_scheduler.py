@@ -0,0 +1,240 @@
+"""
+Py2Win Scheduler - Build queue with concurrency limits, cancellation and timeouts.
+
+Builds are submitted as jobs and run in priority order (higher first, then
+first come, first served) with at most `max_concurrency` builds at a time.
+Each job has its own log queue, so several builds can stream output side by
+side. A running job can be cancelled or time out; either way PyInstaller's
+whole process tree is killed and the job's work directory is removed, since
+a half-written work directory cannot be trusted by the next build.
+
+Jobs consume the event stream of py2win_events.build. All running jobs share
+one asyncio event loop in a background thread instead of a thread each, and
+each job keeps its current phase and its artifacts alongside the log.
+"""
+import os
+import time
+import heapq
+import queue
+import asyncio
+import itertools
+import threading
+
+import py2win_engine as engine
+import py2win_events
+
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed out"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class BuildJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, profile, priority=0, timeout=None, build_options=None):
+        self.id = next(self._ids)
+        self.profile = profile
+        self.name = engine.profile_name(profile)
+        self.priority = priority
+        self.timeout = timeout
+        self.build_options = build_options or {}
+        self.state = PENDING
+        self.log_queue = queue.Queue()
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.work_id = None
+        self.phase = None
+        self.artifacts = []
+        self.done = threading.Event()
+        self._loop = None
+        self._task = None
+        self._stop_reason = None
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        if not self.started:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def _stop(self, reason):
+        with self._lock:
+            if self.state in FINISHED_STATES or self._stop_reason:
+                return False
+            self._stop_reason = reason
+            task = self._task
+        if task:
+            # Closing the event stream kills PyInstaller's process tree.
+            self._loop.call_soon_threadsafe(task.cancel)
+        return True
+
+
+class BuildScheduler:
+    def __init__(self, max_concurrency=None, on_change=None, build=py2win_events.build):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.on_change = on_change
+        self.jobs = []
+        self._build = build
+        self._loop = None
+        self._pending = []
+        self._running = 0
+        self._busy_profiles = set()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, profile, priority=0, timeout=None, **build_options):
+        job = BuildJob(profile, priority, timeout, build_options)
+        with self._lock:
+            self.jobs.append(job)
+            heapq.heappush(self._pending, (-priority, next(self._sequence), job))
+        self._changed()
+        self._dispatch()
+        return job
+
+    def set_max_concurrency(self, value):
+        self.max_concurrency = max(1, int(value))
+        self._dispatch()
+
+    def cancel(self, job):
+        """Cancels a pending or running job; returns False if it already finished."""
+        with self._lock:
+            if job.state == PENDING:
+                # Left in the heap and skipped when it comes up.
+                job.state = CANCELLED
+                job.finished = time.time()
+                job.log_queue.put("--- Build cancelled before it started ---")
+                job.done.set()
+                cancelled = True
+            else:
+                cancelled = None
+        if cancelled is None:
+            cancelled = job._stop(CANCELLED)
+            if cancelled:
+                job.log_queue.put("\n--- Cancelling: stopping PyInstaller ---")
+        self._changed()
+        return cancelled
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Cancels every job and waits up to `timeout` seconds for the running
+        ones to kill PyInstaller; returns False if some are still running.
+
+        Cancelling only asks the event loop thread to stop a job, and that
+        thread dies with the interpreter, so call this before exiting."""
+        jobs = list(self.jobs)
+        for job in jobs:
+            self.cancel(job)
+        deadline = time.monotonic() + timeout
+        return all(job.done.wait(max(0.0, deadline - time.monotonic())) for job in jobs)
+
+    def clear_finished(self):
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job.state not in FINISHED_STATES]
+        self._changed()
+
+    def counts(self):
+        with self._lock:
+            pending = sum(1 for job in self.jobs if job.state == PENDING)
+            return self._running, pending
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="py2win-scheduler", daemon=True).start()
+            return self._loop
+
+    def _dispatch(self):
+        import py2win_workdirs
+        to_start = []
+        deferred = []
+        with self._lock:
+            while self._pending and self._running < self.max_concurrency:
+                entry = heapq.heappop(self._pending)
+                job = entry[2]
+                if job.state != PENDING:
+                    continue
+                # Two builds of one profile would share a work directory.
+                job.work_id = py2win_workdirs.profile_id(job.profile)
+                if job.work_id in self._busy_profiles:
+                    deferred.append(entry)
+                    continue
+                self._busy_profiles.add(job.work_id)
+                job.state = RUNNING
+                job.started = time.time()
+                self._running += 1
+                to_start.append(job)
+            for entry in deferred:
+                heapq.heappush(self._pending, entry)
+        if to_start:
+            loop = self._event_loop()
+            for job in to_start:
+                asyncio.run_coroutine_threadsafe(self._run(job), loop)
+            self._changed()
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        with job._lock:
+            job._loop, job._task = loop, asyncio.current_task()
+            stopped = job._stop_reason is not None
+        timer = loop.call_later(job.timeout, self._on_timeout, job) if job.timeout else None
+        try:
+            if not stopped:
+                async for event in self._build(job.profile, **job.build_options):
+                    if isinstance(event, py2win_events.LogLine):
+                        job.log_queue.put(event.line)
+                    elif isinstance(event, py2win_events.PhaseChanged):
+                        job.phase = event.phase
+                        self._changed()
+                    elif isinstance(event, py2win_events.ArtifactProduced):
+                        job.artifacts.append(event.path)
+                    elif isinstance(event, py2win_events.Finished):
+                        job.result = event.result
+        except asyncio.CancelledError:
+            if not job._stop_reason:
+                raise
+        except Exception as e:
+            job.log_queue.put(f"\n--- An unexpected error occurred: {e} ---")
+        finally:
+            if timer:
+                timer.cancel()
+
+        if job._stop_reason:
+            await asyncio.to_thread(self._remove_work_dir, job)
+            job.log_queue.put(f"--- Build {job._stop_reason} ---")
+            state = job._stop_reason
+        else:
+            state = SUCCEEDED if job.result and job.result.successful else FAILED
+        with self._lock:
+            job.state = state
+            job.finished = time.time()
+            self._running -= 1
+            self._busy_profiles.discard(job.work_id)
+        job.done.set()
+        self._changed()
+        self._dispatch()
+
+    def _on_timeout(self, job):
+        if job._stop(TIMED_OUT):
+            job.log_queue.put(f"\n--- Build timed out after {job.timeout:.0f}s: stopping PyInstaller ---")
+            self._changed()
+
+    def _remove_work_dir(self, job):
+        if job.build_options.get("workpath"):
+            return
+        import py2win_workdirs
+        try:
+            py2win_workdirs.WorkDirManager().remove(job.profile)
+        except OSError as e:
+            job.log_queue.put(f"Warning: could not remove work directory: {e}")
@@ -0,0 +1,436 @@
+"""
+Py2Win Store - Content-addressed history of build outputs, diffs and delta packages.
+
+Every successful build is added to a local artifact store under
+<PY2WIN_HOME>/store, so replacing dist/ no longer loses the previous build:
+
+- each file is stored once under objects/, named after its SHA-256, so the
+  unchanged files of consecutive one-dir builds take no extra space;
+- a build is a small manifest (path -> hash, size, mode) under builds/,
+  whose id is a hash of that manifest, so identical outputs share one id;
+- each profile's builds are listed, with the time they were stored, in its
+  own file under history/, so profiles with identical outputs keep their
+  own histories;
+- the most recent KEEP_BUILDS builds of each profile are kept, and objects
+  no build refers to any more are removed.
+
+Two builds, or a build and a folder on disk, can be compared file by file,
+and a delta package holding only the added and changed files can be written
+and applied to a copy of the older build. Since a one-file executable is a
+single file, its delta is the whole file; delta updates pay off for one-dir
+builds.
+
+Builds are referred to by id (any unique prefix), by profile name for the
+latest build of that profile, or by name~N for the Nth build before it.
+
+Delta packages are meant to be received from elsewhere, so apply_delta
+refuses any path in them that would end up outside the target.
+"""
+import os
+import json
+import time
+import stat
+import shutil
+import hashlib
+import zipfile
+import threading
+from dataclasses import dataclass, field
+
+import py2win_engine as engine
+
+
+KEEP_BUILDS = 10
+BUILD_ID_LENGTH = 16
+DELTA_MANIFEST = "py2win-delta.json"
+# Objects younger than this are never collected: a parallel build may have
+# stored them without having written its manifest yet.
+GC_GRACE_SECONDS = 3600
+
+
+def store_dir():
+    return engine.data_dir("store")
+
+
+def _file_hash(path):
+    import py2win_cache
+    return py2win_cache.hash_file(path).hexdigest()
+
+
+def scan(artifact):
+    """Returns the manifest of a file or folder on disk, without storing it."""
+    artifact = os.path.abspath(artifact)
+    if os.path.isfile(artifact):
+        kind, entries = "file", [(artifact, os.path.basename(artifact))]
+    elif os.path.isdir(artifact):
+        kind, entries = "dir", []
+        for root, dirs, files in os.walk(artifact):
+            dirs.sort()
+            for name in sorted(files + [d for d in dirs if os.path.islink(os.path.join(root, d))]):
+                path = os.path.join(root, name)
+                entries.append((path, os.path.relpath(path, artifact).replace(os.sep, "/")))
+    else:
+        raise FileNotFoundError(f"No such file or folder: {artifact}")
+
+    files, links = {}, {}
+    for path, rel in entries:
+        if os.path.islink(path):
+            links[rel] = os.readlink(path)
+            continue
+        st = os.stat(path)
+        files[rel] = {"sha256": _file_hash(path), "size": st.st_size, "mode": stat.S_IMODE(st.st_mode)}
+    manifest = {"artifact": os.path.basename(artifact), "kind": kind, "files": files, "links": links}
+    content = json.dumps(manifest, sort_keys=True).encode()
+    manifest["id"] = hashlib.sha256(content).hexdigest()[:BUILD_ID_LENGTH]
+    manifest["size"] = sum(f["size"] for f in files.values())
+    manifest["path"] = artifact
+    return manifest
+
+
+@dataclass
+class BuildDiff:
+    old: dict
+    new: dict
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    changed: list = field(default_factory=list)
+
+    @property
+    def delta_bytes(self):
+        return self.new["size"] - self.old["size"]
+
+    @property
+    def transfer_bytes(self):
+        """Bytes a delta package has to carry (before compression)."""
+        return sum(self.new["files"][rel]["size"] for rel in self.added + self.changed if rel in self.new["files"])
+
+    @property
+    def unchanged(self):
+        return not (self.added or self.removed or self.changed)
+
+
+def diff(old, new):
+    """Compares two manifests file by file."""
+    result = BuildDiff(old, new)
+    old_entries = {rel: ("file", meta["sha256"], meta["mode"]) for rel, meta in old["files"].items()}
+    old_entries.update((rel, ("link", target)) for rel, target in old["links"].items())
+    new_entries = {rel: ("file", meta["sha256"], meta["mode"]) for rel, meta in new["files"].items()}
+    new_entries.update((rel, ("link", target)) for rel, target in new["links"].items())
+    if old["kind"] == new["kind"] == "file":
+        # A renamed executable is still the same artifact.
+        old_entries = dict(zip(new_entries, old_entries.values()))
+    for rel in sorted(old_entries.keys() | new_entries.keys()):
+        if rel not in new_entries:
+            result.removed.append(rel)
+        elif rel not in old_entries:
+            result.added.append(rel)
+        elif old_entries[rel] != new_entries[rel]:
+            result.changed.append(rel)
+    return result
+
+
+def format_diff(result, limit=None):
+    rows = [("", "File", "Old size", "New size")]
+    old_files, new_files = result.old["files"], result.new["files"]
+    old_names = dict(zip(new_files, old_files)) if result.old["kind"] == result.new["kind"] == "file" else {}
+
+    def size(files, rel):
+        return engine.format_size(files[rel]["size"]) if rel in files else "link"
+
+    entries = [("A", rel) for rel in result.added] + [("D", rel) for rel in result.removed] + [("M", rel) for rel in result.changed]
+    entries.sort(key=lambda entry: entry[1])
+    for status, rel in entries[:limit]:
+        old_size = "-" if status == "A" else size(old_files, old_names.get(rel, rel))
+        new_size = "-" if status == "D" else size(new_files, rel)
+        rows.append((status, rel, old_size, new_size))
+    lines = [engine.format_table(rows)] if len(rows) > 1 else ["No differences."]
+    if limit is not None and len(entries) > limit:
+        lines.append(f"... and {len(entries) - limit} more")
+    sign = "+" if result.delta_bytes >= 0 else "-"
+    lines.append(f"{result.old['id']} -> {result.new['id']}: {len(result.added)} added, {len(result.removed)} removed, "
+                 f"{len(result.changed)} changed; size {engine.format_size(result.old['size'])} -> {engine.format_size(result.new['size'])} "
+                 f"({sign}{engine.format_size(abs(result.delta_bytes))}); a delta package carries {engine.format_size(result.transfer_bytes)}")
+    return "\n".join(lines)
+
+
+def _target_path(target, kind, rel):
+    return target if kind == "file" else os.path.join(target, *rel.split("/"))
+
+
+def _delta_path(target, kind, rel):
+    """Like _target_path for a path from a delta package, which must stay
+    inside `target`; raises ValueError otherwise."""
+    parts = rel.replace("\\", "/").split("/")
+    if not rel or rel.startswith(("/", "\\")) or os.path.splitdrive(rel)[0] or ":" in parts[0] or ".." in parts:
+        raise ValueError(f"Unsafe path in delta package: {rel!r}")
+    path = _target_path(target, kind, rel)
+    if kind == "dir":
+        # Links in the folders on the way count; the file itself is replaced
+        # or removed, never written through.
+        root = os.path.realpath(target)
+        real = os.path.join(os.path.realpath(os.path.dirname(path)), os.path.basename(path))
+        if os.path.commonpath([root, real]) != root:
+            raise ValueError(f"Unsafe path in delta package: {rel!r} leads outside {target}")
+    return path
+
+
+def _replace_file(source, destination, mode=None):
+    # Written next to the destination and renamed over it, so a hardlinked
+    # or running file is replaced rather than written through.
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    temp_path = f"{destination}.{os.getpid()}-{threading.get_ident()}.py2win-tmp"
+    if callable(source):
+        with open(temp_path, 'wb') as f:
+            source(f)
+    else:
+        shutil.copyfile(source, temp_path)
+    if mode is not None:
+        os.chmod(temp_path, mode)
+    if os.path.isdir(destination) and not os.path.islink(destination):
+        shutil.rmtree(destination)
+    os.replace(temp_path, destination)
+
+
+def _replace_link(target, destination):
+    if os.path.lexists(destination):
+        os.remove(destination)
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    os.symlink(target, destination)
+
+
+class ArtifactStore:
+    def __init__(self, root=None, keep=KEEP_BUILDS):
+        self.root = root or store_dir()
+        self.keep = keep
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _build_path(self, build_id):
+        return os.path.join(self.root, "builds", build_id + ".json")
+
+    def _history_path(self, name):
+        return os.path.join(self.root, "history", hashlib.sha256(name.encode()).hexdigest()[:BUILD_ID_LENGTH] + ".json")
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, data):
+        data = json.dumps(data, indent=4).encode()
+        _replace_file(lambda f: f.write(data), path)
+
+    def _histories(self, migrated=None):
+        """Returns {profile name: [{"id", "created"}, ...] oldest first}. The
+        names that gained entries from old manifests are added to `migrated`."""
+        histories = {}
+        directory = os.path.join(self.root, "history")
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                history = self._read_json(entry.path) if entry.name.endswith(".json") else None
+                if history:
+                    histories[history["name"]] = history["builds"]
+        # Stores written before history/ existed kept the name in the manifest.
+        for manifest in self._manifests().values():
+            if "name" in manifest and manifest["id"] not in {b["id"] for b in histories.get(manifest["name"], [])}:
+                histories.setdefault(manifest["name"], []).append({"id": manifest["id"], "created": manifest.get("created", 0)})
+                if migrated is not None:
+                    migrated.add(manifest["name"])
+        for builds in histories.values():
+            builds.sort(key=lambda b: b["created"])
+        return histories
+
+    def _manifests(self):
+        directory = os.path.join(self.root, "builds")
+        if not os.path.isdir(directory):
+            return {}
+        manifests = {}
+        for entry in os.scandir(directory):
+            manifest = self._read_json(entry.path) if entry.name.endswith(".json") else None
+            if manifest:
+                manifests[manifest["id"]] = manifest
+        return manifests
+
+    def add(self, artifact, name):
+        """Stores the file or folder `artifact` as a build of profile `name`; returns its manifest."""
+        manifest = scan(artifact)
+        source = os.path.abspath(artifact)
+        for rel, meta in manifest["files"].items():
+            object_path = self._object_path(meta["sha256"])
+            if os.path.exists(object_path):
+                os.utime(object_path)
+            else:
+                _replace_file(_target_path(source, manifest["kind"], rel), object_path)
+        self._write_json(self._build_path(manifest["id"]), manifest)
+        created = time.time()
+        builds = self._histories().get(name, [])
+        if builds and builds[-1]["id"] == manifest["id"]:
+            builds[-1]["created"] = created  # Unchanged since its last build.
+        else:
+            builds.append({"id": manifest["id"], "created": created})
+        self._write_json(self._history_path(name), {"name": name, "builds": builds})
+        self.prune(name)
+        return dict(manifest, name=name, created=created)
+
+    def builds(self, name=None):
+        """Returns the stored builds as manifests with "name" and "created"
+        added, oldest first. A build shared by two profiles is listed for each."""
+        manifests = self._manifests()
+        builds = []
+        for build_name, entries in self._histories().items():
+            if name is None or build_name == name:
+                builds += [dict(manifests[b["id"]], name=build_name, created=b["created"]) for b in entries if b["id"] in manifests]
+        return sorted(builds, key=lambda m: m["created"])
+
+    def resolve(self, ref):
+        """Returns the manifest for a build id (prefix), name, name~N or a path on disk."""
+        if os.path.exists(ref):
+            return scan(ref)
+        builds = self.builds()
+        name, _, back = ref.partition("~")
+        by_name = [b for b in builds if b.get("name") == name]
+        if by_name and (not back or back.isdigit()):
+            index = len(by_name) - 1 - int(back or 0)
+            if index < 0:
+                raise KeyError(f"{name} has only {len(by_name)} stored build(s)")
+            return by_name[index]
+        matches = list({b["id"]: b for b in builds if b["id"].startswith(ref)}.values())
+        if len(matches) == 1:
+            return matches[0]
+        raise KeyError(f"{'Ambiguous' if matches else 'Unknown'} build: {ref}")
+
+    def checkout(self, manifest, destination):
+        """Recreates a stored build at `destination`."""
+        if manifest["kind"] == "dir" and os.path.isdir(destination):
+            shutil.rmtree(destination)
+        for rel, meta in manifest["files"].items():
+            _replace_file(self._object_path(meta["sha256"]), _target_path(destination, manifest["kind"], rel), meta["mode"])
+        for rel, target in manifest["links"].items():
+            _replace_link(target, _target_path(destination, manifest["kind"], rel))
+
+    def prune(self, name=None, keep=None):
+        """Keeps the `keep` newest builds per profile, then removes unreferenced objects.
+        Returns the number of bytes freed."""
+        keep = self.keep if keep is None else keep
+        migrated = set()
+        histories = self._histories(migrated)
+        dropped = set()
+        for build_name, builds in histories.items():
+            if name is None or build_name == name:
+                dropped.update(b["id"] for b in builds[:-keep or None])
+                histories[build_name] = builds[-keep:] if keep else []
+            elif build_name not in migrated:
+                continue  # Left alone, so a parallel build's new entry is never lost.
+            self._write_json(self._history_path(build_name), {"name": build_name, "builds": histories[build_name]})
+        referenced = {b["id"] for builds in histories.values() for b in builds}
+        cutoff = time.time() - GC_GRACE_SECONDS
+        for build_id, manifest in self._manifests().items():
+            if build_id not in referenced:
+                # A new manifest may be a parallel build's whose history is not written yet.
+                if build_id not in dropped and os.path.getmtime(self._build_path(build_id)) >= cutoff:
+                    continue
+                try:
+                    os.remove(self._build_path(build_id))
+                except FileNotFoundError:
+                    pass
+            elif "name" in manifest:
+                # Its name is in the history written above now.
+                manifest.pop("name")
+                manifest.pop("created", None)
+                self._write_json(self._build_path(build_id), manifest)
+        return self.collect_garbage()
+
+    def collect_garbage(self):
+        referenced = {meta["sha256"] for b in self._manifests().values() for meta in b["files"].values()}
+        cutoff = time.time() - GC_GRACE_SECONDS
+        freed = 0
+        objects = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects):
+            return freed
+        for directory in os.scandir(objects):
+            for entry in os.scandir(directory.path):
+                if entry.name not in referenced and entry.stat().st_mtime < cutoff:
+                    freed += entry.stat().st_size
+                    os.remove(entry.path)
+        return freed
+
+    def usage(self):
+        """Returns (bytes of all stored builds, bytes actually on disk)."""
+        builds = self.builds()
+        stored = {meta["sha256"]: meta["size"] for b in self._manifests().values() for meta in b["files"].values()}
+        return sum(b["size"] for b in builds), sum(stored.values())
+
+    def _source(self, manifest, rel):
+        # Builds that are only on disk are read from where they are.
+        object_path = self._object_path(manifest["files"][rel]["sha256"])
+        if "name" in manifest or os.path.exists(object_path):
+            return object_path
+        return _target_path(manifest["path"], manifest["kind"], rel)
+
+    def write_delta(self, old, new, path):
+        """Writes a package that turns build `old` into build `new`; returns the diff."""
+        result = diff(old, new)
+        kind = new["kind"]
+        old_files = dict(zip(new["files"], old["files"].values())) if old["kind"] == kind == "file" else old["files"]
+        meta = {
+            "name": new.get("name"), "kind": kind, "from": old["id"], "to": new["id"],
+            "files": {rel: new["files"][rel] for rel in result.added + result.changed if rel in new["files"]},
+            "links": {rel: new["links"][rel] for rel in result.added + result.changed if rel in new["links"]},
+            "removed": result.removed,
+            # What the files about to be replaced or removed must look like.
+            "expect": {rel: old_files[rel]["sha256"] for rel in result.changed + result.removed if rel in old_files},
+        }
+        temp_path = path + ".tmp"
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(DELTA_MANIFEST, json.dumps(meta, indent=4))
+            for rel in meta["files"]:
+                archive.write(self._source(new, rel), "files/" + rel)
+        os.replace(temp_path, path)
+        return result
+
+
+def apply_delta(package, target, log=print):
+    """Updates the build at `target` (a folder, or the executable of a
+    one-file build) with a delta package. Nothing is changed unless every
+    file the package replaces or removes is exactly as in the build it was
+    made from."""
+    target = os.path.abspath(target)
+    with zipfile.ZipFile(package) as archive:
+        meta = json.loads(archive.read(DELTA_MANIFEST))
+        kind = meta["kind"]
+        if kind == "dir" and not os.path.isdir(target):
+            raise ValueError(f"{target} is not a folder")
+        # Every path is checked before anything is changed, and again right
+        # before it is used, in case a link written meanwhile redirects it.
+        for rel in [*meta["expect"], *meta["files"], *meta["links"], *meta["removed"]]:
+            _delta_path(target, kind, rel)
+        for rel, link_target in meta["links"].items():
+            if os.path.isabs(link_target) or os.path.splitdrive(link_target)[0]:
+                raise ValueError(f"Unsafe link in delta package: {rel!r} -> {link_target!r}")
+            _delta_path(target, kind, os.path.normpath(os.path.join(os.path.dirname(rel), link_target)).replace(os.sep, "/"))
+        for rel, expected in meta["expect"].items():
+            path = _delta_path(target, kind, rel)
+            if not os.path.isfile(path) or _file_hash(path) != expected:
+                raise ValueError(f"{target} is not build {meta['from']}: {rel} differs")
+        for rel, file_meta in meta["files"].items():
+            path = _delta_path(target, kind, rel)
+            if not os.path.isfile(path) and os.path.lexists(path):
+                os.remove(path)  # Was a link before.
+            _replace_file(lambda f, rel=rel: shutil.copyfileobj(archive.open("files/" + rel), f), path, file_meta["mode"])
+        for rel, link_target in meta["links"].items():
+            _replace_link(link_target, _delta_path(target, kind, rel))
+    for rel in meta["removed"]:
+        path = _delta_path(target, kind, rel)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+        # Drop folders the update left empty.
+        parent = os.path.dirname(path)
+        while kind == "dir" and parent != target and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    log(f"Updated {target} from build {meta['from']} to {meta['to']}: {len(meta['files']) + len(meta['links'])} file(s) written, {len(meta['removed'])} removed.")
+    return meta
@@ -0,0 +1,303 @@
+"""
+Py2Win Watch - Rebuild a profile automatically when its inputs change.
+
+The watcher follows the entry script, every local module it imports, the
+icon and everything under the profile's data paths:
+
+- changes are picked up with inotify on Linux and by polling a stat index
+  (path -> mtime, size) everywhere else;
+- a burst of changes, such as an editor saving several files or a folder
+  being copied, is collected until nothing has changed for the debounce
+  window and then handled at once;
+- when code or the icon changed, the profile is rebuilt (incrementally,
+  using the build cache and the persistent work directory);
+- when only bundled data changed and the output is a one-dir build, the
+  changed files are copied straight into it without running PyInstaller.
+  One-file builds must be rebuilt, since the data is inside the executable.
+"""
+import os
+import time
+import errno
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+import py2win_engine as engine
+
+
+DEFAULT_DEBOUNCE = 0.3
+POLL_INTERVAL = 0.5
+OVERFLOW = "*"  # Reported when the backend lost track of changes.
+
+
+class PollingBackend:
+    """Detects changes by comparing (mtime, size) snapshots of all watched files."""
+
+    name = "polling"
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.files, self.roots = (), ()
+        self.index = {}
+
+    def watch(self, files, roots):
+        self.files, self.roots = list(files), list(roots)
+        # Keep what was known before, so changes made meanwhile still show up.
+        index = self._snapshot()
+        index.update((path, value) for path, value in self.index.items() if path in index)
+        self.index = index
+
+    def _snapshot(self):
+        index = {}
+        for path in self.files:
+            try:
+                st = os.stat(path)
+                index[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass
+        pending = []
+        for root in self.roots:
+            if os.path.isdir(root):
+                pending.append(root)
+            else:
+                try:
+                    st = os.stat(root)
+                    index[root] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    pass
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            pending.append(entry.path)
+                        else:
+                            st = entry.stat()
+                            index[entry.path] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        pass
+        return index
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(max(0.0, min(self.interval, deadline - time.monotonic())))
+            index = self._snapshot()
+            changed = {path for path in index.keys() | self.index.keys() if index.get(path) != self.index.get(path)}
+            self.index = index
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyBackend:
+    """Detects changes with Linux inotify, watching the folders that hold
+    watched files and every folder under the data paths."""
+
+    name = "inotify"
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        self.recursive = []
+
+    def _add(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(error, f"Cannot watch {directory} (raise fs.inotify.max_user_watches?)")
+        self.dirs[wd] = directory
+
+    def _add_tree(self, root):
+        self._add(root)
+        for directory, subdirs, _ in os.walk(root):
+            for name in subdirs:
+                self._add(os.path.join(directory, name))
+
+    def watch(self, files, roots):
+        self.recursive = [root for root in roots if os.path.isdir(root)]
+        directories = {os.path.dirname(path) for path in files}
+        directories.update(os.path.dirname(root) for root in roots if not os.path.isdir(root))
+        for root in self.recursive:
+            directories.update(directory for directory, _, _ in os.walk(root))
+        # Watches that stay keep their pending events.
+        for wd, directory in list(self.dirs.items()):
+            if directory not in directories:
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+        for directory in directories - set(self.dirs.values()):
+            self._add(directory)
+
+    def wait(self, timeout):
+        import select
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            name = data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0")
+            offset += self.EVENT.size + length
+            if mask & self.IN_Q_OVERFLOW:
+                changed.add(OVERFLOW)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            changed.add(path)
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                if any(path.startswith(root + os.sep) for root in self.recursive):
+                    self._add_tree(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_backend():
+    """Returns the inotify backend where available, otherwise the polling one."""
+    if hasattr(os, "uname") and os.uname().sysname == "Linux":
+        try:
+            return InotifyBackend()
+        except (OSError, AttributeError):
+            pass
+    return PollingBackend()
+
+
+def _data_state(manifest):
+    if manifest is None:
+        return {}, {}
+    return {dest: entry[2] for dest, entry in manifest.files.items()}, dict(manifest.aliases)
+
+
+class Watcher:
+    def __init__(self, profile, log=print, debounce=DEFAULT_DEBOUNCE, build=None, backend=None, **build_options):
+        self.profile = profile
+        self.log = log
+        self.debounce = debounce
+        self.build = build or (lambda profile: engine.run_build(profile, log=log, **build_options))
+        self.backend = backend or make_backend()
+        self.code_paths = set()
+        self.data_roots = [os.path.abspath(p) for p in profile.get("data_paths", [])]
+        self.manifest = None
+        self.artifacts = []
+        self.builds = 0
+        self.data_updates = 0
+
+    def _watch_code(self):
+        import py2win_analyze
+        script = os.path.abspath(self.profile["script_path"])
+        try:
+            self.code_paths = {os.path.abspath(p) for p in py2win_analyze.local_modules(script)}
+        except (OSError, SyntaxError, ValueError) as e:
+            self.log(f"Watch: could not read the imports of {script}: {e}")
+            self.code_paths = set()
+        self.code_paths.add(script)
+        if self.profile.get("icon_path"):
+            self.code_paths.add(os.path.abspath(self.profile["icon_path"]))
+        self.backend.watch(sorted(self.code_paths), self.data_roots)
+
+    def _build_manifest(self):
+        if not self.profile.get("data_paths"):
+            return None
+        import py2win_data
+        return py2win_data.build_manifest(self.profile)
+
+    def rebuild(self):
+        self.builds += 1
+        result = self.build(self.profile)
+        targets = (result.variants or [result]) if result else []
+        self.artifacts = [t.artifact_path for t in targets if t.successful and t.artifact_path]
+        self.manifest = self._build_manifest()
+        self._watch_code()
+        return result
+
+    def update_data(self, manifest):
+        import py2win_data
+        written = removed = 0
+        for artifact in self.artifacts:
+            w, r = py2win_data.update_artifact(self.manifest, manifest, artifact)
+            written, removed = written + w, removed + r
+        self.manifest = manifest
+        self.data_updates += 1
+        self.log(f"Watch: updated {written} and removed {removed} data file(s) in {len(self.artifacts)} one-dir build(s) without rebuilding.")
+
+    def _collect(self, stop_event):
+        changes = self.backend.wait(0.5)
+        if not changes:
+            return changes
+        # Wait until the burst is over.
+        while not stop_event.is_set():
+            more = self.backend.wait(self.debounce)
+            if not more:
+                break
+            changes |= more
+        return changes
+
+    def handle(self, changes):
+        code_changed = sorted(p for p in changes if p in self.code_paths or p == OVERFLOW)
+        data_changed = any(p == root or p.startswith(root + os.sep) for p in changes for root in self.data_roots)
+        if code_changed:
+            names = ", ".join(os.path.basename(p) if p != OVERFLOW else "(too many changes)" for p in code_changed[:3])
+            self.log(f"\nWatch: code changed ({names}), rebuilding...")
+            self.rebuild()
+            return
+        if not data_changed:
+            return
+        manifest = self._build_manifest()
+        if _data_state(manifest) == _data_state(self.manifest):
+            return  # Only excluded files changed.
+        onedir = self.artifacts and all(os.path.isdir(a) for a in self.artifacts)
+        if onedir and self.manifest is not None and manifest is not None:
+            self.update_data(manifest)
+        else:
+            self.log("\nWatch: bundled data changed, rebuilding...")
+            self.rebuild()
+
+    def run(self, stop_event=None):
+        """Builds the profile, then rebuilds on every change until `stop_event` is set."""
+        stop_event = stop_event or threading.Event()
+        self.rebuild()
+        self.log(f"Watch: waiting for changes to {len(self.code_paths)} code file(s) and {len(self.data_roots)} data path(s) ({self.backend.name})...")
+        try:
+            while not stop_event.is_set():
+                changes = self._collect(stop_event)
+                if changes and not stop_event.is_set():
+                    self.handle(changes)
+        finally:
+            self.backend.close()
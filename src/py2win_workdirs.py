@@ -0,0 +1,138 @@
+"""
+Py2Win Work Directories - Persistent per-profile PyInstaller work directories.
+
+Every profile gets its own managed workpath and specpath under
+<PY2WIN_HOME>/work/<profile-id>/ that survive between builds, so PyInstaller
+can reuse its Analysis, PYZ and PKG caches and only re-analyse what changed.
+
+A work directory is wiped automatically only when the PyInstaller version,
+the build environment or the profile's build options differ from the ones it was created with.
+Old or oversized work directories can be listed and evicted by age or size.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import py2win_engine as engine
+
+
+WORKDIR_OPTIONS = ("is_windowed", "is_onefile", "matrix", "cached_extraction")
+STAMP_FILE = "py2win-stamp.json"
+
+
+def profile_id(profile):
+    script_path = os.path.abspath(profile.get("script_path", ""))
+    name = engine.profile_name(profile)
+    digest = hashlib.sha1(f"{name}\0{script_path}".encode()).hexdigest()[:8]
+    return f"{name}-{digest}"
+
+
+class WorkDirManager:
+    def __init__(self, root=None):
+        self.root = root or engine.data_dir("work")
+
+    def path(self, profile):
+        return os.path.join(self.root, profile_id(profile))
+
+    def _stamp(self, profile):
+        if profile.get("requirements"):
+            import py2win_envs
+            toolchain = py2win_envs.toolchain_info(profile)
+        else:
+            import py2win_cache
+            toolchain = py2win_cache.toolchain_info()
+        return {
+            "pyinstaller": toolchain["pyinstaller"],
+            "python": toolchain["python"],
+            "environment": toolchain.get("environment"),
+            "options": {key: profile.get(key) for key in WORKDIR_OPTIONS},
+        }
+
+    def _read_stamp(self, work_dir):
+        try:
+            with open(os.path.join(work_dir, STAMP_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def prepare(self, profile, clean=False, log=None):
+        """Returns (workpath, specpath) for `profile`, wiping them if they are stale."""
+        work_dir = self.path(profile)
+        stamp = self._stamp(profile)
+        previous = self._read_stamp(work_dir)
+        reason = None
+        if clean:
+            reason = "clean requested"
+        elif previous is not None:
+            previous.pop("last_used", None)
+            previous.pop("name", None)
+            if previous.get("pyinstaller") != stamp["pyinstaller"] or previous.get("python") != stamp["python"]:
+                reason = "PyInstaller or Python version changed"
+            elif previous.get("environment") != stamp["environment"]:
+                reason = "build environment changed"
+            elif previous.get("options") != stamp["options"]:
+                reason = "build options changed"
+        if reason and os.path.exists(work_dir):
+            if log:
+                log(f"Cleaning work directory ({reason}): {work_dir}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+        elif previous is not None and log:
+            log(f"Reusing work directory: {work_dir}")
+
+        workpath = os.path.join(work_dir, "build")
+        specpath = os.path.join(work_dir, "spec")
+        os.makedirs(workpath, exist_ok=True)
+        os.makedirs(specpath, exist_ok=True)
+        stamp["name"] = engine.profile_name(profile)
+        stamp["last_used"] = time.time()
+        with open(os.path.join(work_dir, STAMP_FILE), 'w') as f:
+            json.dump(stamp, f, indent=4)
+        return workpath, specpath
+
+    def usage(self):
+        """Returns one entry per work directory with its size and last use, largest first."""
+        if not os.path.isdir(self.root):
+            return []
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            stamp = self._read_stamp(entry.path) or {}
+            entries.append({
+                "id": entry.name,
+                "name": stamp.get("name", entry.name),
+                "path": entry.path,
+                "size": engine.path_size(entry.path),
+                "last_used": stamp.get("last_used", entry.stat().st_mtime),
+                "pyinstaller": stamp.get("pyinstaller", "?"),
+            })
+        return sorted(entries, key=lambda e: e["size"], reverse=True)
+
+    def remove(self, profile):
+        work_dir = self.path(profile)
+        if os.path.exists(work_dir):
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return True
+        return False
+
+    def evict(self, max_age_days=None, max_bytes=None):
+        """Removes work directories unused for `max_age_days`, then the least
+        recently used ones until the total fits in `max_bytes`."""
+        entries = sorted(self.usage(), key=lambda e: e["last_used"])
+        removed = []
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            for entry in [e for e in entries if e["last_used"] < cutoff]:
+                shutil.rmtree(entry["path"], ignore_errors=True)
+                entries.remove(entry)
+                removed.append(entry)
+        if max_bytes is not None:
+            total = sum(e["size"] for e in entries)
+            while entries and total > max_bytes:
+                entry = entries.pop(0)
+                shutil.rmtree(entry["path"], ignore_errors=True)
+                total -= entry["size"]
+                removed.append(entry)
+        return removed
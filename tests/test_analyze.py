@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import py2win_analyze
+
+
+class OptionalExcludeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = self.tmp.name
+        # Installed packages live outside the script's folder, so they are
+        # analysed as external packages rather than local modules.
+        site = os.path.join(root, "site")
+        for name, source in (("depa", "import depb\n"), ("depb", "VALUE = 1\n"), ("depc", "VALUE = 2\n")):
+            os.makedirs(os.path.join(site, name))
+            with open(os.path.join(site, name, "__init__.py"), "w") as f:
+                f.write(source)
+        sys.path.insert(0, site)
+        self.addCleanup(sys.path.remove, site)
+        os.makedirs(os.path.join(root, "app"))
+        self.script = os.path.join(root, "app", "main.py")
+        with open(self.script, "w") as f:
+            f.write("import depa\n"
+                    "try:\n    import depb\nexcept ImportError:\n    depb = None\n"
+                    "try:\n    import depc\nexcept ImportError:\n    depc = None\n")
+        self.cache = py2win_analyze.AnalysisCache(os.path.join(root, "cache.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_package_imported_by_required_dependency_is_not_excluded(self):
+        analysis = py2win_analyze.analyze({"script_path": self.script}, self.cache)
+        excludes = {s["name"] for s in analysis["suggestions"] if s["kind"] == "exclude"}
+        self.assertNotIn("depb", excludes)
+        self.assertIn("depc", excludes)
+
+
+if __name__ == "__main__":
+    unittest.main()